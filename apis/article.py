@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status as fast_status, Query
 from core.auth import get_current_user
 from core.db import DB
+from core.database import get_db
+from sqlalchemy.orm import Session, selectinload
 from core.models.base import DATA_STATUS
 from core.models.article import Article,ArticleBase
 from sqlalchemy import and_, or_, desc
 from .base import success_response, error_response
 from core.config import cfg
-from apis.base import format_search_kw
+from core.search import SEARCH
+from apis.base import apply_cursor, next_cursor, count_total
 from core.print import print_warning, print_info, print_error, print_success
 router = APIRouter(prefix=f"/articles", tags=["文章管理"])
 
@@ -26,8 +29,17 @@ async def clean_orphan_articles(
         deleted_count = session.query(Article)\
             .filter(~Article.mp_id.in_(subquery))\
             .delete(synchronize_session=False)
+        # 批量删除不会级联，同时清理对应的正文
+        from core.models.article import ArticleContent
+        session.query(ArticleContent)\
+            .filter(~ArticleContent.article_id.in_(session.query(Article.id)))\
+            .delete(synchronize_session=False)
         
         session.commit()
+        if deleted_count:
+            # 清除订阅源缓存并重新生成快照，不再输出已删除的文章
+            from core.rss import RSS
+            RSS().clear_cache()
         
         return success_response({
             "message": "清理无效文章成功",
@@ -51,6 +63,9 @@ async def clean_duplicate(
     try:
         from tools.clean import clean_duplicate_articles
         (msg, deleted_count) =clean_duplicate_articles()
+        if deleted_count:
+            from core.rss import RSS
+            RSS().clear_cache()
         return success_response({
             "message": msg,
             "deleted_count": deleted_count
@@ -74,16 +89,18 @@ async def get_articles(
     search: str = Query(None),
     mp_id: str = Query(None),
     has_content:bool=Query(False),
+    cursor: str = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor"),
+    total_mode: str = Query("exact", pattern="^(exact|cached|none)$", description="总数统计方式：exact实时、cached缓存、none不统计"),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
       
         
         # 构建查询条件
         query = session.query(ArticleBase)
         if has_content:
-            query=session.query(Article)
+            query=session.query(Article).options(selectinload(Article.body))
         if status:
             query = query.filter(Article.status == status)
         else:
@@ -91,13 +108,15 @@ async def get_articles(
         if mp_id:
             query = query.filter(Article.mp_id == mp_id)
         if search:
-            query = query.filter(
-               format_search_kw(search)
-            )
+            # 全文检索，偏移分页时按相关度排序
+            query = SEARCH.apply(query, session, search, order_by_rank=cursor is None)
         
         # 获取总数
-        total = query.count()
-        query= query.order_by(Article.publish_time.desc()).offset(offset).limit(limit)
+        total = count_total(query, total_mode)
+        if cursor is not None:
+            query = apply_cursor(query, cursor, Article.publish_time, Article.id).limit(limit)
+        else:
+            query= query.order_by(Article.publish_time.desc(), Article.id.desc()).offset(offset).limit(limit)
         # query= query.order_by(Article.id.desc()).offset(offset).limit(limit)
         # 分页查询（按发布时间降序）
         articles = query.all()
@@ -116,14 +135,16 @@ async def get_articles(
         # 合并公众号名称到文章列表
         article_list = []
         for article in articles:
-            article_dict = article.__dict__
+            article_dict = article.to_dict() if has_content else article.__dict__
             article_dict["mp_name"] = mp_names.get(article.mp_id, "未知公众号")
             article_list.append(article_dict)
         
         from .base import success_response
         return success_response({
             "list": article_list,
-            "total": total
+            "total": total,
+            # 只有游标分页返回下一页游标，偏移分页(检索时按相关度排序)的顺序与游标不一致
+            "next_cursor": next_cursor(articles, limit, lambda a: a.publish_time) if cursor is not None else None
         })
     except HTTPException as e:
         raise e
@@ -154,7 +175,7 @@ async def get_article_detail(
                     message="文章不存在"
                 )
             )
-        return success_response(article)
+        return success_response(article.to_dict())
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -186,10 +207,14 @@ async def delete_article(
                 )
             )
         # 逻辑删除文章（更新状态为deleted）
+        mp_id = article.mp_id
         article.status = DATA_STATUS.DELETED
         if cfg.get("article.true_delete", False):
             session.delete(article)
         session.commit()
+        # 清除该公众号的订阅源缓存并重新生成快照
+        from core.rss import RSS
+        RSS().clear_cache(mp_id=mp_id)
         
         return success_response(None, message="文章已标记为删除")
     except Exception as e:
@@ -22,9 +22,78 @@ def error_response(code: int, message: str, data=None):
         "message": message,
         "data": data
     }
-from sqlalchemy import and_,or_
+from sqlalchemy import and_,or_,DateTime
 from core.models import Article
 def format_search_kw(keyword: str):
-    words = keyword.replace("-"," ").replace("|"," ").split(" ")
-    rule = or_(*[Article.title.like(f"%{w}%") for w in words])
-    return rule
\ No newline at end of file
+    """LIKE 匹配标题，未建立全文索引时使用，见 core.search"""
+    from core.search import SEARCH
+    return SEARCH.like_filter(keyword)
+
+import base64
+import json
+import time
+import threading
+from datetime import datetime
+from fastapi import HTTPException
+def encode_cursor(sort_value, id) -> str:
+    """把最后一条记录的(排序值, id)编码为不透明的游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, str(id)], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, id = json.loads(raw.decode("utf-8"))
+        if sort_value is None:
+            raise ValueError("empty sort value")
+        return sort_value, id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_response(code=40001, message="无效的分页游标")
+        )
+
+def apply_cursor(query, cursor: str, sort_col, id_col):
+    """游标(keyset)分页：按(sort_col, id_col)倒序取游标之后的记录，深分页与首页开销相同
+
+    sort_col 为空的记录无法与游标比较，首页和后续页都不包含这些记录(使用offset分页仍可查询)
+    """
+    query = query.filter(sort_col.isnot(None)).order_by(sort_col.desc(), id_col.desc())
+    if not cursor:
+        return query
+    sort_value, id = decode_cursor(cursor)
+    if isinstance(sort_col.type, DateTime) and isinstance(sort_value, str):
+        sort_value = datetime.fromisoformat(sort_value)
+    return query.filter(and_(sort_col <= sort_value, or_(sort_col < sort_value, id_col < id)))
+
+def next_cursor(items: list, limit: int, sort_key, id_key="id"):
+    """取满一页时返回下一页游标，否则返回None"""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(sort_key(last), id_key(last) if callable(id_key) else getattr(last, id_key))
+
+_count_cache = {}
+_count_lock = threading.Lock()
+COUNT_CACHE_TTL = 60
+def count_total(query, total_mode: str = "exact"):
+    """按total_mode统计总数：exact 实时统计，cached 使用60秒内的缓存结果，none 不统计返回None"""
+    if total_mode == "none":
+        return None
+    if total_mode != "cached":
+        return query.count()
+    compiled = query.statement.compile()
+    key = str(compiled) + repr(sorted(compiled.params.items()))
+    now = time.time()
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    total = query.count()
+    with _count_lock:
+        if len(_count_cache) > 1000:
+            _count_cache.clear()
+        _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
@@ -4,13 +4,13 @@ from fastapi.background import BackgroundTasks
 from core.auth import get_current_user
 from core.db import DB
 from core.wx import search_Biz
-from .base import success_response, error_response
+from .base import success_response, error_response, apply_cursor, next_cursor, count_total
 from datetime import datetime
 from core.config import cfg
 from core.res import save_avatar_locally
 import io
 import os
-from jobs.article import UpdateArticle
+from jobs.article import UpdateArticle,UpdateArticles
 router = APIRouter(prefix=f"/mps", tags=["公众号管理"])
 # import core.db as db
 # UPDB=db.Db("数据抓取")
@@ -52,6 +52,8 @@ async def get_mps(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     kw: str = Query(""),
+    cursor: str = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor"),
+    total_mode: str = Query("exact", pattern="^(exact|cached|none)$", description="总数统计方式：exact实时、cached缓存、none不统计"),
     current_user: dict = Depends(get_current_user)
 ):
     session = DB.get_session()
@@ -60,8 +62,11 @@ async def get_mps(
         query = session.query(Feed)
         if kw:
             query = query.filter(Feed.mp_name.ilike(f"%{kw}%"))
-        total = query.count()
-        mps = query.order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
+        total = count_total(query, total_mode)
+        if cursor is not None:
+            mps = apply_cursor(query, cursor, Feed.created_at, Feed.id).limit(limit).all()
+        else:
+            mps = query.order_by(Feed.created_at.desc(), Feed.id.desc()).limit(limit).offset(offset).all()
         return success_response({
             "list": [{
                 "id": mp.id,
@@ -74,10 +79,13 @@ async def get_mps(
             "page": {
                 "limit": limit,
                 "offset": offset,
-                "total": total
+                "total": total,
+                "next_cursor": next_cursor(mps, limit, lambda mp: mp.created_at)
             },
             "total": total
         })
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"获取公众号列表错误: {str(e)}")
         raise HTTPException(
@@ -106,9 +114,10 @@ async def update_mps(
                 )
         import time
         sync_interval=cfg.get("sync_interval",60)
-        if mp.update_time is None:
-            mp.update_time=int(time.time())-sync_interval
-        time_span=int(time.time())-int(mp.update_time)
+        # update_time 记录最新文章发布时间，频率限制按上次同步时间计算
+        if mp.sync_time is None:
+            mp.sync_time=int(time.time())-sync_interval
+        time_span=int(time.time())-int(mp.sync_time)
         if time_span<sync_interval:
            return error_response(
                     code=40402,
@@ -116,13 +125,9 @@ async def update_mps(
                     data={"time_span":time_span}
                 )
         result=[]    
-        def UpArt(mp):
-            from core.wx import WxGather
-            wx=WxGather().Model()
-            wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,start_page=start_page,MaxPage=end_page)
-            result=wx.articles
-        import threading
-        threading.Thread(target=UpArt,args=(mp,)).start()
+        # 手动刷新进入交互通道，优先于定时同步执行；同一公众号不会与其它采集任务同时运行
+        from core.queue import TaskQueue
+        TaskQueue.add_durable_task("jobs.mps:fetch_feed_pages",{"feed_id":mp.id,"start_page":start_page,"max_page":end_page},key=mp.id,lane="interactive")
         return success_response({
             "time_span":time_span,
             "list":result,
@@ -243,9 +248,8 @@ async def add_mp(
          #在这里实现第一次添加获取公众号文章
         if not existing_feed:
             from core.queue import TaskQueue
-            from core.wx import WxGather
             Max_page=int(cfg.get("max_page","2"))
-            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,CallBack=UpdateArticle,MaxPage=Max_page,Mps_title=mp_name)
+            TaskQueue.add_durable_task("jobs.mps:fetch_feed_pages",{"feed_id":feed.id,"start_page":0,"max_page":Max_page},key=feed.id,lane="backfill")
             
         return success_response({
             "id": feed.id,
@@ -288,6 +292,8 @@ async def delete_mp(
         
         session.delete(mp)
         session.commit()
+        from core.rss import RSS
+        RSS().clear_cache(mp_id=mp_id)
         return success_response({
             "message": "订阅号删除成功",
             "id": mp_id
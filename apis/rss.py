@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Request,Response
 from fastapi import status
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from core.db import DB
+from core.database import get_db
+from sqlalchemy.orm import Session, selectinload
 from core.rss import RSS
 from core.models.feed import Feed
 import json
+import hashlib
 from .base import success_response, error_response
 from core.auth import get_current_user
 from core.config import cfg
-from apis.base import format_search_kw
+from core.search import SEARCH
+from core.feed_cache import FEED_CACHE
+from core.feed_snapshot import SNAPSHOTS
+from apis.base import apply_cursor, next_cursor, decode_cursor
 from core.print import print_error,print_success
 def verify_rss_access(current_user: dict = Depends(get_current_user)):
     """
@@ -26,6 +32,8 @@ def verify_rss_access(current_user: dict = Depends(get_current_user)):
         )
     return current_user
 
+# 流式输出时每批从数据库读取的文章数
+STREAM_BATCH=20
 router = APIRouter(prefix="/rss",tags=["Rss"])
 feed_router = APIRouter(prefix="/feed",tags=["Feed"])
 
@@ -35,9 +43,10 @@ async def get_rss_source(
     request: Request,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(verify_rss_access)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True)
+    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True,fresh=True,cursor=None,session=session)
 
 
 
@@ -48,9 +57,10 @@ async def update_rss_feeds(
     request: Request,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(get_current_user)
 ):
-    return await get_rss_feeds(request=request, limit=limit,offset=offset, is_update=True)
+    return await get_rss_feeds(request=request, limit=limit,offset=offset, is_update=True,session=session)
 
 @router.get("", summary="获取RSS订阅列表")
 async def get_rss_feeds(
@@ -58,6 +68,7 @@ async def get_rss_feeds(
     limit: int = Query(10, ge=1, le=30),
     offset: int = Query(0, ge=0),
     is_update:bool=False,
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(get_current_user)
 ):
     rss=RSS(name=f'all_{limit}_{offset}')
@@ -67,7 +78,6 @@ async def get_rss_feeds(
             content=rss_xml,
             media_type="application/xml"
         )
-    session = DB.get_session()
     try:
         total = session.query(Feed).count()
         feeds = session.query(Feed).order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
@@ -84,6 +94,8 @@ async def get_rss_feeds(
         
         # 生成RSS XML
         rss_xml = rss.generate_rss(rss_list, title="WeRSS订阅",link=rss_domain)
+        # 公众号列表订阅依赖全部公众号，任一公众号变化时清除
+        rss.register_cache(None)
         
         return Response(
             content=rss_xml,
@@ -153,6 +165,7 @@ async def update_rss_feeds(
     feed_id: str,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(get_current_user)
 ):
         #如果需要放开授权，请只允许内网访问，防止 被利用攻击 放开授权办法，注释上面current_user: dict = Depends(get_current_user)
@@ -164,7 +177,7 @@ async def update_rss_feeds(
         # wx.get_Articles(mp.faker_id,Mps_id=mp.id,CallBack=UpdateArticle)
         # result=wx.articles
 
-        return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True)
+        return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True,fresh=True,cursor=None,session=session)
 
 
 
@@ -179,44 +192,43 @@ async def get_mp_articles_source(
     kw:str="",
     is_update:bool=True,
     content_type:str=Query(None,alias="ctype"),
-    template:str=None
+    template:str=None,
+    cursor:str=Query(None,description="游标分页：首页传空字符串，之后传响应头X-Next-Cursor的值"),
+    fresh:bool=False,
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(get_current_user)
 ):
-    rss=RSS(name=f'{tag_id}_{feed_id}_{limit}_{offset}',ext=ext)
+    if cursor:
+        # 无效游标直接返回400
+        decode_cursor(cursor)
+    # 内存缓存在文章入库时按公众号失效，命中时不查询数据库；客户端带ETag/Last-Modified时返回304
+    rss_domain=cfg.get("rss.base_url",str(request.base_url))
+    cache_key=FEED_CACHE.make_key(feed=feed_id,tag=tag_id,ext=ext,limit=limit,offset=offset,kw=kw,
+                                  ctype=content_type,cursor=cursor,template=template,domain=rss_domain)
+    # 默认参数的订阅源在采集完成后预先生成快照，直接返回快照文件
+    snapshot=not fresh and SNAPSHOTS.eligible(feed_id,tag_id,ext,limit,offset,kw,content_type,cursor,template)
+    if snapshot:
+        entry=SNAPSHOTS.get(feed_id,tag_id,ext,rss_domain)
+        if entry is not None:
+            return FEED_CACHE.response(request,entry)
+    if not fresh:
+        entry=FEED_CACHE.get(cache_key)
+        if entry is not None:
+            return FEED_CACHE.response(request,entry)
+    # 缓存文件名包含内存缓存键全部字段的摘要(游标、关键词、模板、域名等)，不同的键不会写入同一文件
+    cache_name=f'{tag_id}_{feed_id}_{limit}_{offset}_{hashlib.md5(repr(cache_key).encode("utf-8")).hexdigest()}'
+    rss=RSS(name=cache_name,ext=ext)
     rss.set_content_type(content_type)
-    rss_xml = rss.get_cache()
-    if rss_xml is not None and is_update==False:
+    # 缓存文件只在需要时读取，避免每次请求都把上次生成的整个订阅源读入内存
+    rss_xml = rss.get_cache() if is_update==False else None
+    if rss_xml is not None:
          return Response(
             content=rss_xml,
             media_type=rss.get_type()
         )
-    session = DB.get_session()
     try:
         from core.models.article import Article
-        from core.models.tags import Tags
-        # 查询公众号信息
-        feed = session.query(Feed)
-        query=session.query(Feed, Article).join(Article, Feed.id == Article.mp_id)
-        rss_domain=cfg.get("rss.base_url",str(request.base_url))
-        if feed_id not in ["all",None]:
-            feed=feed.filter(Feed.id == feed_id).first()
-            query=query.filter(Article.mp_id==feed_id)
-        else:
-            feed=Feed()
-            feed.mp_name=cfg.get("rss.title","WeRss") or "WeRss"
-            feed.mp_intro=cfg.get("rss.description") or "WeRss高效订阅我的公众号"
-            feed.mp_cover=cfg.get("rss.cover") or f"{rss_domain}static/logo.svg"
-            #如果传入了tag_id就加载tag对应的订阅信息
-            if tag_id is not None:
-                tags=session.query(Tags).filter(Tags.id == tag_id).first()
-                if tags:
-                    mps_ids = [str(mp['id']) for mp in json.loads(tags.mps_id)] if tags.mps_id else []
-                    query=query.filter(Feed.id.in_(mps_ids))
-                    feed.mp_name = tags.name
-                    feed.mp_intro = tags.intro
-                    feed.mp_cover = f'{rss_domain}{tags.cover}'
-
-        
+        feed,query,cache_mps=_feed_query(session,feed_id,tag_id,rss_domain)
         if not feed:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -225,62 +237,131 @@ async def get_mp_articles_source(
                     message="公众号不存在"
                 )
             )
+        if snapshot:
+            SNAPSHOTS.warm(feed_id,tag_id,ext,rss_domain)
       
-        # 查询文章列表
-        total = query.count()
+        # 查询文章列表(订阅源不需要总数，不再执行count)
         # articles = query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
         if kw!="":
-            query=query.filter(format_search_kw(kw))
-        articles =query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
+            query=SEARCH.apply(query,session,kw,order_by_rank=cursor is None)
+        if cursor is None and template is None and RSS.can_stream(ext) and cfg.get("rss.stream",True):
+            # 流式输出：服务端游标逐行读取，逐条生成并写入缓存文件，不在内存中拼装整个订阅源
+            query=query.order_by(Article.publish_time.desc(),Article.id.desc()).limit(limit).offset(offset)
+            media_type=rss.get_type()
+            since=FEED_CACHE.version
+            def on_complete(path,digest,size):
+                FEED_CACHE.served(size)
+                FEED_CACHE.put_file(cache_key,path,digest,size,media_type,mp_ids=cache_mps,since=since)
+                rss.register_cache(cache_mps)
+            chunks=rss.stream(_stream_items(query,rss,rss_domain),ext,on_complete=on_complete,
+                              title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro,image_url=feed.mp_cover)
+            return StreamingResponse(chunks,media_type=media_type)
+        if cursor is not None:
+            articles =apply_cursor(query,cursor,Article.publish_time,Article.id).limit(limit).all()
+        else:
+            articles =query.order_by(Article.publish_time.desc(),Article.id.desc()).limit(limit).offset(offset).all()
+        page_cursor=next_cursor(articles,limit,lambda row:row[1].publish_time,lambda row:row[1].id)
         # 转换为RSS格式数据
-        import datetime
-        rss_list = [{
-            "id": str(article.id),
-            "title": article.title or "",
-            "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
-            "description": article.description if article.description != "" else article.title or "",
-            "content": article.content or "",
-            "image": article.pic_url or "",
-            "mp_name":_feed.mp_name or "",
-            "updated": datetime.datetime.fromtimestamp(article.publish_time),
-            "feed": {
-                    "id":_feed.id,
-                    "name":_feed.mp_name,
-                    "cover":_feed.mp_cover,
-                    "intro":_feed.mp_intro
-            }
-        } for _feed,article in articles]
-        
-
+        rss_list = [_feed_item(_feed,article,rss_domain) for _feed,article in articles]
         # 缓存文章内容
         for _feed,article in articles:
-            content_data = {
-                "id": article.id,
-                "title": article.title,
-                "content": article.content,
-                "publish_time": article.publish_time,
-                "mp_id": article.mp_id,
-                "pic_url": article.pic_url,
-                "mp_name": _feed.mp_name
-            }
-            rss.cache_content(article.id, content_data)
+            _cache_article_content(rss,_feed,article)
         # 生成RSS XML
         rss_xml = rss.generate(rss_list,ext=ext, title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro,image_url=feed.mp_cover,template=template)
+        rss.register_cache(cache_mps)
         
-        return Response(
-            content=rss_xml,
-            media_type=rss.get_type()
-        )
+        headers={}
+        if page_cursor:
+            headers["X-Next-Cursor"]=page_cursor
+            headers["Link"]=f'<{request.url.include_query_params(cursor=page_cursor)}>; rel="next"'
+        entry=FEED_CACHE.put(cache_key,rss_xml.encode("utf-8"),rss.get_type(),mp_ids=cache_mps,headers=headers)
+        return FEED_CACHE.response(request,entry)
+    except HTTPException:
+        raise
     except Exception as e:
         print_error(f"获取RSS错误:{e}")
         # raise
         return Response(
-             content=rss_xml,
+             content=rss.get_cache(),
              media_type=rss.get_type()
         )
     
 
 
+def _feed_query(session:Session,feed_id:str,tag_id:str,rss_domain:str):
+    """订阅源信息、文章查询和缓存依赖的公众号(None表示依赖全部公众号)，公众号不存在时feed为None"""
+    from core.models.article import Article
+    from core.models.tags import Tags
+    # 查询公众号信息
+    feed = session.query(Feed)
+    # 正文单独存放，按当前页文章一次性加载
+    query=session.query(Feed, Article).join(Article, Feed.id == Article.mp_id).options(selectinload(Article.body))
+    cache_mps=None
+    if feed_id not in ["all",None]:
+        feed=feed.filter(Feed.id == feed_id).first()
+        query=query.filter(Article.mp_id==feed_id)
+        cache_mps=[feed_id]
+    else:
+        feed=Feed()
+        feed.mp_name=cfg.get("rss.title","WeRss") or "WeRss"
+        feed.mp_intro=cfg.get("rss.description") or "WeRss高效订阅我的公众号"
+        feed.mp_cover=cfg.get("rss.cover") or f"{rss_domain}static/logo.svg"
+        #如果传入了tag_id就加载tag对应的订阅信息
+        if tag_id is not None:
+            tags=session.query(Tags).filter(Tags.id == tag_id).first()
+            if tags:
+                mps_ids = [str(mp['id']) for mp in json.loads(tags.mps_id)] if tags.mps_id else []
+                query=query.filter(Feed.id.in_(mps_ids))
+                cache_mps=mps_ids+[f"tag:{tag_id}"]
+                feed.mp_name = tags.name
+                feed.mp_intro = tags.intro
+                feed.mp_cover = f'{rss_domain}{tags.cover}'
+    return feed,query,cache_mps
+
+def _feed_item(_feed:Feed,article,rss_domain:str)->dict:
+    """文章转换为订阅源条目"""
+    import datetime
+    return {
+        "id": str(article.id),
+        "title": article.title or "",
+        "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
+        "description": article.description if article.description != "" else article.title or "",
+        "content": article.content or "",
+        "image": article.pic_url or "",
+        "mp_name":_feed.mp_name or "",
+        "updated": datetime.datetime.fromtimestamp(article.publish_time),
+        "feed": {
+                "id":_feed.id,
+                "name":_feed.mp_name,
+                "cover":_feed.mp_cover,
+                "intro":_feed.mp_intro
+        }
+    }
+
+def _cache_article_content(rss:RSS,_feed:Feed,article):
+    content_data = {
+        "id": article.id,
+        "title": article.title,
+        "content": article.content,
+        "publish_time": article.publish_time,
+        "mp_id": article.mp_id,
+        "pic_url": article.pic_url,
+        "mp_name": _feed.mp_name
+    }
+    rss.cache_content(article.id, content_data)
+
+def _stream_items(query,rss:RSS,rss_domain:str):
+    """在独立会话中分批读取文章(响应开始发送后请求范围的会话已关闭)，逐条产出订阅源条目"""
+    session=DB.session_factory()
+    try:
+        for _feed,article in query.with_session(session).yield_per(STREAM_BATCH):
+            _cache_article_content(rss,_feed,article)
+            yield _feed_item(_feed,article,rss_domain)
+            # 已输出的文章不再保留在会话中
+            session.expunge(article)
+    finally:
+        session.close()
+
 @feed_router.get("/{feed_id}.{ext}", summary="获取公众号文章源")
 async def rss(
     request: Request,
@@ -290,9 +371,11 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=Query(None,description="游标分页：首页传空字符串，之后传响应头X-Next-Cursor的值"),
+    session: Session = Depends(get_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 
 
 @feed_router.get("/search/{kw}/{feed_id}.{ext}", summary="获取公众号文章源")
@@ -304,9 +387,11 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=Query(None,description="游标分页：首页传空字符串，之后传响应头X-Next-Cursor的值"),
+    session: Session = Depends(get_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 @feed_router.get("/tag/{tag_id}.{ext}", summary="获取公众号文章源")
 async def rss(
     request: Request,
@@ -317,8 +402,10 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=Query(None,description="游标分页：首页传空字符串，之后传响应头X-Next-Cursor的值"),
+    session: Session = Depends(get_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, tag_id=tag_id,limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return await get_mp_articles_source(request=request,feed_id=feed_id, tag_id=tag_id,limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 
 
@@ -8,7 +8,7 @@ from core.auth import get_current_user
 from .base import success_response, error_response
 from driver.token import wx_cfg
 from core.config import cfg
-from jobs.mps import TaskQueue
+from jobs.mps import TaskQueue,scheduler
 from driver.success import getLoginInfo,getStatus
 router = APIRouter(prefix="/sys", tags=["系统信息"])
 
@@ -36,6 +36,15 @@ async def get_base_info() -> Dict[str, Any]:
     
 
 from core.resource import get_system_resources
+from core.db import SESSION_STATS,ENGINES
+from core.wx.aid_index import AID_INDEX
+from core.poll_policy import POLL_PLANNER
+from core.wx.limiter import LIMITER
+from core.wx.breaker import BREAKER
+from core.feed_cache import FEED_CACHE
+from core.feed_snapshot import SNAPSHOTS
+from core.content_queue import CONTENT_QUEUE
+from core.rss import RSS
 @router.get("/resources", summary="获取系统资源使用情况")
 async def system_resources(
     current_user: dict = Depends(get_current_user)
@@ -47,17 +56,28 @@ async def system_resources(
         - cpu: CPU使用率(%)
         - memory: 内存使用情况
         - disk: 磁盘使用情况
+        - queue: 采集队列状态
+        - db: 数据库会话统计(打开的会话数、每请求会话数)及共享连接池状态
+        - aid_index/rate_limit/content_queue/polling: 已采集文章索引、请求限流、正文采集队列、自适应采集统计
+        - content_store/rss_cache: 正文缓存存储和订阅源缓存文件统计
     """
     try:
         resources_info=get_system_resources()
         resources_info["queue"]=TaskQueue.get_queue_info(),
+        resources_info["db"]={**SESSION_STATS.get_info(),"pool":ENGINES.get_info()}
+        resources_info["aid_index"]=AID_INDEX.get_info()
+        resources_info["rate_limit"]=LIMITER.get_info()
+        resources_info["content_queue"]=CONTENT_QUEUE.get_info()
+        resources_info["polling"]=POLL_PLANNER.get_info()
+        resources_info["content_store"]=RSS.content_store().get_info()
+        resources_info["rss_cache"]=RSS().cache_manifest().get_info()
         return success_response(data=resources_info)
     except Exception as e:
         return error_response(
             code=50002,
             message=f"获取系统资源失败: {str(e)}"
         )
-from core.article_lax import ARTICLE_INFO,laxArticle
+from core.article_lax import get_article_info
 from .ver import API_VERSION
 from core.ver import VERSION as CORE_VERSION,LATEST_VERSION
 @router.get("/info", summary="获取系统信息")
@@ -100,8 +120,12 @@ async def get_system_info(
                 "info":getLoginInfo(),
                 "login":getStatus(),
             },
-            "article":ARTICLE_INFO,
+            "article":get_article_info(),
             'queue':TaskQueue.get_queue_info(),
+            'scheduler':scheduler.get_job_stats(),
+            'breaker':BREAKER.get_info(),
+            'feed_cache':FEED_CACHE.get_info(),
+            'feed_snapshot':SNAPSHOTS.get_info(),
         }
         return success_response(data=system_info)
     except Exception as e:
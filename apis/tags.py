@@ -7,6 +7,9 @@ from sqlalchemy.orm import Session
 from schemas.tags import Tags, TagsCreate
 from .base import success_response, error_response
 from core.auth import get_current_user, requires_permission
+from core.feed_cache import FEED_CACHE
+from core.feed_snapshot import SNAPSHOTS
+from core.rss import RSS
 
 # 标签管理API路由
 # 提供标签的增删改查功能
@@ -145,6 +148,9 @@ async def update_tag(tag_id: str, tag_data: TagsCreate, db: Session = Depends(ge
         
         db.commit()
         db.refresh(tag)
+        FEED_CACHE.invalidate(f"tag:{tag_id}")
+        SNAPSHOTS.schedule_targets([SNAPSHOTS.target(tag_id=tag_id)])
+        RSS().cache_manifest().invalidate(f"tag:{tag_id}")
         return success_response(data=tag)
     except Exception as e:
         return error_response(code=500, message=str(e))
@@ -170,6 +176,9 @@ async def delete_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict =
             return error_response(code=status.HTTP_201_CREATED, message="Tag not found")
         db.delete(tag)
         db.commit()
+        FEED_CACHE.invalidate(f"tag:{tag_id}")
+        SNAPSHOTS.schedule_targets([SNAPSHOTS.target(tag_id=tag_id)])
+        RSS().cache_manifest().invalidate(f"tag:{tag_id}")
         return success_response(message="Tag deleted successfully")
     except Exception as e:
         return error_response(code=status.HTTP_201_CREATED, message=str(e))
\ No newline at end of file
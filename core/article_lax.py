@@ -1,6 +1,9 @@
 from core.models import Article,Feed,DATA_STATUS
 from core.db import DB
 import json
+import threading
+import time
+from sqlalchemy import or_,func
 class ArticleInfo():
     #没有内容的文章数量
     no_content_count:int=0
@@ -12,11 +15,17 @@ class ArticleInfo():
     wrong_count:int=0
     #公众号总数
     mp_all_count:int=0
+    #正文原始字节数
+    content_raw_bytes:int=0
+    #正文实际存储字节数(压缩后)
+    content_stored_bytes:int=0
+    #压缩节省的字节数
+    content_saved_bytes:int=0
 def laxArticle():
     info=ArticleInfo()
     session=DB.get_session()
     #获取没有内容的文章数量
-    info.no_content_count=session.query(Article).filter(Article.content == None).count()
+    info.no_content_count=session.query(Article).filter(or_(Article.has_content.is_(None), Article.has_content == 0)).count()
     #所有文章数量
     info.all_count=session.query(Article).count()
     #有内容的文章数量
@@ -27,8 +36,28 @@ def laxArticle():
 
     #公众号总数
     info.mp_all_count=session.query(Feed).distinct(Feed.id).count()
+
+    #正文存储统计(压缩节省的空间)
+    from core.models.article import ArticleContent
+    raw,stored=session.query(
+        func.coalesce(func.sum(func.coalesce(ArticleContent.raw_size,func.length(ArticleContent.content))),0),
+        func.coalesce(func.sum(func.coalesce(func.length(ArticleContent.data),func.length(ArticleContent.content))),0)
+    ).one()
+    info.content_raw_bytes=int(raw)
+    info.content_stored_bytes=int(stored)
+    info.content_saved_bytes=info.content_raw_bytes-info.content_stored_bytes
     # session.close()
     return info.__dict__
     pass
-ARTICLE_INFO=laxArticle()
-print(ARTICLE_INFO)
\ No newline at end of file
+
+# 统计包含全表聚合(正文字节数需读取全部正文长度)，按间隔缓存，避免每次查询系统信息都扫描全部文章
+INFO_TTL=300
+_info_lock=threading.Lock()
+_info_cache={"time":0.0,"info":None}
+def get_article_info(ttl:float=INFO_TTL)->dict:
+    """返回文章统计，ttl秒内重复调用直接使用上次结果"""
+    with _info_lock:
+        if _info_cache["info"] is None or time.time()-_info_cache["time"]>=ttl:
+            _info_cache["info"]=laxArticle()
+            _info_cache["time"]=time.time()
+        return _info_cache["info"]
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+订阅源缓存文件清单
+记录缓存目录中每个订阅源文件依赖的公众号/标签(标签订阅依赖其中每个公众号，全部文章订阅依赖全部公众号)，
+公众号文章变化时按清单只删除受影响的文件，不再遍历整个目录按文件名匹配；
+缓存目录超过大小上限或文件超过保留时间时从最早生成的文件开始清理。
+"""
+import os
+import sqlite3
+import threading
+import time
+from core.config import cfg
+from core.print import print_warning
+
+DB_NAME = "manifest.db"
+# 依赖全部公众号的缓存文件登记在该键下
+ALL = "*"
+# 两次按时间清理的最小间隔(秒)
+SWEEP_INTERVAL = 60
+
+
+class CacheManifest:
+    _manifests = {}
+    _manifests_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.normpath(cache_dir)
+        self.path = os.path.join(self.cache_dir, DB_NAME)
+        self.invalidated = 0
+        self.evicted = 0
+        self._last_sweep = 0.0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, cache_dir: str) -> "CacheManifest":
+        """按缓存目录取清单实例，同一目录共享一个连接"""
+        cache_dir = os.path.normpath(cache_dir)
+        with cls._manifests_lock:
+            if cache_dir not in cls._manifests:
+                cls._manifests[cache_dir] = cls(cache_dir)
+            return cls._manifests[cache_dir]
+
+    @property
+    def capacity(self) -> int:
+        """缓存目录大小上限(字节)，0为不限制"""
+        return int(float(cfg.get("rss.cache_max_mb", 512) or 0) * 1024 * 1024)
+
+    @property
+    def max_age(self) -> float:
+        """缓存文件最长保留秒数，0为不限制"""
+        return float(cfg.get("rss.cache_max_age", 604800) or 0)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            created = not os.path.exists(self.path)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS artifacts (name TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                         "created INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_artifacts_created ON artifacts (created)")
+            conn.execute("CREATE TABLE IF NOT EXISTS depends (dep TEXT NOT NULL, name TEXT NOT NULL, "
+                         "PRIMARY KEY (dep, name))")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_depends_name ON depends (name)")
+            conn.commit()
+            self._conn = conn
+            if created:
+                self._adopt()
+        return self._conn
+
+    def _adopt(self):
+        """首次建立清单时登记目录中已有的缓存文件，依赖未知，按依赖全部公众号处理"""
+        now = int(time.time())
+        for filename in os.listdir(self.cache_dir):
+            file_path = os.path.join(self.cache_dir, filename)
+            if filename.startswith(DB_NAME) or filename.endswith(".tmp") or not os.path.isfile(file_path):
+                continue
+            self._insert(filename, os.path.getsize(file_path), now, [ALL])
+        self._conn.commit()
+
+    def _insert(self, name: str, size: int, created: int, deps):
+        self._conn.execute("INSERT OR REPLACE INTO artifacts (name, size, created) VALUES (?, ?, ?)",
+                           (name, size, created))
+        self._conn.execute("DELETE FROM depends WHERE name=?", (name,))
+        self._conn.executemany("INSERT OR IGNORE INTO depends (dep, name) VALUES (?, ?)",
+                               [(str(dep), name) for dep in deps])
+
+    def _name(self, path: str) -> str:
+        path = os.path.normpath(path)
+        if os.path.dirname(path) != self.cache_dir:
+            raise ValueError("Invalid cache path: Path traversal detected.")
+        return os.path.basename(path)
+
+    def register(self, path: str, mp_ids: list = None):
+        """登记缓存文件，mp_ids 为内容涉及的公众号(及 tag:{id})，None 表示依赖全部公众号"""
+        name = self._name(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._connect()
+            self._insert(name, size, int(time.time()), [ALL] if mp_ids is None else list(mp_ids) or [ALL])
+            self._conn.commit()
+        self.evict()
+
+    def invalidate(self, dep: str = None):
+        """删除依赖该公众号/标签的缓存文件(含依赖全部公众号的文件)，不传时清空"""
+        with self._lock:
+            conn = self._connect()
+            if not dep:
+                names = [row[0] for row in conn.execute("SELECT name FROM artifacts")]
+            else:
+                names = [row[0] for row in conn.execute("SELECT DISTINCT name FROM depends WHERE dep IN (?, ?)",
+                                                        (str(dep), ALL))]
+            self._delete(names)
+            self.invalidated += len(names)
+        return len(names)
+
+    def evict(self, force: bool = False):
+        """按保留时间和目录大小上限清理最早生成的缓存文件"""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            names = []
+            if self.max_age > 0 and (force or now - self._last_sweep >= SWEEP_INTERVAL):
+                self._last_sweep = now
+                names += [row[0] for row in conn.execute("SELECT name FROM artifacts WHERE created < ?",
+                                                         (int(now - self.max_age),))]
+                self._delete(names)
+            capacity = self.capacity
+            if capacity > 0:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+                oversize = []
+                if total > capacity:
+                    for name, size in conn.execute("SELECT name, size FROM artifacts ORDER BY created, name"):
+                        if total <= capacity:
+                            break
+                        oversize.append(name)
+                        total -= size
+                self._delete(oversize)
+                names += oversize
+            self.evicted += len(names)
+        return len(names)
+
+    def _delete(self, names: list):
+        """删除文件和清单记录(调用方持有锁)"""
+        if not names:
+            return
+        for name in names:
+            file_path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.isfile(file_path):
+                    os.unlink(file_path)
+            except OSError as e:
+                print_warning(f"删除缓存文件失败 {file_path}: {e}")
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM artifacts WHERE name IN ({marks})", chunk)
+            self._conn.execute(f"DELETE FROM depends WHERE name IN ({marks})", chunk)
+        self._conn.commit()
+
+    def get_info(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {
+            "files": count,
+            "bytes": total,
+            "capacity": self.capacity,
+            "max_age": self.max_age,
+            "invalidated": self.invalidated,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,79 @@
+"""
+文章正文编码
+采集到的HTML先压缩空白再按配置压缩(zlib/zstd)存入数据库，读取时透明解压；
+压缩数据首字节标记编码方式，切换配置后旧数据仍可读取。
+"""
+import re
+import zlib
+from bs4 import BeautifulSoup, Comment, NavigableString
+from core.config import cfg
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+# 保留原始空白的标签
+PRESERVE_TAGS = ["pre", "code", "textarea", "script", "style"]
+
+
+def get_codec() -> str:
+    """当前写入使用的压缩方式：zlib、zstd(需安装zstandard，否则退回zlib)、none"""
+    codec = str(cfg.get("article.compress", "zlib") or "none").lower()
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec if codec in ("zlib", "zstd") else "none"
+
+
+def compress_content(text: str, codec: str = None):
+    """压缩正文，codec为none或压缩无收益时返回None(由调用方存为明文)"""
+    if not text:
+        return None
+    codec = codec or get_codec()
+    raw = text.encode("utf-8")
+    level = int(cfg.get("article.compress_level", 6) or 6)
+    if codec == "zstd":
+        data = CODEC_ZSTD + zstandard.ZstdCompressor(level=level).compress(raw)
+    elif codec == "zlib":
+        data = CODEC_ZLIB + zlib.compress(raw, level)
+    else:
+        return None
+    # 很短的正文压缩后反而变大，直接存明文
+    return data if len(data) < len(raw) else None
+
+
+def decompress_content(data: bytes) -> str:
+    if not data:
+        return None
+    data = bytes(data)
+    flag, payload = data[:1], data[1:]
+    if flag == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if flag == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("正文使用zstd压缩，请先安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"未知的正文压缩格式: {flag!r}")
+
+
+def minify_html(node) -> str:
+    """输出紧凑HTML(替代prettify)：删除注释，连续空白折叠为一个空格，pre/code等标签内保持原样"""
+    for comment in node.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for text in node.find_all(string=True):
+        if type(text) is not NavigableString or text.find_parent(PRESERVE_TAGS):
+            continue
+        collapsed = re.sub(r"\s+", " ", text)
+        if collapsed != text:
+            text.replace_with(collapsed)
+    return str(node)
+
+
+def html_to_text(html: str) -> str:
+    """提取正文纯文本，用于全文检索"""
+    if not html:
+        return ""
+    text = BeautifulSoup(html, "html.parser").get_text(" ")
+    return re.sub(r"\s+", " ", text).strip()
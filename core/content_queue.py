@@ -0,0 +1,222 @@
+"""
+正文采集队列(两阶段采集的第二阶段)
+采集列表时只写入文章元数据，需要正文的文章登记到 content_fetch_jobs 表，
+由后台线程按并发数取出采集，失败按指数退避重试；任务持久化在数据库中，重启后继续执行。
+"""
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import or_
+from core.config import cfg
+from core.print import print_error,print_info,print_success,print_warning
+from core.models.base import DATA_STATUS
+from core.models.content_fetch import ContentFetchJob
+
+# 取出任务后的租约时间，超时未完成(如进程退出)的任务会被重新取出
+LEASE_SECONDS=300
+# 重试间隔上限
+MAX_RETRY_DELAY=6*3600
+
+
+class ContentQueue:
+    def __init__(self):
+        self._event=threading.Event()
+        self._lock=threading.Lock()
+        self._threads=[]
+        self._dirty_mps=set()
+        self.fetched=0
+        self.failed=0
+
+    @property
+    def enabled(self)->bool:
+        return bool(cfg.get("gather.content_pipeline",True))
+
+    def _db(self):
+        from core.db import DB
+        return DB
+
+    def start(self):
+        """启动正文采集线程(重复调用只启动一次)"""
+        with self._lock:
+            if self._threads:
+                return
+            workers=max(int(cfg.get("gather.content_workers",2) or 2),1)
+            for i in range(workers):
+                thread=threading.Thread(target=self._work,daemon=True,name=f"content-fetch-{i}")
+                thread.start()
+                self._threads.append(thread)
+        print_success(f"正文采集队列已启动，线程数:{workers}")
+
+    def enqueue(self,jobs:list):
+        """登记需要采集正文的文章 [{article_id, mp_id, url}]，已登记的忽略"""
+        if not jobs:
+            return
+        DB=self._db()
+        now=datetime.now()
+        rows=[{"article_id":job["article_id"],"mp_id":job.get("mp_id"),"url":job.get("url") or "",
+               "status":DATA_STATUS.PENDING,"attempts":0,"next_at":0,"created_at":now,"updated_at":now} for job in jobs]
+        session=DB.get_session()
+        try:
+            stmt=DB._insert_ignore_statement(rows,ContentFetchJob.__table__)
+            if stmt is not None:
+                session.execute(stmt)
+            else:
+                exists={row[0] for row in session.query(ContentFetchJob.article_id)
+                        .filter(ContentFetchJob.article_id.in_([r["article_id"] for r in rows])).all()}
+                session.add_all([ContentFetchJob(**r) for r in rows if r["article_id"] not in exists])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print_error(f"登记正文采集任务失败: {e}")
+            return
+        print_info(f"登记{len(rows)}篇文章等待采集正文")
+        self.start()
+        self._event.set()
+
+    def enqueue_missing(self,limit:int=500)->int:
+        """把缺少正文且未登记的文章加入队列(对账补漏，代替定时轮询采集)"""
+        from core.models.article import Article
+        DB=self._db()
+        session=DB.get_session()
+        queued=session.query(ContentFetchJob.article_id)
+        rows=session.query(Article.id,Article.mp_id,Article.url) \
+            .filter(or_(Article.has_content.is_(None),Article.has_content==0)) \
+            .filter(Article.status!=DATA_STATUS.DELETED) \
+            .filter(~Article.id.in_(queued)) \
+            .order_by(Article.publish_time.desc()).limit(limit).all()
+        self.enqueue([{"article_id":id,"mp_id":mp_id,"url":url} for id,mp_id,url in rows])
+        return len(rows)
+
+    def _claim(self):
+        """取出一个到期任务并顺延next_at作为租约，多个线程/进程同时取时只有一个成功"""
+        DB=self._db()
+        session=DB.get_session()
+        now=int(time.time())
+        try:
+            candidates=session.query(ContentFetchJob.article_id,ContentFetchJob.next_at) \
+                .filter(ContentFetchJob.status==DATA_STATUS.PENDING,ContentFetchJob.next_at<=now) \
+                .order_by(ContentFetchJob.next_at).limit(10).all()
+            for article_id,next_at in candidates:
+                claimed=session.query(ContentFetchJob) \
+                    .filter(ContentFetchJob.article_id==article_id,ContentFetchJob.next_at==next_at,
+                            ContentFetchJob.status==DATA_STATUS.PENDING) \
+                    .update({ContentFetchJob.next_at:now+LEASE_SECONDS,
+                             ContentFetchJob.attempts:ContentFetchJob.attempts+1},synchronize_session=False)
+                session.commit()
+                if claimed:
+                    job=session.get(ContentFetchJob,article_id)
+                    return {"article_id":job.article_id,"mp_id":job.mp_id,"url":job.url,"attempts":job.attempts}
+        except Exception as e:
+            session.rollback()
+            print_error(f"读取正文采集任务失败: {e}")
+        return None
+
+    def _next_wait(self)->float:
+        """没有到期任务时等待到最近一个任务的执行时间(最长60秒)"""
+        from sqlalchemy import func
+        session=self._db().get_session()
+        next_at=session.query(func.min(ContentFetchJob.next_at)) \
+            .filter(ContentFetchJob.status==DATA_STATUS.PENDING).scalar()
+        session.commit()
+        if next_at is None:
+            return 60
+        return min(max(next_at-time.time(),1),60)
+
+    def _work(self):
+        from core.wx import WxGather
+        gather=None
+        while True:
+            try:
+                job=self._claim()
+                if job is None:
+                    self._flush_cache()
+                    self._event.wait(self._next_wait())
+                    self._event.clear()
+                    continue
+                if gather is None:
+                    gather=WxGather().Model()
+                self._process(gather,job)
+            except Exception as e:
+                print_error(f"正文采集线程异常: {e}")
+                time.sleep(5)
+
+    def _process(self,gather,job:dict):
+        error=""
+        content=None
+        try:
+            url=job["url"] or f"https://mp.weixin.qq.com/s/{job['article_id']}"
+            content=gather.content_extract(url)
+        except Exception as e:
+            error=str(e)
+        if content:
+            self._save(job,content)
+        else:
+            self._retry(job,error or "正文为空")
+
+    def _save(self,job:dict,content:str):
+        from core.models.article import Article
+        DB=self._db()
+        session=DB.get_session()
+        try:
+            article=session.get(Article,job["article_id"])
+            if article is not None:
+                article.updated_at=datetime.now()
+                article.content=content
+                if content=="DELETED":
+                    print_error(f"获取文章 {article.title} 内容已被发布者删除")
+                    article.status=DATA_STATUS.DELETED
+            session.query(ContentFetchJob).filter(ContentFetchJob.article_id==job["article_id"]).delete(synchronize_session=False)
+            session.commit()
+            self.fetched+=1
+            self._dirty_mps.add(job["mp_id"])
+            if article is not None:
+                print_success(f"成功更新文章 {article.title} 的内容")
+        except Exception as e:
+            session.rollback()
+            self._retry(job,str(e))
+
+    def _retry(self,job:dict,error:str):
+        DB=self._db()
+        session=DB.get_session()
+        retries=int(cfg.get("gather.content_retries",5) or 5)
+        delay=int(cfg.get("gather.content_retry_delay",60) or 60)
+        values={ContentFetchJob.last_error:error[:500],ContentFetchJob.updated_at:datetime.now()}
+        if job["attempts"]>=retries:
+            values[ContentFetchJob.status]=DATA_STATUS.FAILED
+            self.failed+=1
+            print_warning(f"文章 {job['article_id']} 正文采集失败{job['attempts']}次，不再重试: {error}")
+        else:
+            values[ContentFetchJob.next_at]=int(time.time())+min(delay*2**(job["attempts"]-1),MAX_RETRY_DELAY)
+        try:
+            session.query(ContentFetchJob).filter(ContentFetchJob.article_id==job["article_id"]).update(values,synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print_error(f"更新正文采集任务失败: {e}")
+
+    def _flush_cache(self):
+        """队列空闲时清除更新过正文的公众号的RSS缓存"""
+        with self._lock:
+            mps,self._dirty_mps=self._dirty_mps,set()
+        if not mps:
+            return
+        from core.rss import RSS
+        rss=RSS()
+        for mp_id in mps:
+            rss.clear_cache(mp_id=mp_id)
+
+    def get_info(self)->dict:
+        from sqlalchemy import func
+        session=self._db().get_session()
+        counts=dict(session.query(ContentFetchJob.status,func.count()).group_by(ContentFetchJob.status).all())
+        session.commit()
+        return {
+            "workers":len(self._threads),
+            "pending":counts.get(DATA_STATUS.PENDING,0),
+            "failed":counts.get(DATA_STATUS.FAILED,0),
+            "fetched":self.fetched,
+            "gave_up":self.failed,
+        }
+
+
+CONTENT_QUEUE=ContentQueue()
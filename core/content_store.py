@@ -0,0 +1,88 @@
+"""
+文章正文缓存存储
+/rss/content/{id} 使用的正文缓存存入单个SQLite键值文件(替代每篇文章一个json文件)，
+写入时记录内容摘要，摘要未变化的文章直接跳过，订阅源反复请求不再重复改写缓存。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from core.content_codec import compress_content, decompress_content
+
+DB_NAME = "content.db"
+
+
+class ContentStore:
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.writes = 0
+        self.skips = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, cache_dir: str) -> "ContentStore":
+        """按缓存目录取存储实例，同一目录共享一个连接"""
+        path = os.path.normpath(os.path.join(cache_dir, DB_NAME))
+        with cls._stores_lock:
+            if path not in cls._stores:
+                cls._stores[path] = cls(path)
+            return cls._stores[path]
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS contents (id TEXT PRIMARY KEY, digest TEXT NOT NULL, "
+                         "data BLOB NOT NULL, updated INTEGER NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def digest(self, key: str):
+        with self._lock:
+            row = self._connect().execute("SELECT digest FROM contents WHERE id=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: dict, digest: str):
+        """写入(按 article.compress 配置压缩)，JSON明文以 { 开头，与压缩标记不冲突"""
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        data = compress_content(raw) or raw.encode("utf-8")
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO contents (id, digest, data, updated) VALUES (?, ?, ?, ?)",
+                         (key, digest, sqlite3.Binary(data), int(time.time())))
+            conn.commit()
+            self.writes += 1
+
+    def skip(self):
+        self.skips += 1
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM contents WHERE id=?", (key,)).fetchone()
+        if row is None:
+            return None
+        data = bytes(row[0])
+        return json.loads(data.decode("utf-8") if data[:1] == b"{" else decompress_content(data))
+
+    def get_info(self) -> dict:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "writes": self.writes,
+            "skips": self.skips,
+        }
@@ -1,3 +1,4 @@
 from core.db import DB
 def get_db():
-    return DB.get_session()
\ No newline at end of file
+    """请求范围的数据库会话，请求结束后自动关闭"""
+    yield from DB.session_dependency()
\ No newline at end of file
@@ -6,9 +6,155 @@ from .models import Feed, Article
 from .config import cfg
 from core.models.base import Base  
 from core.print import print_warning,print_info,print_error,print_success
+import threading
+import contextvars
 # 声明基类
 # Base = declarative_base()
 
+class SessionStats:
+    """数据库会话获取统计
+
+    连接有效性由连接池的 pool_pre_ping 在取出连接时检查，get_session 不再执行探测查询。
+    """
+    def __init__(self):
+        self._lock=threading.Lock()
+        self._request=contextvars.ContextVar("db_request_sessions",default=None)
+        self.sessions_opened=0
+        self.requests=0
+        self.request_sessions=0
+        self.max_request_sessions=0
+    def session_opened(self):
+        with self._lock:
+            self.sessions_opened+=1
+        counter=self._request.get()
+        if counter is not None:
+            counter[0]+=1
+    def begin_request(self):
+        """开始统计一个HTTP请求内获取的会话数"""
+        return self._request.set([0])
+    def end_request(self,token):
+        counter=self._request.get()
+        self._request.reset(token)
+        if counter is None:
+            return
+        with self._lock:
+            self.requests+=1
+            self.request_sessions+=counter[0]
+            self.max_request_sessions=max(self.max_request_sessions,counter[0])
+    def get_info(self)->dict:
+        with self._lock:
+            return {
+                'sessions_opened':self.sessions_opened,
+                'requests':self.requests,
+                'sessions_per_request':round(self.request_sessions/self.requests,2) if self.requests else 0,
+                'max_sessions_per_request':self.max_request_sessions,
+            }
+SESSION_STATS=SessionStats()
+
+class EngineRegistry:
+    """按连接串共享的数据库引擎注册表
+
+    所有 Db 实例（按 tag 区分）共用同一个引擎和连接池，进程内的连接数只由
+    db_pool 配置决定，与导入了多少个模块无关。
+    """
+    def __init__(self):
+        self._lock=threading.Lock()
+        self._engines={}
+        self._tags={}
+    def _create_engine(self,con_str:str)->Engine:
+        # 检查SQLite数据库文件是否存在
+        if con_str.startswith('sqlite:///'):
+            import os
+            db_path = con_str[10:]  # 去掉'sqlite:///'前缀
+            if not os.path.exists(db_path):
+                try:
+                    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                except Exception as e:
+                    pass
+                open(db_path, 'w').close()
+        engine = create_engine(con_str,
+                            pool_size=int(cfg.get("db_pool.size",5)),          # 常驻连接数
+                            max_overflow=int(cfg.get("db_pool.max_overflow",10)),      # 允许的最大溢出连接数
+                            pool_timeout=int(cfg.get("db_pool.timeout",30)),      # 获取连接时的超时时间（秒）
+                            echo=False,
+                            pool_recycle=int(cfg.get("db_pool.recycle",60)),  # 连接池回收时间（秒）
+                            pool_pre_ping=True,  # 取出连接时检查连接是否可用
+                            isolation_level="AUTOCOMMIT",  # 设置隔离级别
+                        #  isolation_level="READ COMMITTED",  # 设置隔离级别
+                        #  query_cache_size=0,
+                            connect_args={"check_same_thread": False} if con_str.startswith('sqlite:///') else {}
+                            )
+        if con_str.startswith('sqlite') and cfg.get("sqlite.performance",True):
+            self._apply_sqlite_profile(engine)
+        return engine
+    def _apply_sqlite_profile(self,engine:Engine)->None:
+        """SQLite性能配置：WAL日志模式下读写互不阻塞，采集写入时API读取不再等待"""
+        synchronous=str(cfg.get("sqlite.synchronous","NORMAL")).upper()
+        if synchronous not in ("OFF","NORMAL","FULL","EXTRA"):
+            synchronous="NORMAL"
+        mmap_size=int(cfg.get("sqlite.mmap_size",128))*1024*1024
+        cache_size=-int(cfg.get("sqlite.cache_size",32))*1024
+        busy_timeout=int(cfg.get("sqlite.busy_timeout",5000))
+        @event.listens_for(engine,"connect")
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor=dbapi_connection.cursor()
+            try:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute(f"PRAGMA synchronous={synchronous}")
+                cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+                cursor.execute(f"PRAGMA cache_size={cache_size}")
+                cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            finally:
+                cursor.close()
+    def get_engine(self,con_str:str,tag:str="默认")->Engine:
+        """获取连接串对应的共享引擎，不存在时创建"""
+        with self._lock:
+            engine=self._engines.get(con_str)
+            if engine is None:
+                engine=self._create_engine(con_str)
+                self._engines[con_str]=engine
+                print_info(f"[{tag}]创建数据库连接池")
+            self._tags.setdefault(tag,{'engine':con_str,'sessions':0,'checkouts':0})
+            return engine
+    def track_sessions(self,session_factory,tag:str):
+        """统计指定tag的会话从连接池取出连接的次数"""
+        def after_begin(session, transaction, connection):
+            with self._lock:
+                self._tags[tag]['checkouts']+=1
+        event.listen(session_factory,'after_begin',after_begin)
+    def session_opened(self,tag:str):
+        with self._lock:
+            if tag in self._tags:
+                self._tags[tag]['sessions']+=1
+    def get_info(self)->dict:
+        """连接池状态及各tag的连接取用统计"""
+        from sqlalchemy.engine import make_url
+        with self._lock:
+            engines=[]
+            for con_str,engine in self._engines.items():
+                pool=engine.pool
+                engines.append({
+                    'url':make_url(con_str).render_as_string(hide_password=True),
+                    'size':pool.size() if hasattr(pool,'size') else None,
+                    'checked_out':pool.checkedout() if hasattr(pool,'checkedout') else None,
+                    'overflow':pool.overflow() if hasattr(pool,'overflow') else None,
+                    'status':pool.status(),
+                })
+            tags={tag:{'sessions':item['sessions'],'checkouts':item['checkouts']} for tag,item in self._tags.items()}
+            return {'engines':engines,'tags':tags}
+    def dispose_all(self)->None:
+        """关闭所有连接池"""
+        with self._lock:
+            for engine in self._engines.values():
+                try:
+                    engine.dispose()
+                except Exception as e:
+                    print_error(f"关闭数据库连接池失败: {e}")
+            self._engines.clear()
+ENGINES=EngineRegistry()
+import atexit
+atexit.register(ENGINES.dispose_all)
+
 class Db:
     connection_str: str=None
     def __init__(self,tag:str="默认",User_In_Thread=True):
@@ -29,28 +175,10 @@ class Db:
         """Initialize database connection and create tables"""
         try:
             self.connection_str=con_str
-            # 检查SQLite数据库文件是否存在
-            if con_str.startswith('sqlite:///'):
-                import os
-                db_path = con_str[10:]  # 去掉'sqlite:///'前缀
-                if not os.path.exists(db_path):
-                    try:
-                        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-                    except Exception as e:
-                        pass
-                    open(db_path, 'w').close()
-            self.engine = create_engine(con_str,
-                                     pool_size=2,          # 最小空闲连接数
-                                     max_overflow=20,      # 允许的最大溢出连接数
-                                     pool_timeout=30,      # 获取连接时的超时时间（秒）
-                                     echo=False,
-                                     pool_recycle=60,  # 连接池回收时间（秒）
-                                     isolation_level="AUTOCOMMIT",  # 设置隔离级别
-                                    #  isolation_level="READ COMMITTED",  # 设置隔离级别
-                                    #  query_cache_size=0,
-                                     connect_args={"check_same_thread": False} if con_str.startswith('sqlite:///') else {}
-                                     )
+            self.engine = ENGINES.get_engine(con_str,tag=self.tag)
             self.session_factory=self.get_session_factory()
+            ENGINES.track_sessions(self.session_factory,self.tag)
+            self.Session=None
         except Exception as e:
             print(f"Error creating database connection: {e}")
             raise
@@ -59,6 +187,8 @@ class Db:
         from core.models.base import Base as B # 导入所有模型
         try:
             B.metadata.create_all(self.engine)
+            from core.search import SEARCH
+            SEARCH.ensure_index(self.engine)
         except Exception as e:
             print_error(f"Error creating tables: {e}")
 
@@ -91,26 +221,35 @@ class Db:
             pass      
         return False
      
+    def format_article(self, article_data: dict) -> dict:
+        """规范化采集到的文章数据：补全ID前缀、时间字段和状态"""
+        from datetime import datetime
+        from core.models.base import DATA_STATUS
+        data={c.name:article_data.get(c.name) for c in Article.__table__.columns}
+        # 正文不在articles表中，单独保留，由写入方存入article_contents
+        content=article_data.get("content")
+        data["content"]=content
+        data["has_content"]=1 if content else 0
+        data["content_length"]=len(content) if content else 0
+        if data["id"]:
+            data["id"]=f"{str(data['mp_id'])}-{data['id']}".replace("MP_WXS_","")
+        now=datetime.now().replace(microsecond=0)
+        for key in ("created_at","updated_at"):
+            if data[key] is None:
+                data[key]=now
+            elif isinstance(data[key],str):
+                data[key]=datetime.strptime(data[key],'%Y-%m-%d %H:%M:%S')
+        data["status"]=DATA_STATUS.ACTIVE
+        return data
+
     def add_article(self, article_data: dict) -> bool:
         try:
             session=self.get_session()
-            from datetime import datetime
-            art = Article(**article_data)
-            if art.id:
-               art.id=f"{str(art.mp_id)}-{art.id}".replace("MP_WXS_","")
-            if art.created_at is None:
-                art.created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            if art.updated_at is None:
-                art.updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            art.created_at=datetime.strptime(art.created_at ,'%Y-%m-%d %H:%M:%S')
-            art.updated_at=datetime.strptime(art.updated_at,'%Y-%m-%d %H:%M:%S')
-            art.content=art.content
-            from core.models.base import DATA_STATUS
-            art.status=DATA_STATUS.ACTIVE
+            art = Article(**self.format_article(article_data))
             session.add(art)
             # self._session.merge(art)
             sta=session.commit()
-            
+            self._invalidate_feeds([art.mp_id])
         except Exception as e:
             if "UNIQUE" in str(e) or "Duplicate entry" in str(e):
                 print_warning(f"Article already exists: {art.id}")
@@ -119,6 +258,114 @@ class Db:
             return False
         return True    
         
+    def _upsert_statement(self, rows: List[dict], update_columns: List[str], table=None):
+        """生成数据库原生的批量插入/冲突更新语句，不支持的数据库返回None"""
+        table=Article.__table__ if table is None else table
+        dialect=self.engine.dialect.name
+        if dialect=="sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            stmt=insert(table).values(rows)
+            return stmt.on_conflict_do_update(
+                index_elements=list(table.primary_key.columns),
+                set_={c:stmt.excluded[c] for c in update_columns})
+        if dialect=="mysql":
+            from sqlalchemy.dialects.mysql import insert
+            stmt=insert(table).values(rows)
+            return stmt.on_duplicate_key_update({c:stmt.inserted[c] for c in update_columns})
+        return None
+
+    def _insert_ignore_statement(self, rows: List[dict], table):
+        """生成忽略主键冲突的批量插入语句，不支持的数据库返回None"""
+        dialect=self.engine.dialect.name
+        if dialect=="sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            return insert(table).values(rows).on_conflict_do_nothing()
+        if dialect=="mysql":
+            from sqlalchemy.dialects.mysql import insert
+            return insert(table).values(rows).prefix_with("IGNORE")
+        return None
+
+    def upsert_articles(self, articles: List[dict], chunk_size:int=50) -> dict:
+        """批量写入一页采集到的文章
+
+        先用一次查询找出已存在的文章，新文章直接插入，已存在但缺少内容的文章补写内容，
+        其余跳过；每批只提交一次，不再依赖捕获唯一键冲突来判断重复。
+
+        Args:
+            articles: 采集回调产生的文章字典列表（id为原始aid）
+            chunk_size: 单条语句写入的最大行数
+
+        Returns:
+            dict: inserted/updated/skipped 数量，以及新插入文章的原始ID列表 inserted_ids；
+                  写入失败时整批回滚，failed 为本批文章数，error 为错误信息
+        """
+        result={"inserted":0,"updated":0,"skipped":0,"failed":0,"inserted_ids":[]}
+        rows={}
+        for data in articles or []:
+            row=self.format_article(data)
+            if row["id"]:
+                rows[row["id"]]=(data.get("id"),row)
+        if not rows:
+            return result
+        session=self.get_session()
+        try:
+            from core.models.article import ArticleContent
+            known=dict(session.query(Article.id,Article.has_content)
+                       .filter(Article.id.in_(list(rows.keys()))).all())
+            writes=[]
+            for art_id,(raw_id,row) in rows.items():
+                if art_id not in known:
+                    writes.append(row)
+                    result["inserted"]+=1
+                    result["inserted_ids"].append(raw_id)
+                elif not known[art_id] and row["has_content"]:
+                    writes.append(row)
+                    result["updated"]+=1
+                else:
+                    result["skipped"]+=1
+            for i in range(0,len(writes),chunk_size):
+                chunk=writes[i:i+chunk_size]
+                metas=[{k:v for k,v in row.items() if k!="content"} for row in chunk]
+                bodies=[{"article_id":row["id"],**ArticleContent.pack(row["content"]),"updated_at":row["updated_at"]}
+                        for row in chunk if row["has_content"]]
+                stmt=self._upsert_statement(metas,["has_content","content_length","updated_at"])
+                if stmt is not None:
+                    session.execute(stmt)
+                    if bodies:
+                        session.execute(self._upsert_statement(bodies,["content","data","plain_text","raw_size","updated_at"],ArticleContent.__table__))
+                else:
+                    for row in chunk:
+                        session.merge(Article(**row))
+            session.commit()
+            if writes:
+                self._invalidate_feeds({row["mp_id"] for row in writes})
+        except Exception as e:
+            session.rollback()
+            print_error(f"Failed to upsert articles: {e}")
+            result.update({"inserted":0,"updated":0,"skipped":0,"failed":len(rows),"inserted_ids":[],"error":str(e)})
+        return result
+
+    def _invalidate_feeds(self, mp_ids):
+        """文章入库后失效相关公众号的订阅源内存缓存"""
+        from core.feed_cache import FEED_CACHE
+        for mp_id in mp_ids:
+            FEED_CACHE.invalidate(mp_id)
+
+    def latest_publish_time(self, mp_id:str) -> int:
+        """公众号已入库文章的最新发布时间(增量同步的高水位)，没有文章返回None"""
+        from sqlalchemy import func
+        session=self.get_session()
+        return session.query(func.max(Article.publish_time)).filter(Article.mp_id==mp_id).scalar()
+
+    def known_articles(self, mp_id:str, aids:List[str]) -> dict:
+        """返回已入库的文章 {原始aid: 是否已有正文}，用于增量同步跳过已采集的文章"""
+        ids={f"{str(mp_id)}-{aid}".replace("MP_WXS_",""):aid for aid in aids}
+        if not ids:
+            return {}
+        session=self.get_session()
+        rows=session.query(Article.id,Article.has_content).filter(Article.id.in_(list(ids.keys()))).all()
+        return {ids[art_id]:bool(has_content) for art_id,has_content in rows}
+
     def get_articles(self, id:str=None, limit:int=30, offset:int=0) -> List[Article]:
         try:
             data = self.get_session().query(Article).limit(limit).offset(offset)
@@ -193,6 +440,8 @@ class Db:
             _session()
         
         session = self.Session()
+        SESSION_STATS.session_opened()
+        ENGINES.session_opened(self.tag)
         # session.expire_all()
         # session.expire_on_commit = True  # 确保每次提交后对象过期
         # 检查会话是否已经关闭
@@ -201,17 +450,7 @@ class Db:
             print_info(f"[{self.tag}] Session is already closed.")
             _session()
             return self.Session()
-        # 检查数据库连接是否已断开
-        try:
-            from core.models import User
-            # 尝试执行一个简单的查询来检查连接状态
-            session.query(User.id).count()
-        except Exception as e:
-            from core.print import print_warning
-            print_warning(f"[{self.tag}] Database connection lost: {e}. Reconnecting...")
-            self.init(self.connection_str)
-            _session()
-            return self.Session()
+        # 连接断开由连接池 pool_pre_ping 在取出连接时检测并重连
         return session
     def auto_refresh(self):
         # 定义一个事件监听器，在对象更新后自动刷新
@@ -223,12 +462,13 @@ class Db:
         
     def session_dependency(self):
         """FastAPI依赖项，用于请求范围的会话管理"""
-        session = self.get_session()
+        session = self.session_factory()
+        SESSION_STATS.session_opened()
+        ENGINES.session_opened(self.tag)
         try:
             yield session
         finally:
-            session.remove()
+            session.close()
 
 # 全局数据库实例
-DB = Db(User_In_Thread=True)
-DB.init(cfg.get("db"))
\ No newline at end of file
+DB = Db(User_In_Thread=True)
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+订阅源响应缓存
+进程内LRU缓存生成好的订阅源(rss/atom/json等)，按(订阅源/标签, 格式, 分页, 关键词, 内容类型)区分；
+文章入库或正文更新时按公众号失效，响应附带强ETag和Last-Modified，阅读器带条件请求时返回304。
+流式生成的订阅源只缓存文件路径，内容不占用内存。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from core.config import cfg
+
+# 依赖全部公众号的缓存(全部文章、标签订阅在公众号列表变化时)登记在该键下
+ALL = "*"
+
+
+class FeedCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._index = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.bytes_served = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    @property
+    def capacity(self) -> int:
+        """缓存总大小上限(字节)"""
+        return int(float(cfg.get("rss.memory_cache_mb", 64) or 0) * 1024 * 1024)
+
+    @staticmethod
+    def make_key(**parts) -> tuple:
+        return tuple(sorted((k, str(v) if v is not None else None) for k, v in parts.items()))
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    @property
+    def version(self) -> int:
+        """失效次数，生成前记录，写入时若已变化说明生成期间有文章入库，结果不再缓存"""
+        return self.invalidations
+
+    def get(self, key: tuple):
+        """返回未过期的缓存项 {body, etag, last_modified, media_type, headers}"""
+        ttl = float(cfg.get("rss.memory_cache_ttl", 3600) or 0)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and ((ttl > 0 and time.time() - entry["created"] > ttl)
+                                      or (entry["path"] and not self._file_intact(entry))):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, body: bytes, media_type: str, mp_ids: list = None, headers: dict = None,
+            since: int = None) -> dict:
+        """缓存生成结果，mp_ids 为内容涉及的公众号，None 表示依赖全部公众号"""
+        entry = self._entry(body, None, self.etag(body), len(body), media_type, mp_ids, headers)
+        self._store(key, entry, since)
+        return entry
+
+    def put_file(self, key: tuple, path: str, digest: str, size: int, media_type: str, mp_ids: list = None,
+                 headers: dict = None, since: int = None) -> dict:
+        """缓存流式生成后写入的文件"""
+        entry = self._entry(None, path, f'"{digest}"', size, media_type, mp_ids, headers)
+        try:
+            entry["mtime"] = os.stat(path).st_mtime_ns
+        except OSError:
+            return entry
+        self._store(key, entry, since)
+        return entry
+
+    @staticmethod
+    def _entry(body, path, etag, size, media_type, mp_ids, headers) -> dict:
+        now = time.time()
+        return {
+            "body": body,
+            "path": path,
+            "size": size,
+            "etag": etag,
+            "last_modified": formatdate(now, usegmt=True),
+            "created": now,
+            "media_type": media_type,
+            "headers": dict(headers or {}),
+            "mp_ids": [ALL] if mp_ids is None else list(mp_ids),
+        }
+
+    def _store(self, key: tuple, entry: dict, since: int = None):
+        capacity = self.capacity
+        memory = len(entry["body"]) if entry["body"] is not None else 0
+        if capacity <= 0 or memory > capacity:
+            return
+        with self._lock:
+            if since is not None and since != self.invalidations:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += memory
+            for mp_id in entry["mp_ids"]:
+                self._index.setdefault(mp_id, set()).add(key)
+            while self._size > capacity and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    @staticmethod
+    def _file_intact(entry: dict) -> bool:
+        """缓存文件未被删除或被重新生成(大小相同的文件按修改时间区分)"""
+        try:
+            stat = os.stat(entry["path"])
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry.get("mtime")
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry["body"] is not None:
+            self._size -= len(entry["body"])
+        for mp_id in entry["mp_ids"]:
+            keys = self._index.get(mp_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[mp_id]
+
+    def invalidate(self, mp_id: str = None):
+        """公众号文章变化时删除涉及该公众号的缓存(含全部文章订阅)，不传mp_id时清空"""
+        with self._lock:
+            if not mp_id:
+                keys = list(self._entries)
+            else:
+                keys = self._index.get(str(mp_id), set()) | self._index.get(ALL, set())
+            for key in list(keys):
+                self._remove(key)
+            self.invalidations += 1
+
+    def not_modified_since(self, request, entry: dict) -> bool:
+        """按 If-None-Match / If-Modified-Since 判断客户端缓存是否仍然有效"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or entry["etag"] in tags or f"W/{entry['etag']}" in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(entry["last_modified"])
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, request, entry: dict):
+        """根据条件请求返回304或完整内容"""
+        from fastapi.responses import Response
+        headers = {**entry["headers"], "ETag": entry["etag"], "Last-Modified": entry["last_modified"],
+                   "Cache-Control": "no-cache"}
+        if self.not_modified_since(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        self.bytes_served += entry["size"]
+        if entry["path"]:
+            from fastapi.responses import FileResponse
+            return FileResponse(entry["path"], media_type=entry["media_type"], headers=headers)
+        return Response(content=entry["body"], media_type=entry["media_type"], headers=headers)
+
+    def served(self, size: int):
+        """记录未经缓存直接输出(流式生成)的字节数"""
+        self.bytes_served += size
+
+    def get_info(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "not_modified": self.not_modified,
+                "bytes_served": self.bytes_served,
+                "invalidations": self.invalidations,
+            }
+
+
+FEED_CACHE = FeedCache()
@@ -0,0 +1,295 @@
+"""
+订阅源快照
+公众号采集完成(或正文更新)清除缓存时，在后台重新生成该公众号、包含它的标签和全部文章的默认订阅源(rss/atom/json)，
+原子写入缓存目录并预先计算ETag；/feed/{id}.{ext} 的默认请求直接返回快照文件，不查询数据库。
+等待重新生成的快照不再使用，请求退回实时生成，保证不会返回过期内容。
+"""
+import json
+import os
+import threading
+import time
+from email.utils import formatdate
+from core.config import cfg
+from core.print import print_error
+
+# 快照条目数，与 /feed/{id}.{ext} 的默认 limit 一致
+LIMIT = 50
+ALL = "all"
+
+
+class FeedSnapshots:
+    def __init__(self):
+        self._entries = None
+        self._pending = set()
+        self._building = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.builds = 0
+        self.failures = 0
+        self.hits = 0
+        self.build_seconds = 0.0
+        self.last_build = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(cfg.get("rss.snapshot", True))
+
+    @property
+    def formats(self) -> list:
+        from core.rss import RSS
+        value = str(cfg.get("rss.snapshot_formats", "rss,atom,json") or "")
+        return [ext.strip().lower() for ext in value.split(",") if ext.strip() and RSS.can_stream(ext.strip())]
+
+    @property
+    def domain(self) -> str:
+        """订阅源中的链接域名，只按 rss.base_url 配置生成快照；未配置该项时链接随请求的域名变化，不使用快照"""
+        return cfg.get("rss.base_url", None)
+
+    @property
+    def directory(self) -> str:
+        from core.rss import RSS
+        return os.path.normpath(os.path.join(RSS.cache_dir, "snapshot"))
+
+    @staticmethod
+    def target(feed_id: str = None, tag_id: str = None) -> tuple:
+        if tag_id:
+            return (None, str(tag_id))
+        return (str(feed_id or ALL), None)
+
+    def eligible(self, feed_id, tag_id, ext, limit, offset, kw, content_type, cursor, template) -> bool:
+        """只有默认参数的请求才使用快照"""
+        if tag_id and feed_id:
+            return False
+        return (self.enabled and ext in self.formats and limit == LIMIT and offset == 0 and not kw
+                and content_type is None and cursor is None and template is None)
+
+    def _name(self, target: tuple, ext: str) -> str:
+        feed_id, tag_id = target
+        name = f"tag_{tag_id}" if tag_id else f"feed_{feed_id}"
+        path = os.path.normpath(f"{self.directory}/{name}.{ext}")
+        if not path.startswith(self.directory):
+            raise ValueError("Invalid snapshot path: Path traversal detected.")
+        return path
+
+    def _load(self) -> dict:
+        """首次使用时从快照目录读取已有快照的元数据"""
+        if self._entries is not None:
+            return self._entries
+        entries = {}
+        if os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(".meta"):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, filename), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    target = (meta["feed_id"], meta["tag_id"])
+                    entries[(target, meta["ext"])] = meta
+                except Exception:
+                    continue
+        self._entries = entries
+        return entries
+
+    def get(self, feed_id: str, tag_id: str, ext: str, domain: str):
+        """返回可直接响应的快照(FEED_CACHE.response 使用的格式)，没有或正在重新生成时返回None"""
+        from core.rss import RSS
+        if domain != self.domain:
+            return None
+        target = self.target(feed_id, tag_id)
+        with self._cond:
+            if target in self._pending or target in self._building:
+                return None
+            meta = self._load().get((target, ext))
+        if meta is None or meta["domain"] != domain:
+            return None
+        if not self._intact(meta):
+            # 可能已被其它进程重新生成，重新读取元数据
+            meta = self._reload(target, ext)
+            if meta is None or meta["domain"] != domain or not self._intact(meta):
+                return None
+        if self._expired(meta):
+            # 遗漏失效时不会一直返回过期内容：超过 rss.cache_max_age 的快照重新生成
+            self.schedule_targets([target])
+            return None
+        self.hits += 1
+        return {
+            "body": None,
+            "path": meta["path"],
+            "size": meta["size"],
+            "etag": meta["etag"],
+            "last_modified": formatdate(meta["created"], usegmt=True),
+            "media_type": RSS(ext=ext).get_type(),
+            "headers": {},
+        }
+
+    def warm(self, feed_id: str, tag_id: str, ext: str, domain: str):
+        """订阅源存在但还没有可用快照时安排生成"""
+        if domain != self.domain:
+            return
+        target = self.target(feed_id, tag_id)
+        with self._cond:
+            meta = self._load().get((target, ext))
+            if target in self._pending or target in self._building:
+                return
+        if meta is None or meta["domain"] != domain:
+            self.schedule_targets([target])
+
+    @staticmethod
+    def _expired(meta: dict) -> bool:
+        max_age = float(cfg.get("rss.cache_max_age", 604800) or 0)
+        return max_age > 0 and time.time() - meta["created"] > max_age
+
+    @staticmethod
+    def _intact(meta: dict) -> bool:
+        try:
+            return os.path.getsize(meta["path"]) == meta["size"]
+        except OSError:
+            return False
+
+    def _reload(self, target: tuple, ext: str):
+        try:
+            with open(f"{self._name(target, ext)}.meta", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._cond:
+            self._load()[(target, ext)] = meta
+        return meta
+
+    def schedule(self, mp_id: str = ""):
+        """公众号文章变化：重新生成该公众号、包含它的标签和全部文章的快照，不传mp_id时重新生成全部快照"""
+        if not self.enabled:
+            return
+        targets = {self.target(ALL)}
+        if not mp_id:
+            with self._cond:
+                targets.update(target for target, _ in self._load())
+        else:
+            targets.add(self.target(mp_id))
+            try:
+                targets.update(self.target(tag_id=tag_id) for tag_id in self._tags_of(str(mp_id)))
+            except Exception as e:
+                # 不影响调用方(采集完成、正文更新)清除缓存
+                print_error(f"查询公众号所属标签失败 {mp_id}: {e}")
+        self.schedule_targets(targets)
+
+    def schedule_targets(self, targets):
+        if not self.enabled or self.domain is None:
+            return
+        with self._cond:
+            self._pending.update(targets)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="feed-snapshot", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    @staticmethod
+    def _tags_of(mp_id: str) -> list:
+        from core.db import DB
+        from core.models.tags import Tags
+        session = DB.session_factory()
+        try:
+            tag_ids = []
+            for tag_id, mps_id in session.query(Tags.id, Tags.mps_id).all():
+                try:
+                    if any(str(mp["id"]) == mp_id for mp in json.loads(mps_id or "[]")):
+                        tag_ids.append(tag_id)
+                except (TypeError, ValueError, KeyError):
+                    continue
+            return tag_ids
+        finally:
+            session.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 合并短时间内连续采集的多个公众号，全部文章和标签快照只生成一次
+            time.sleep(float(cfg.get("rss.snapshot_delay", 5) or 0))
+            with self._cond:
+                targets, self._pending = self._pending, set()
+                self._building = set(targets)
+            for target in targets:
+                try:
+                    self._build(target)
+                except Exception as e:
+                    self.failures += 1
+                    print_error(f"生成订阅源快照失败 {target}: {e}")
+                finally:
+                    with self._cond:
+                        self._building.discard(target)
+
+    def _build(self, target: tuple):
+        domain = self.domain
+        if domain is None:
+            # 未配置 rss.base_url，链接域名随请求变化
+            return
+        from core.db import DB
+        from core.models.article import Article
+        from core.rss import RSS
+        from apis.rss import _feed_query, _stream_items
+        feed_id, tag_id = target
+        begin = time.time()
+        session = DB.session_factory()
+        try:
+            feed, query, cache_mps = _feed_query(session, feed_id, tag_id, domain)
+            if not feed or (tag_id and cache_mps is None):
+                # 公众号或标签已删除
+                self.remove(target)
+                return
+            query = query.order_by(Article.publish_time.desc(), Article.id.desc()).limit(LIMIT)
+            for ext in self.formats:
+                path = self._name(target, ext)
+                rss = RSS(name=os.path.splitext(os.path.basename(path))[0], cache_dir=self.directory, ext=ext)
+
+                def on_complete(path, digest, size, ext=ext):
+                    self._commit(target, ext, path, f'"{digest}"', size, domain)
+
+                for _ in rss.stream(_stream_items(query, rss, domain), ext, on_complete=on_complete,
+                                    title=f"{feed.mp_name}", link=domain, description=feed.mp_intro,
+                                    image_url=feed.mp_cover):
+                    pass
+        finally:
+            session.close()
+        self.builds += 1
+        self.build_seconds += time.time() - begin
+        self.last_build = int(time.time())
+
+    def _commit(self, target: tuple, ext: str, path: str, etag: str, size: int, domain: str):
+        """快照文件已原子替换，写入元数据(同样先写临时文件再替换)"""
+        meta = {"feed_id": target[0], "tag_id": target[1], "ext": ext, "path": path, "etag": etag,
+                "size": size, "domain": domain, "created": int(time.time())}
+        tmp_path = f"{path}.meta.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, f"{path}.meta")
+        with self._cond:
+            self._load()[(target, ext)] = meta
+
+    def remove(self, target: tuple):
+        with self._cond:
+            entries = self._load()
+            for ext in list(self.formats):
+                entries.pop((target, ext), None)
+                path = self._name(target, ext)
+                for file_path in (path, f"{path}.meta"):
+                    if os.path.exists(file_path):
+                        os.unlink(file_path)
+
+    def get_info(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "snapshots": len(self._load()),
+                "pending": len(self._pending),
+                "building": len(self._building),
+                "hits": self.hits,
+                "builds": self.builds,
+                "failures": self.failures,
+                "avg_build_seconds": round(self.build_seconds / self.builds, 3) if self.builds else 0,
+                "last_build": self.last_build,
+            }
+
+
+SNAPSHOTS = FeedSnapshots()
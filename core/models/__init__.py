@@ -1,5 +1,9 @@
 # 导入文章模型
-from .article import Article 
+from .article import Article, ArticleContent
+# 导入正文采集队列模型
+from .content_fetch import ContentFetchJob
+# 导入持久化队列任务模型
+from .queue_job import QueueJob
 # 导入订阅源模型
 from .feed import Feed
 # 导入用户模型
@@ -1,7 +1,15 @@
-from  .base import Base,Column,String,Integer,DateTime,Text,DATA_STATUS
+from  .base import Base,Column,String,Integer,DateTime,Text,Blob,DATA_STATUS
+from sqlalchemy import Index
+from sqlalchemy.orm import relationship
 class ArticleBase(Base):
     from_attributes = True
     __tablename__ = 'articles'
+    __table_args__ = (
+        # 按公众号查询文章并按发布时间排序(RSS/文章列表)
+        Index('idx_articles_mp_id_publish_time','mp_id','publish_time'),
+        # 按状态过滤并按发布时间排序
+        Index('idx_articles_status_publish_time','status','publish_time'),
+    )
     id = Column(String(255), primary_key=True)
     mp_id = Column(String(255))
     title = Column(String(1000))
@@ -11,7 +19,68 @@ class ArticleBase(Base):
     status = Column(Integer,default=1)
     publish_time = Column(Integer,index=True)
     created_at = Column(DateTime)
-    updated_at = Column(DateTime)  
+    updated_at = Column(DateTime)
     is_export = Column(Integer)
-class Article(ArticleBase):
+    # 正文单独存放在 article_contents 表，列表和统计只需读取下面两个字段
+    has_content = Column(Integer,default=0,index=True)
+    content_length = Column(Integer,default=0)
+
+class ArticleContent(Base):
+    """文章正文，与文章元数据分表存放"""
+    from_attributes = True
+    __tablename__ = 'article_contents'
+    article_id = Column(String(255), primary_key=True)
+    # 未压缩的正文(article.compress为none时使用)
     content = Column(Text)
+    # 压缩后的正文，见 core.content_codec
+    data = Column(Blob)
+    # 正文纯文本，用于全文检索
+    plain_text = Column(Text)
+    # 正文原始字节数，用于统计压缩节省的空间
+    raw_size = Column(Integer)
+    updated_at = Column(DateTime)
+
+    @staticmethod
+    def pack(content: str) -> dict:
+        """把正文HTML转换为要写入的字段"""
+        from core.content_codec import compress_content, html_to_text
+        from core.config import cfg
+        data = compress_content(content)
+        return {
+            "content": None if data is not None else content,
+            "data": data,
+            "plain_text": html_to_text(content) if cfg.get("search.fts", True) else None,
+            "raw_size": len(content.encode("utf-8")) if content else 0,
+        }
+
+    def unpack(self) -> str:
+        if self.data is not None:
+            from core.content_codec import decompress_content
+            return decompress_content(self.data)
+        return self.content
+
+class Article(ArticleBase):
+    # 正文按需加载(访问content时才查询)，需要批量读取正文时使用 selectinload(Article.body)
+    body = relationship(ArticleContent,
+                        primaryjoin="foreign(ArticleContent.article_id)==Article.id",
+                        uselist=False, lazy="select", cascade="all, delete-orphan")
+
+    @property
+    def content(self):
+        return self.body.unpack() if self.body is not None else None
+
+    @content.setter
+    def content(self, value):
+        if self.body is None:
+            self.body = ArticleContent(article_id=self.id)
+        for key, val in ArticleContent.pack(value).items():
+            setattr(self.body, key, val)
+        self.body.updated_at = self.updated_at
+        self.has_content = 1 if value else 0
+        self.content_length = len(value) if value else 0
+
+    def to_dict(self, with_content: bool = True) -> dict:
+        data = {c.name: getattr(self, c.name) for c in ArticleBase.__table__.columns}
+        if with_content:
+            data["content"] = self.content
+        return data
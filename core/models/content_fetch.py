@@ -0,0 +1,22 @@
+from  .base import Base,Column,String,Integer,DateTime,DATA_STATUS
+from sqlalchemy import Index
+class ContentFetchJob(Base):
+    """待采集正文的文章(两阶段采集中正文采集阶段的持久化队列)"""
+    __tablename__ = 'content_fetch_jobs'
+    __table_args__ = (
+        # 按状态取出已到执行时间的任务
+        Index('idx_content_fetch_jobs_status_next_at','status','next_at'),
+    )
+    # 文章ID，与 articles.id 一致
+    article_id = Column(String(255), primary_key=True)
+    mp_id = Column(String(255))
+    url = Column(String(500))
+    # PENDING 等待采集，FAILED 超过重试次数
+    status = Column(Integer,default=DATA_STATUS.PENDING)
+    # 已尝试次数
+    attempts = Column(Integer,default=0)
+    # 下次可执行的时间戳，取出任务时顺延作为租约，进程退出后任务会自动重新执行
+    next_at = Column(Integer,default=0)
+    last_error = Column(String(500))
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
@@ -27,7 +27,7 @@ class MessageTask(Base):
     # 定义 cron_exp 表达式
     cron_exp=Column(String(100),nullable='* * 1 * *')
     # 定义任务状态字段，默认值为 pending
-    status = Column(Integer, default=0)
+    status = Column(Integer, default=0, index=True)
     # 定义创建时间字段，默认值为当前 UTC 时间
     created_at = Column(DateTime)
     # 定义更新时间字段，默认值为当前 UTC 时间，更新时自动更新为当前时间
@@ -0,0 +1,28 @@
+from  .base import Base,Column,String,Integer,DateTime,Text,DATA_STATUS
+from sqlalchemy import Index
+class QueueJob(Base):
+    """持久化的队列任务，保存可序列化的任务描述，重启后继续执行"""
+    __tablename__ = 'queue_jobs'
+    __table_args__ = (
+        # 按队列取出待执行任务
+        Index('idx_queue_jobs_queue_status','queue','status','visible_at'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # 队列名称(TaskQueueManager.tag)
+    queue = Column(String(255))
+    # 任务处理函数，格式为 模块:函数名
+    handler = Column(String(255))
+    # 处理函数的关键字参数(JSON)
+    payload = Column(Text)
+    # 互斥键，同一key的任务不会同时执行
+    key = Column(String(255))
+    # 优先级通道，见 core.queue.queue.LANES
+    lane = Column(String(50))
+    # PENDING 待执行，FAILED 超过重试次数(死信)
+    status = Column(Integer,default=DATA_STATUS.PENDING)
+    attempts = Column(Integer,default=0)
+    # 任务可被取出的时间戳，执行时顺延作为可见性超时，进程崩溃后超时即重新执行
+    visible_at = Column(Integer,default=0)
+    last_error = Column(String(500))
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
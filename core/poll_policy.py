@@ -0,0 +1,162 @@
+"""
+自适应采集频率
+按公众号历史文章的发布时间估算发文频率和常用发文时段，活跃的公众号采集更频繁，
+长期不更新的公众号很少采集；所有公众号的采集次数受全局预算(次/小时)约束。
+开启 gather.adaptive_polling 后，定时任务触发时只采集到期的公众号。
+"""
+import time
+import threading
+from datetime import datetime
+from core.config import cfg
+
+# 每个预期发文间隔内的采集次数
+POLLS_PER_POST = 12
+# 常用发文时段内采集间隔缩短的倍数
+PEAK_BOOST = 4
+# 统计时间窗口内发文时段占比超过平均值的该倍数即视为常用时段
+PEAK_RATIO = 2.0
+# 到期判断的容差，避免因定时任务周期对不齐而多等一个周期
+DUE_SLACK = 0.9
+
+
+class PollPolicy:
+    def __init__(self, min_interval: int = None, max_interval: int = None, history_days: int = None):
+        self.min_interval = int(min_interval or cfg.get("gather.adaptive_min_interval", 600) or 600)
+        self.max_interval = int(max_interval or cfg.get("gather.adaptive_max_interval", 86400) or 86400)
+        self.history_days = int(history_days or cfg.get("gather.adaptive_history_days", 60) or 60)
+
+    def estimate(self, publish_times: list, now: float) -> dict:
+        """根据截止到now的发布时间估算发文频率(篇/天)和各小时发文分布"""
+        since = now - self.history_days * 86400
+        recent = [t for t in publish_times if since <= t <= now]
+        hours = [0] * 24
+        for t in recent:
+            hours[datetime.fromtimestamp(t).hour] += 1
+        return {
+            # 加0.5篇的先验，没有文章的公众号也有一个很低的频率
+            "rate": (len(recent) + 0.5) / self.history_days,
+            "hours": hours,
+            "last": max(recent) if recent else None,
+        }
+
+    def in_peak(self, stats: dict, now: float) -> bool:
+        """当前时间(含前后一小时)是否为该公众号的常用发文时段"""
+        total = sum(stats["hours"])
+        if total < 3:
+            return False
+        hour = datetime.fromtimestamp(now).hour
+        share = sum(stats["hours"][(hour + d) % 24] for d in (-1, 0, 1)) / total
+        return share >= PEAK_RATIO * 3 / 24
+
+    def interval(self, stats: dict, now: float) -> float:
+        """期望的采集间隔(秒)，未考虑全局预算"""
+        interval = 86400 / stats["rate"] / POLLS_PER_POST
+        if self.in_peak(stats, now):
+            interval /= PEAK_BOOST
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def plan(self, histories: dict, now: float, budget: float = None) -> dict:
+        """计算各公众号的采集间隔 {mp_id: 秒}
+
+        Args:
+            histories: {mp_id: [publish_time, ...]}
+            budget: 全局采集预算(次/小时)，超出时按比例拉长所有间隔
+        """
+        intervals = {mp_id: self.interval(self.estimate(times, now), now) for mp_id, times in histories.items()}
+        return self.fit_budget(intervals, budget)
+
+    @staticmethod
+    def fit_budget(intervals: dict, budget: float = None) -> dict:
+        """总采集次数超出预算(次/小时)时按比例拉长所有间隔"""
+        budget = float(budget if budget is not None else cfg.get("gather.adaptive_budget", 120) or 0)
+        demand = sum(3600 / v for v in intervals.values())
+        if budget > 0 and demand > budget:
+            scale = demand / budget
+            intervals = {mp_id: v * scale for mp_id, v in intervals.items()}
+        return intervals
+
+    @staticmethod
+    def is_due(last_poll: float, interval: float, now: float) -> bool:
+        return not last_poll or now - last_poll >= interval * DUE_SLACK
+
+
+class PollPlanner:
+    """从数据库读取发布时间和上次采集时间，筛选到期的公众号"""
+    def __init__(self):
+        self.policy = None
+        self._lock = threading.Lock()
+        self._histories = {}
+        self._loaded_at = 0
+        self._last_plan = {}
+        # 各定时任务采集的公众号 {task_id: [mp_id, ...]}，预算按全部任务的公众号合计
+        self._scheduled = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(cfg.get("gather.adaptive_polling", False))
+
+    def schedule(self, task_id: str, feed_ids: list):
+        """登记定时任务采集的公众号"""
+        with self._lock:
+            self._scheduled[str(task_id)] = list(feed_ids)
+
+    def reset(self):
+        """定时任务重载时清空登记"""
+        with self._lock:
+            self._scheduled = {}
+            self._last_plan = {}
+
+    def _load_histories(self, mp_ids: list, now: float) -> dict:
+        """读取发布时间历史，缓存一小时(发文频率变化很慢)"""
+        from core.db import DB
+        from core.models.article import Article
+        with self._lock:
+            missing = [mp_id for mp_id in mp_ids if mp_id not in self._histories]
+            if now - self._loaded_at > 3600:
+                missing, self._histories = list(mp_ids), {}
+                self._loaded_at = now
+            if missing:
+                since = int(now - self.policy.history_days * 86400)
+                session = DB.get_session()
+                rows = session.query(Article.mp_id, Article.publish_time) \
+                    .filter(Article.mp_id.in_(missing), Article.publish_time >= since).all()
+                session.commit()
+                for mp_id in missing:
+                    self._histories[mp_id] = []
+                for mp_id, publish_time in rows:
+                    self._histories[mp_id].append(publish_time or 0)
+            return {mp_id: self._histories.get(mp_id, []) for mp_id in mp_ids}
+
+    def due_feeds(self, feeds: list, now: float = None) -> list:
+        """返回本次需要采集的公众号"""
+        from core.db import DB
+        from core.models.feed import Feed
+        now = now or time.time()
+        self.policy = PollPolicy()
+        ids = [feed.id for feed in feeds]
+        if not ids:
+            return []
+        # 多个定时任务各自触发，预算按全部任务公众号的并集分配，同一公众号只计一次
+        with self._lock:
+            planned = list(dict.fromkeys([mp_id for feed_ids in self._scheduled.values() for mp_id in feed_ids] + ids))
+        session = DB.get_session()
+        # 上次采集时间从数据库重新读取，定时任务注册时的公众号对象可能已过期
+        sync_times = dict(session.query(Feed.id, Feed.sync_time).filter(Feed.id.in_(ids)).all())
+        session.commit()
+        intervals = self.policy.plan(self._load_histories(planned, now), now)
+        self._last_plan = intervals
+        return [feed for feed in feeds if self.policy.is_due(sync_times.get(feed.id), intervals[feed.id], now)]
+
+    def get_info(self) -> dict:
+        intervals = list(self._last_plan.values())
+        return {
+            "enabled": self.enabled,
+            "feeds": len(intervals),
+            "min_interval": round(min(intervals)) if intervals else 0,
+            "max_interval": round(max(intervals)) if intervals else 0,
+            "polls_per_hour": round(sum(3600 / v for v in intervals), 1) if intervals else 0,
+            "budget": cfg.get("gather.adaptive_budget", 120),
+        }
+
+
+POLL_PLANNER = PollPlanner()
@@ -2,17 +2,119 @@ import queue
 import threading
 import time
 import gc
+import json
+import importlib
+from datetime import datetime
+from collections import deque
 from typing import Callable, Any, Optional
 from core.print import print_error, print_info, print_warning, print_success
+from core.config import cfg
+# 优先级通道及权重：交互刷新 > 新订阅回填 > 定时同步 > 正文修复
+LANES={"interactive":8,"backfill":4,"scheduled":2,"repair":1}
+DEFAULT_LANE="scheduled"
+class LaneQueue:
+    """按通道加权公平调度的任务队列，接口与 queue.Queue 的常用方法一致
+
+    各通道按权重平滑轮询(权重越大被取出的机会越多)，任一通道队首任务等待超过
+    gather.queue_max_wait 秒时优先取出，避免低优先级任务饿死。
+    """
+    def __init__(self, lanes: dict = None):
+        self.weights=dict(lanes or LANES)
+        self._lanes={lane:deque() for lane in self.weights}
+        self._current={lane:0 for lane in self.weights}
+        self._stats={lane:{"dequeued":0,"wait_total":0.0,"wait_max":0.0} for lane in self.weights}
+        self._cond=threading.Condition()
+    def put(self, item, lane: str = DEFAULT_LANE) -> None:
+        lane=lane if lane in self._lanes else DEFAULT_LANE
+        with self._cond:
+            self._lanes[lane].append((time.time(),item))
+            self._cond.notify()
+    def _pick(self) -> Optional[str]:
+        ready=[lane for lane,items in self._lanes.items() if items]
+        if not ready:
+            return None
+        now=time.time()
+        max_wait=float(cfg.get("gather.queue_max_wait",600) or 600)
+        starving=[lane for lane in ready if now-self._lanes[lane][0][0]>=max_wait]
+        if starving:
+            return min(starving,key=lambda lane:self._lanes[lane][0][0])
+        total=0
+        for lane in ready:
+            self._current[lane]+=self.weights[lane]
+            total+=self.weights[lane]
+        lane=max(ready,key=lambda l:self._current[l])
+        self._current[lane]-=total
+        return lane
+    def _take(self):
+        lane=self._pick()
+        if lane is None:
+            raise queue.Empty
+        enqueued,item=self._lanes[lane].popleft()
+        wait=time.time()-enqueued
+        stat=self._stats[lane]
+        stat["dequeued"]+=1
+        stat["wait_total"]+=wait
+        stat["wait_max"]=max(stat["wait_max"],wait)
+        return item
+    def get(self, timeout: float = None):
+        with self._cond:
+            if not self._cond.wait_for(lambda:any(self._lanes.values()),timeout=timeout):
+                raise queue.Empty
+            return self._take()
+    def get_nowait(self):
+        with self._cond:
+            return self._take()
+    def task_done(self) -> None:
+        pass
+    def qsize(self) -> int:
+        with self._cond:
+            return sum(len(items) for items in self._lanes.values())
+    def empty(self) -> bool:
+        return self.qsize()==0
+    def info(self) -> dict:
+        """各通道排队数量、队首等待时间与已取出任务的平均/最大等待时间(秒)"""
+        now=time.time()
+        with self._cond:
+            result={}
+            for lane,items in self._lanes.items():
+                stat=self._stats[lane]
+                result[lane]={
+                    "weight":self.weights[lane],
+                    "depth":len(items),
+                    "oldest_wait":round(now-items[0][0],2) if items else 0,
+                    "dequeued":stat["dequeued"],
+                    "avg_wait":round(stat["wait_total"]/stat["dequeued"],2) if stat["dequeued"] else 0,
+                    "max_wait":round(stat["wait_max"],2),
+                }
+            return result
 class TaskQueueManager:
-    """任务队列管理器，用于管理和执行排队任务"""
+    """任务队列管理器，用于管理和执行排队任务
+
+    workers>1 时由多个线程并发执行任务；通过 add_exclusive_task 添加的任务按 key 互斥，
+    同一 key(如同一公众号)的任务不会同时执行，按添加顺序依次运行。
+    通过 add_durable_task 添加的任务保存在 queue_jobs 表中，至少执行一次，失败重试，
+    超过重试次数转为死信；进程重启后由 recover 恢复未完成的任务。
+    """
     
-    def __init__(self,maxsize=0,tag:str=""):
+    def __init__(self,maxsize=0,tag:str="",workers:int=1):
         """初始化任务队列"""
-        self._queue = queue.Queue(maxsize=maxsize)
+        self._queue = LaneQueue()
         self._lock = threading.Lock()
         self._is_running = False
         self.tag=tag
+        self.workers=max(int(workers or 1),1)
+        # 正在执行的互斥key，以及因同一key正在执行而暂存的任务
+        self._running_keys=set()
+        self._deferred={}
+        self._worker_stats=[]
+        self._idle_collected=True
+        # 已放入内存队列、尚未开始执行的持久化任务ID
+        self._queued_jobs=set()
+        # 各处理函数被合并掉的重复任务数
+        self._coalesced={}
+        # 暂停取任务直到该时间(如触发频率限制熔断)，到期自动恢复
+        self._paused_until=0.0
+        self._pause_reason=None
         
     def add_task(self, task: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
         """添加任务到队列
@@ -22,9 +124,190 @@ class TaskQueueManager:
             *args: 任务函数的参数
             **kwargs: 任务函数的关键字参数
         """
-        with self._lock:
-            self._queue.put((task, args, kwargs))
+        self.add_lane_task(DEFAULT_LANE, None, task, *args, **kwargs)
+    def add_exclusive_task(self, key: str, task: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """添加按key互斥的任务，同一key的任务不会被多个线程同时执行
+        
+        Args:
+            key: 互斥键，如公众号ID
+            task: 要执行的任务函数
+        """
+        self.add_lane_task(DEFAULT_LANE, key, task, *args, **kwargs)
+    def add_lane_task(self, lane: str, key: Optional[str], task: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """添加任务到指定优先级通道
+        
+        Args:
+            lane: 通道名称，见 LANES(interactive/backfill/scheduled/repair)
+            key: 互斥键，不需要互斥时为None
+            task: 要执行的任务函数
+        """
+        self._queue.put((task, args, kwargs, key), lane)
+        print_success(f"{self.tag}队列任务添加成功\n")
+    def add_durable_task(self, handler: str, payload: dict = None, key: str = None, lane: str = DEFAULT_LANE,
+                         coalesce: bool = True, delay: float = 0) -> Optional[int]:
+        """添加持久化任务
+        
+        Args:
+            handler: 处理函数，格式为 模块:函数名，如 jobs.mps:collect_feed
+            payload: 处理函数的关键字参数，需可JSON序列化
+            key: 互斥键，如公众号ID
+            lane: 优先级通道
+            coalesce: 与排队中(尚未开始执行)的同一处理函数、同一key的任务合并，
+                列表参数取并集，其它参数须相同才合并
+            delay: 延迟执行的秒数(用于错开定时任务)
+        
+        Returns:
+            任务ID(合并时为已有任务的ID)，写入数据库失败返回None
+        """
+        from core.db import DB
+        from core.models.queue_job import QueueJob
+        from core.models.base import DATA_STATUS
+        now=datetime.now()
+        delay=max(float(delay or 0),0)
+        visible_at=int(time.time()+delay) if delay else 0
+        session=DB.get_session()
+        try:
+            if coalesce and key is not None:
+                job_id=self._coalesce_durable(session,handler,payload or {},key,lane,visible_at)
+                if job_id is not None:
+                    return job_id
+            job=QueueJob(queue=self.tag,handler=handler,payload=json.dumps(payload or {},ensure_ascii=False),key=key,lane=lane,
+                         status=DATA_STATUS.PENDING,attempts=0,visible_at=visible_at,created_at=now,updated_at=now)
+            session.add(job)
+            session.commit()
+            job_id=job.id
+        except Exception as e:
+            session.rollback()
+            print_error(f"{self.tag}持久化任务添加失败: {e}")
+            return None
+        self._schedule_durable(job_id,key,delay,lane)
         print_success(f"{self.tag}队列任务添加成功\n")
+        return job_id
+    def _coalesce_durable(self, session, handler: str, payload: dict, key: str, lane: str, visible_at: int = 0) -> Optional[int]:
+        """尝试合并到排队中的同类任务，成功返回已有任务ID"""
+        from core.models.queue_job import QueueJob
+        from core.models.base import DATA_STATUS
+        candidates=session.query(QueueJob.id,QueueJob.payload,QueueJob.lane,QueueJob.visible_at) \
+            .filter(QueueJob.queue==self.tag,QueueJob.handler==handler,QueueJob.key==key,
+                    QueueJob.status==DATA_STATUS.PENDING,QueueJob.attempts==0) \
+            .order_by(QueueJob.id).all()
+        for job_id,old_payload,old_lane,old_visible_at in candidates:
+            merged=self._merge_payload(json.loads(old_payload or "{}"),payload)
+            if merged is None:
+                continue
+            old_lane=old_lane or DEFAULT_LANE
+            # 新任务优先级更高时提升到新通道
+            new_lane=lane if LANES.get(lane,0)>LANES.get(old_lane,0) else old_lane
+            # 取两者中较早的执行时间
+            new_visible_at=min(old_visible_at or 0,visible_at)
+            # 只更新尚未被取出执行的任务，取出时会增加attempts
+            updated=session.query(QueueJob).filter(QueueJob.id==job_id,QueueJob.attempts==0,
+                                                   QueueJob.status==DATA_STATUS.PENDING) \
+                .update({QueueJob.payload:json.dumps(merged,ensure_ascii=False),QueueJob.lane:new_lane,
+                         QueueJob.visible_at:new_visible_at,QueueJob.updated_at:datetime.now()},synchronize_session=False)
+            session.commit()
+            if not updated:
+                continue
+            with self._lock:
+                self._coalesced[handler]=self._coalesced.get(handler,0)+1
+            if new_lane!=old_lane or new_visible_at<(old_visible_at or 0):
+                self._schedule_durable(job_id,key,new_visible_at-time.time(),new_lane,force=True)
+            print_info(f"{self.tag}任务[{handler}:{key}]已在队列中，合并执行")
+            return job_id
+        return None
+    @staticmethod
+    def _merge_payload(old: dict, new: dict) -> Optional[dict]:
+        if set(old.keys())!=set(new.keys()):
+            return None
+        merged={}
+        for name,value in old.items():
+            if isinstance(value,list) and isinstance(new[name],list):
+                merged[name]=value+[v for v in new[name] if v not in value]
+            elif value==new[name]:
+                merged[name]=value
+            else:
+                return None
+        return merged
+    def _put_durable(self, job_id: int, key: str = None, lane: str = DEFAULT_LANE, force: bool = False) -> None:
+        with self._lock:
+            if job_id in self._queued_jobs and not force:
+                return
+            self._queued_jobs.add(job_id)
+        self._queue.put((self._run_durable, (job_id,), {}, key), lane)
+    def recover(self) -> int:
+        """把数据库中未完成的持久化任务重新放入队列(启动或重新登录后调用)"""
+        from core.db import DB
+        from core.models.queue_job import QueueJob
+        from core.models.base import DATA_STATUS
+        try:
+            session=DB.get_session()
+            jobs=session.query(QueueJob.id,QueueJob.key,QueueJob.visible_at,QueueJob.lane) \
+                .filter(QueueJob.queue==self.tag,QueueJob.status==DATA_STATUS.PENDING) \
+                .order_by(QueueJob.id).all()
+            session.commit()
+        except Exception as e:
+            print_error(f"{self.tag}恢复持久化任务失败: {e}")
+            return 0
+        now=int(time.time())
+        for job_id,key,visible_at,lane in jobs:
+            self._schedule_durable(job_id,key,(visible_at or 0)-now,lane or DEFAULT_LANE)
+        if jobs:
+            print_success(f"{self.tag}恢复{len(jobs)}个未完成的任务")
+        return len(jobs)
+    def _schedule_durable(self, job_id: int, key: str, delay: float, lane: str = DEFAULT_LANE, force: bool = False) -> None:
+        if delay<=0:
+            self._put_durable(job_id,key,lane,force)
+            return
+        timer=threading.Timer(delay,self._put_durable,args=(job_id,key,lane,force))
+        timer.daemon=True
+        timer.start()
+    def _run_durable(self, job_id: int) -> None:
+        """执行持久化任务：先顺延可见时间再执行，成功后删除；失败按重试次数退避或转为死信"""
+        from core.db import DB
+        from core.models.queue_job import QueueJob
+        from core.models.base import DATA_STATUS
+        with self._lock:
+            self._queued_jobs.discard(job_id)
+        session=DB.get_session()
+        now=int(time.time())
+        timeout=int(cfg.get("gather.queue_visibility_timeout",1800) or 1800)
+        claimed=session.query(QueueJob).filter(QueueJob.id==job_id,QueueJob.status==DATA_STATUS.PENDING,
+                                               QueueJob.visible_at<=now) \
+            .update({QueueJob.visible_at:now+timeout,QueueJob.attempts:QueueJob.attempts+1},synchronize_session=False)
+        session.commit()
+        if not claimed:
+            return
+        job=session.get(QueueJob,job_id)
+        handler,payload,attempts,key,lane=job.handler,job.payload,job.attempts,job.key,job.lane or DEFAULT_LANE
+        session.commit()
+        try:
+            module,name=handler.split(":",1)
+            func=getattr(importlib.import_module(module),name)
+            func(**json.loads(payload or "{}"))
+        except Exception as e:
+            retries=int(cfg.get("gather.queue_retries",3) or 3)
+            values={QueueJob.last_error:str(e)[:500],QueueJob.updated_at:datetime.now()}
+            # 异常带 retry_after(如触发频率限制)：等熔断结束后重试，不计入失败次数
+            retry_after=getattr(e,"retry_after",None)
+            if retry_after is not None:
+                delay=max(float(retry_after),1)
+                values[QueueJob.visible_at]=int(time.time()+delay)
+                values[QueueJob.attempts]=attempts-1
+                print_warning(f"{self.tag}任务[{handler}]中断，{delay:.0f}秒后重试: {e}")
+            elif attempts>=retries:
+                values[QueueJob.status]=DATA_STATUS.FAILED
+                print_error(f"{self.tag}任务[{handler}]失败{attempts}次，转为死信: {e}")
+            else:
+                delay=60*2**(attempts-1)
+                values[QueueJob.visible_at]=int(time.time())+delay
+                print_warning(f"{self.tag}任务[{handler}]执行失败，{delay}秒后重试: {e}")
+            session.query(QueueJob).filter(QueueJob.id==job_id).update(values,synchronize_session=False)
+            session.commit()
+            if retry_after is not None or attempts<retries:
+                self._schedule_durable(job_id,key,delay,lane)
+            return
+        session.query(QueueJob).filter(QueueJob.id==job_id).delete(synchronize_session=False)
+        session.commit()
     def run_task_background(self)->None:
         threading.Thread(target=self.run_tasks, daemon=True).start()  
         print_warning("队列任务后台运行")
@@ -38,40 +321,99 @@ class TaskQueueManager:
             if self._is_running:
                 return
             self._is_running = True
-            
+            now=time.time()
+            self._worker_stats=[{"worker":i,"started":now,"busy":0.0,"tasks":0,"failed":0,"current":None,"since":None}
+                                for i in range(self.workers)]
+        for index in range(1,self.workers):
+            threading.Thread(target=self._work, args=(index,timeout), daemon=True).start()
         try:
-            while self._is_running:
-                time.sleep(0.1)  # 避免过于频繁的任务获取 
-                try:
-                    # 阻塞获取任务，避免CPU空转
-                    task, args, kwargs = self._queue.get(timeout=timeout)
-                    
-                    try:
-                        # 记录任务开始时间
-                        start_time = time.time()
-                        task(*args, **kwargs)
-                        # 记录任务执行时间
-                        duration = time.time() - start_time
-                        print_info(f"\n任务执行完成，耗时: {duration:.2f}秒")
-                    except Exception as e:
-                        print_error(f"队列任务执行失败: {e}")
-                        # raise
-                    finally:
-                        # 确保任务完成标记和资源释放
-                        self._queue.task_done()
-                        # 强制垃圾回收
-                        gc.collect()
-                    
-                except queue.Empty:
-                    # 超时无任务，继续检查运行状态
-                    continue
-                    
+            self._work(0,timeout)
         finally:
             # 确保停止状态设置和资源清理
             with self._lock:
                 self._is_running = False
             # 清理可能残留的资源
             gc.collect()
+
+    def pause(self, seconds: float, reason: str = "") -> None:
+        """暂停取任务seconds秒(已在执行的任务不受影响)，到期自动恢复；多次暂停取最晚的结束时间"""
+        with self._lock:
+            until=time.time()+seconds
+            if until>self._paused_until:
+                self._paused_until=until
+                self._pause_reason=reason
+        print_warning(f"{self.tag}暂停{seconds:.0f}秒: {reason}")
+    def _wait_paused(self, timeout: float) -> bool:
+        """处于暂停期时等待(最长timeout秒)并返回True"""
+        remaining=self._paused_until-time.time()
+        if remaining>0:
+            time.sleep(min(remaining,timeout))
+            return True
+        if self._pause_reason is not None:
+            with self._lock:
+                if self._pause_reason is not None and self._paused_until<=time.time():
+                    print_success(f"{self.tag}恢复执行: {self._pause_reason}")
+                    self._pause_reason=None
+        return False
+    def _work(self, index: int, timeout: float) -> None:
+        """单个工作线程：取任务执行，互斥key正在执行时暂存，由持有该key的线程执行完后接着执行"""
+        while self._is_running:
+            if self._wait_paused(timeout):
+                continue
+            try:
+                # 阻塞获取任务，避免CPU空转
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # 空闲时回收一次内存，不在每个任务后强制回收
+                if not self._idle_collected:
+                    self._idle_collected = True
+                    gc.collect()
+                continue
+            self._idle_collected = False
+            key = item[3]
+            with self._lock:
+                if key is not None:
+                    if key in self._running_keys:
+                        self._deferred.setdefault(key, deque()).append(item)
+                        continue
+                    self._running_keys.add(key)
+            while item is not None:
+                self._execute(index, item)
+                if key is None:
+                    break
+                with self._lock:
+                    pending = self._deferred.get(key)
+                    if pending:
+                        item = pending.popleft()
+                        if not pending:
+                            del self._deferred[key]
+                    else:
+                        item = None
+                        self._running_keys.discard(key)
+
+    def _execute(self, index: int, item: tuple) -> None:
+        task, args, kwargs, key = item
+        stat = self._worker_stats[index]
+        # 记录任务开始时间
+        start_time = time.time()
+        stat["current"] = key or getattr(task, "__name__", str(task))
+        stat["since"] = start_time
+        try:
+            task(*args, **kwargs)
+            # 记录任务执行时间
+            duration = time.time() - start_time
+            print_info(f"\n任务执行完成，耗时: {duration:.2f}秒")
+        except Exception as e:
+            stat["failed"] += 1
+            print_error(f"队列任务执行失败: {e}")
+            # raise
+        finally:
+            stat["busy"] += time.time() - start_time
+            stat["tasks"] += 1
+            stat["current"] = None
+            stat["since"] = None
+            # 确保任务完成标记
+            self._queue.task_done()
     
     def stop(self) -> None:
         """停止任务执行"""
@@ -86,15 +428,55 @@ class TaskQueueManager:
             dict: 包含队列信息的字典，包括:
                 - is_running: 队列是否正在运行
                 - pending_tasks: 等待执行的任务数量
+                - running_keys: 正在执行的互斥key
+                - paused: 暂停剩余秒数与原因
+                - workers: 各工作线程已执行任务数、当前任务与利用率(忙碌时间/运行时间)
         """
+        now=time.time()
         with self._lock:
+            workers=[]
+            for stat in self._worker_stats:
+                busy=stat["busy"]+(now-stat["since"] if stat["since"] else 0)
+                elapsed=now-stat["started"]
+                workers.append({
+                    "worker":stat["worker"],
+                    "tasks":stat["tasks"],
+                    "failed":stat["failed"],
+                    "current":stat["current"],
+                    "busy_seconds":round(busy,2),
+                    "utilization":round(busy/elapsed,4) if elapsed>0 else 0,
+                })
             return {
                 'is_running': self._is_running,
-                'pending_tasks': self._queue.qsize()
+                'pending_tasks': self._queue.qsize()+sum(len(d) for d in self._deferred.values()),
+                'running_keys': list(self._running_keys),
+                'workers': workers,
+                'lanes': self._queue.info(),
+                'coalesced': dict(self._coalesced),
+                'paused': {'remaining':round(max(self._paused_until-now,0),1),'reason':self._pause_reason},
+                'durable': self._durable_info()
             }
+    def _durable_info(self) -> dict:
+        """持久化任务数量：pending 待执行，dead 死信"""
+        try:
+            from sqlalchemy import func
+            from core.db import DB
+            from core.models.queue_job import QueueJob
+            from core.models.base import DATA_STATUS
+            session=DB.get_session()
+            counts=dict(session.query(QueueJob.status,func.count()).filter(QueueJob.queue==self.tag)
+                        .group_by(QueueJob.status).all())
+            session.commit()
+            return {'pending':counts.get(DATA_STATUS.PENDING,0),'dead':counts.get(DATA_STATUS.FAILED,0)}
+        except Exception:
+            return {}
             
-    def clear_queue(self) -> None:
-        """清空队列中的所有任务"""
+    def clear_queue(self, keep_durable: bool = False) -> None:
+        """清空队列中的所有任务
+        
+        Args:
+            keep_durable: 保留数据库中的持久化任务(如登录失效时)，之后可通过 recover 恢复
+        """
         with self._lock:
             while not self._queue.empty():
                 try:
@@ -102,7 +484,22 @@ class TaskQueueManager:
                     self._queue.task_done()
                 except queue.Empty:
                     break
-            print_success("队列已清空")
+            self._clear_deferred()
+            self._queued_jobs.clear()
+        if not keep_durable:
+            self._delete_durable()
+        print_success("队列已清空")
+    def _delete_durable(self) -> None:
+        try:
+            from core.db import DB
+            from core.models.queue_job import QueueJob
+            from core.models.base import DATA_STATUS
+            session=DB.get_session()
+            session.query(QueueJob).filter(QueueJob.queue==self.tag,QueueJob.status==DATA_STATUS.PENDING) \
+                .delete(synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            print_error(f"{self.tag}清除持久化任务失败: {e}")
             
     def delete_queue(self) -> None:
         """删除队列(停止并清空所有任务)"""
@@ -114,8 +511,14 @@ class TaskQueueManager:
                     self._queue.task_done()
                 except queue.Empty:
                     break
+            self._clear_deferred()
             print_success("队列已删除")
-TaskQueue = TaskQueueManager(tag="默认队列")
+    def _clear_deferred(self) -> None:
+        for pending in self._deferred.values():
+            for _ in pending:
+                self._queue.task_done()
+        self._deferred.clear()
+TaskQueue = TaskQueueManager(tag="默认队列",workers=cfg.get("gather.workers",1))
 TaskQueue.run_task_background()
 if __name__ == "__main__":
     def task1():
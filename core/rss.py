@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 import os
 import json
 from core.content_format import format_content
+XML_DECLARATION='<?xml version="1.0" encoding="utf-8"?>\r\n'
 class RSS:
     cache_dir = os.path.normpath("data/cache/rss")
     content_cache_dir = os.path.normpath("data/cache/content")
@@ -26,22 +27,43 @@ class RSS:
             return "application/json"
         return "text/plain"
     
-    def cache_content(self, content_id: str, content: dict):
-        """缓存文章内容"""
+    @classmethod
+    def content_store(cls):
+        from core.content_store import ContentStore
+        return ContentStore.open(cls.content_cache_dir)
+
+    def cache_content(self, content_id: str, content: dict) -> bool:
+        """缓存文章内容(按 article.compress 配置压缩存储)，内容摘要未变化时跳过，返回是否写入"""
+        import hashlib
+        store = self.content_store()
+        digest = hashlib.sha1(json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+                              .encode("utf-8")).hexdigest()
+        if store.digest(str(content_id)) == digest:
+            store.skip()
+            return False
         content["content"]=self.add_logo_prefix_to_urls(content["content"])
-        content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
-        if not content_path.startswith(self.content_cache_dir):
-            raise ValueError("Invalid content path: Path traversal detected.")
-        
-        with open(content_path, "w", encoding="utf-8") as f:
-            json.dump(content, f, ensure_ascii=False, indent=2)
+        store.put(str(content_id), content, digest)
+        return True
 
     def get_cached_content(self, content_id: str) -> dict:
         """获取缓存的文章内容"""
+        content = self.content_store().get(str(content_id))
+        if content is not None:
+            return content
+        return self._get_legacy_content(content_id)
+
+    def _get_legacy_content(self, content_id: str) -> dict:
+        """读取旧版本每篇文章一个文件的缓存"""
+        from core.content_codec import decompress_content
         content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
         if not content_path.startswith(self.content_cache_dir):
             raise ValueError("Invalid content path: Path traversal detected.")
         
+        try:
+            with open(f"{content_path}.z", "rb") as f:
+                return json.loads(decompress_content(f.read()))
+        except FileNotFoundError:
+            pass
         try:
             with open(content_path, "r", encoding="utf-8") as f:
                 return json.load(f)
@@ -73,9 +95,8 @@ class RSS:
         except:
             return text
        
-    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
-                    link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str=""):
+    def _rss_channel(self, title: str, link: str, description: str, language: str, image_url: str):
+        """RSS根元素与频道信息(不含条目)"""
         from core.config import cfg
         full_context=bool(cfg.get("rss.full_context",False))
         
@@ -98,58 +119,68 @@ class RSS:
             ET.SubElement(image, "url").text = image_url
             ET.SubElement(image, "title").text = title
             ET.SubElement(image, "link").text = link
+        return rss,channel
+
+    def _rss_item(self, rss_item: dict) -> ET.Element:
+        """单个RSS条目"""
+        from core.config import cfg
+        full_context=bool(cfg.get("rss.full_context",False))
+        item = ET.Element("item")
+        ET.SubElement(item, "id").text = rss_item["id"]
+        ET.SubElement(item, "title").text = rss_item["title"]
+        ET.SubElement(item, "description").text = rss_item["description"] 
+        ET.SubElement(item, "guid").text = rss_item["link"]
+        # 添加图片封面
+        if cfg.get("rss.add_cover",False)==True:
+            enclosure = ET.SubElement(item, "enclosure")
+            enclosure.set("url", rss_item["image"])
+            enclosure.set("length", "0")
+            enclosure.set("type", "image/jpeg")
+        if full_context==True:
+            try:
+                if cfg.get("rss.cdata",False)==True:
+                    content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
+                else:
+                    content = str(rss_item['content'])
+                ET.SubElement(item, "content:encoded").text = content
+            except Exception as e:
+                print(f"Error adding content:encoded element: {e}")
+            pass
+        # ET.SubElement(item, "category").text = rss_item["category"]
+        # ET.SubElement(item, "author").text = rss_item["author"]
+        ET.SubElement(item, "link").text = rss_item["link"]
+        ET.SubElement(item, "pubDate").text = self.datetime_to_rfc822(str(rss_item["updated"]))
+        return item
 
+    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
+                    link: str = "https://github.com/rachelos/we-mp-rss",
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str=""):
+        rss,channel=self._rss_channel(title,link,description,language,image_url)
         for rss_item in rss_list:
-            item = ET.SubElement(channel, "item")
-            ET.SubElement(item, "id").text = rss_item["id"]
-            ET.SubElement(item, "title").text = rss_item["title"]
-            ET.SubElement(item, "description").text = rss_item["description"] 
-            ET.SubElement(item, "guid").text = rss_item["link"]
-            # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
-                enclosure = ET.SubElement(item, "enclosure")
-                enclosure.set("url", rss_item["image"])
-                enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
-            if full_context==True:
-                try:
-                    if cfg.get("rss.cdata",False)==True:
-                        content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
-                    else:
-                        content = str(rss_item['content'])
-                    ET.SubElement(item, "content:encoded").text = content
-                except Exception as e:
-                    print(f"Error adding content:encoded element: {e}")
-                pass
-            # ET.SubElement(item, "category").text = rss_item["category"]
-            # ET.SubElement(item, "author").text = rss_item["author"]
-            ET.SubElement(item, "link").text = rss_item["link"]
-            ET.SubElement(item, "pubDate").text = self.datetime_to_rfc822(str(rss_item["updated"]))
+            channel.append(self._rss_item(rss_item))
 
         # 生成XML字符串(添加声明和美化输出)
-        tree_str = '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
+        tree_str = XML_DECLARATION + \
                 ET.tostring(rss, encoding="utf-8", method="xml", short_empty_elements=False).decode("utf-8")
         
         if self.rss_file is not None:
             with open(self.rss_file, "w", encoding="utf-8") as f:
                 f.write(tree_str)
         return tree_str
-     
-    def generate_atom(self,rss_list: dict, title: str = "Mp-We-Rss", 
-                    link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
-        """生成Atom格式的RSS内容
-        
-        Args:
-            rss_list: RSS条目列表
-            title: 频道标题
-            link: 频道链接
-            description: 频道描述
-            language: 语言
-            
-        Returns:
-            Atom格式的XML字符串
-        """
+
+    def iter_rss(self, rss_items, title: str = "Mp-We-Rss", link: str = "https://github.com/rachelos/we-mp-rss",
+                 description: str = "RSS频道", language: str = "zh-CN", image_url: str = ""):
+        """逐条输出RSS，输出内容与 generate_rss 相同"""
+        rss,channel=self._rss_channel(title,link,description,language,image_url)
+        head=ET.tostring(rss, encoding="utf-8", method="xml", short_empty_elements=False).decode("utf-8")
+        head,tail=head.rsplit("</channel>",1)
+        yield XML_DECLARATION+head
+        for rss_item in rss_items:
+            yield ET.tostring(self._rss_item(rss_item), encoding="utf-8", method="xml", short_empty_elements=False).decode("utf-8")
+        yield "</channel>"+tail
+
+    def _atom_feed(self, title: str, link: str, image_url: str) -> ET.Element:
+        """Atom根元素与频道信息(不含条目)"""
         from core.config import cfg
         full_context = bool(cfg.get("rss.full_context", False))
         
@@ -171,42 +202,77 @@ class RSS:
             ET.SubElement(image, "url").text = str(image_url)
             ET.SubElement(image, "title").text = str(title)
             ET.SubElement(image, "link").text = str(link)
-        for rss_item in rss_list:
-            entry = ET.SubElement(feed, "entry")
-            ET.SubElement(entry, "id").text = rss_item["id"]
-            ET.SubElement(entry, "title").text = str(rss_item["title"])
-            ET.SubElement(entry, "link", href=str(rss_item["link"]))
-            ET.SubElement(entry, "updated").text =self.datetime_to_rfc822(str(rss_item["updated"]))
-            ET.SubElement(entry, "summary").text = str(rss_item["description"])
-            ET.SubElement(entry, "author").text = str(rss_item["mp_name"])
-             # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
-                enclosure = ET.SubElement(entry, "enclosure")
-                enclosure.set("url", str(rss_item["image"]))
-                enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
+        return feed
+
+    def _atom_entry(self, rss_item: dict) -> ET.Element:
+        """单个Atom条目"""
+        from core.config import cfg
+        full_context = bool(cfg.get("rss.full_context", False))
+        entry = ET.Element("entry")
+        ET.SubElement(entry, "id").text = rss_item["id"]
+        ET.SubElement(entry, "title").text = str(rss_item["title"])
+        ET.SubElement(entry, "link", href=str(rss_item["link"]))
+        ET.SubElement(entry, "updated").text =self.datetime_to_rfc822(str(rss_item["updated"]))
+        ET.SubElement(entry, "summary").text = str(rss_item["description"])
+        ET.SubElement(entry, "author").text = str(rss_item["mp_name"])
+         # 添加图片封面
+        if cfg.get("rss.add_cover",False)==True:
+            enclosure = ET.SubElement(entry, "enclosure")
+            enclosure.set("url", str(rss_item["image"]))
+            enclosure.set("length", "0")
+            enclosure.set("type", "image/jpeg")
+        
+        if full_context:
+            type=self.get_content_type()
+            # content = ET.SubElement(entry, "content", type=f"{str(type)}") 
+            # content.text = format_content(rss_item["content"],type)
+            content=format_content(rss_item["content"],type)
+            try:
+                if cfg.get("rss.cdata",False)==True:
+                    content = f"<![CDATA[{content}]]>"  # 使用CDATA包裹内容
+                else:
+                    ET.SubElement(entry, "content:encoded").text = content
+            except Exception as e:
+                print(f"Error adding content:encoded element: {e}")
+            pass
+        return entry
+
+    def generate_atom(self,rss_list: dict, title: str = "Mp-We-Rss", 
+                    link: str = "https://github.com/rachelos/we-mp-rss",
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
+        """生成Atom格式的RSS内容
+        
+        Args:
+            rss_list: RSS条目列表
+            title: 频道标题
+            link: 频道链接
+            description: 频道描述
+            language: 语言
             
-            if full_context:
-                type=self.get_content_type()
-                # content = ET.SubElement(entry, "content", type=f"{str(type)}") 
-                # content.text = format_content(rss_item["content"],type)
-                content=format_content(rss_item["content"],type)
-                try:
-                    if cfg.get("rss.cdata",False)==True:
-                        content = f"<![CDATA[{content}]]>"  # 使用CDATA包裹内容
-                    else:
-                        ET.SubElement(entry, "content:encoded").text = content
-                except Exception as e:
-                    print(f"Error adding content:encoded element: {e}")
-                pass
+        Returns:
+            Atom格式的XML字符串
+        """
+        feed=self._atom_feed(title,link,image_url)
+        for rss_item in rss_list:
+            feed.append(self._atom_entry(rss_item))
         # 生成XML字符串
-        tree_str = '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
+        tree_str = XML_DECLARATION + \
                   ET.tostring(feed, encoding="utf-8", method="xml").decode("utf-8")
         
         if self.rss_file is not None:
             with open(self.rss_file, "w", encoding="utf-8") as f:
                 f.write(tree_str)
         return tree_str
+
+    def iter_atom(self, rss_items, title: str = "Mp-We-Rss", link: str = "https://github.com/rachelos/we-mp-rss",
+                  description: str = "RSS频道", language: str = "zh-CN", image_url: str = ""):
+        """逐条输出Atom，输出内容与 generate_atom 相同"""
+        head=ET.tostring(self._atom_feed(title,link,image_url), encoding="utf-8", method="xml").decode("utf-8")
+        head,tail=head.rsplit("</feed>",1)
+        yield XML_DECLARATION+head
+        for rss_item in rss_items:
+            yield ET.tostring(self._atom_entry(rss_item), encoding="utf-8", method="xml").decode("utf-8")
+        yield "</feed>"+tail
     def set_content_type(self,type:str=None):
         self.content_type=type
     def get_content_type(self)->str:
@@ -218,6 +284,18 @@ class RSS:
         elif ext in("txt"):
             return "text"
         return "html"
+    def _json_item(self, item: dict, type) -> dict:
+        return {
+            "id": item["id"],
+            "title": item["title"],
+            "description": item["description"],
+            "link": item["link"],
+            "updated": item["updated"].isoformat() if isinstance(item["updated"], datetime) else item["updated"],
+            "content": format_content(item["content"],type),
+            "channel_name": item.get("mp_name", ""),
+            "feed": item.get("feed")
+        }
+
     def generate_json(self, rss_list: dict,title: str = "Mp-We-Rss", 
                     link: str = "https://github.com/rachelos/we-mp-rss",
                     description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
@@ -236,21 +314,64 @@ class RSS:
             "description":description,
             "language": language,
             "cover":image_url,
-            "items": [
-                {
-                    "id": item["id"],
-                    "title": item["title"],
-                    "description": item["description"],
-                    "link": item["link"],
-                    "updated": item["updated"].isoformat() if isinstance(item["updated"], datetime) else item["updated"],
-                    "content": format_content(item["content"],type),
-                    "channel_name": item.get("mp_name", ""),
-                    "feed": item.get("feed")
-                } for item in rss_list
-            ]
+            "items": [self._json_item(item,type) for item in rss_list]
         }
         return json.dumps(result, ensure_ascii=False, indent=2, default=self.serialize_datetime)
 
+    def iter_json(self, rss_items, title: str = "Mp-We-Rss", link: str = "https://github.com/rachelos/we-mp-rss",
+                  description: str = "RSS频道", language: str = "zh-CN", image_url: str = ""):
+        """逐条输出JSON，结构与 generate_json 相同"""
+        import textwrap
+        type=self.get_content_type()
+        head={"name":title,"link":link,"description":description,"language":language,"cover":image_url}
+        # 去掉结尾的"\n}"，接着输出items数组
+        yield json.dumps(head, ensure_ascii=False, indent=2)[:-2]+',\n  "items": ['
+        for i,item in enumerate(rss_items):
+            text=json.dumps(self._json_item(item,type), ensure_ascii=False, indent=2, default=self.serialize_datetime)
+            yield (",\n" if i else "\n")+textwrap.indent(text,"    ")
+        yield "\n  ]\n}"
+
+    def stream(self, rss_items, ext: str, on_complete=None, **kwargs):
+        """逐条生成订阅源(rss/xml/atom/md/txt/json/jmd)，边输出边写入缓存文件
+
+        写入临时文件，完整输出后再替换缓存文件；on_complete(path, sha1, size) 在完成后调用
+        """
+        import hashlib
+        import uuid
+        ext = ext.lower().strip('.')
+        self.ext=ext
+        if ext in ('rss', 'xml'):
+            chunks=self.iter_rss(rss_items, **kwargs)
+        elif ext in ('atom','md','txt'):
+            chunks=self.iter_atom(rss_items, **kwargs)
+        elif ext in ('json','jmd'):
+            chunks=self.iter_json(rss_items, **kwargs)
+        else:
+            raise ValueError(f"Unsupported extension: {ext}")
+        digest=hashlib.sha1()
+        size=0
+        tmp_path=f"{self.rss_file}.{uuid.uuid4().hex}.tmp"
+        f=open(tmp_path,"wb")
+        try:
+            for chunk in chunks:
+                data=chunk.encode("utf-8")
+                digest.update(data)
+                size+=len(data)
+                f.write(data)
+                yield data
+            f.close()
+            os.replace(tmp_path,self.rss_file)
+        finally:
+            f.close()
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        if on_complete is not None:
+            on_complete(self.rss_file,digest.hexdigest(),size)
+
+    @staticmethod
+    def can_stream(ext: str) -> bool:
+        return ext.lower().strip('.') in ('rss','xml','atom','md','txt','json','jmd')
+
     def get_cache(self):
         if not hasattr(self, 'rss_file') or not self.rss_file:
                return None
@@ -292,25 +413,24 @@ class RSS:
             template = TemplateParser(template)
             return template.render({"articles": rss_list, "title": title,"link":link,"description":description,"language":language,"image_url":image_url})
             pass
+    def cache_manifest(self):
+        from core.cache_manifest import CacheManifest
+        return CacheManifest.open(self.cache_dir)
+
+    def register_cache(self, mp_ids: list = None):
+        """登记生成的缓存文件及其依赖的公众号(None表示依赖全部公众号)，用于按公众号清除"""
+        self.cache_manifest().register(self.rss_file, mp_ids)
+
     def clear_cache(self,mp_id:str=""):
 
-        """清除所有缓存文件
+        """清除缓存
         
-        删除data/cache/rss和data/cache/content目录中包含'mp_id'的文件
-        保持与现有方法相同的路径安全检查机制
+        按缓存清单删除data/cache/rss中依赖该公众号的文件(含包含它的标签订阅和全部文章订阅)，
+        同时失效内存缓存并在后台重新生成订阅源快照；不传mp_id时清除全部
         """
-        import shutil
-        
-        # 清除rss缓存目录
-        if os.path.exists(self.cache_dir):
-            for filename in os.listdir(self.cache_dir):
-                if f'{mp_id}_' not in filename:
-                    continue
-                file_path = os.path.normpath(f"{self.cache_dir}/{filename}")
-                if not file_path.startswith(self.cache_dir):
-                    raise ValueError("Invalid file path: Path traversal detected.")
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                except Exception as e:
-                    print(f"Error deleting {file_path}: {e}")
\ No newline at end of file
+        from core.feed_cache import FEED_CACHE
+        from core.feed_snapshot import SNAPSHOTS
+        FEED_CACHE.invalidate(mp_id)
+        # 在后台重新生成相关订阅源快照
+        SNAPSHOTS.schedule(mp_id)
+        self.cache_manifest().invalidate(mp_id)
@@ -0,0 +1,245 @@
+"""
+文章全文检索
+SQLite 使用 FTS5(trigram 分词，支持中文子串)外部内容表，由触发器与 articles/article_contents 表保持同步；
+MySQL 使用 ngram 全文索引；其他数据库或未启用时退回 LIKE 匹配。
+FTS5 索引按表的隐式 rowid 关联文章(主键为字符串)，VACUUM 可能重新编号 rowid，
+整理数据库需使用 ArticleSearch.vacuum(scripts/vacuum_db.py)，完成后重建索引；
+启动时也会抽查最新一行是否仍能在索引中按 rowid 找到，不一致时自动重建。
+"""
+import threading
+from sqlalchemy import text, or_, select, literal_column, Float, Integer
+from core.config import cfg
+from core.models.article import Article
+from core.print import print_success, print_warning, print_error
+
+FTS_TABLE = "articles_fts"
+CONTENT_FTS_TABLE = "article_contents_fts"
+MYSQL_INDEX = "ft_articles_search"
+MYSQL_CONTENT_INDEX = "ft_article_contents_search"
+# trigram 分词最少需要3个字符才能走索引，更短的词退回在索引表上做LIKE
+MIN_TERM_LENGTH = 3
+# 标题、描述的 bm25 权重，正文权重为1
+BM25_WEIGHTS = (10.0, 4.0)
+
+
+def _fts_ddl(fts: str, table: str, columns: list) -> list:
+    """外部内容 FTS5 表及保持同步的触发器"""
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='rowid', tokenize='trigram')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new});
+        END""",
+    ]
+
+
+# 标题/描述索引 articles 表，正文索引 article_contents 表中提取的纯文本(正文HTML压缩存储)
+SQLITE_INDEXES = {
+    FTS_TABLE: ("articles", ["title", "description"]),
+    CONTENT_FTS_TABLE: ("article_contents", ["plain_text"]),
+}
+# 抽查 rowid 最大的一行(前面任意 rowid 被重新编号都会使它的 rowid 变化)，取可用于 trigram 匹配的文本
+SQLITE_PROBES = {
+    FTS_TABLE: "SELECT rowid, title FROM articles WHERE length(title) >= 3 ORDER BY rowid DESC LIMIT 1",
+    CONTENT_FTS_TABLE: "SELECT rowid, substr(plain_text, 1, 30) FROM article_contents "
+                       "WHERE length(plain_text) >= 3 ORDER BY rowid DESC LIMIT 1",
+}
+MYSQL_INDEXES = {
+    MYSQL_INDEX: ("articles", ["title", "description"]),
+    MYSQL_CONTENT_INDEX: ("article_contents", ["plain_text"]),
+}
+
+
+def split_keywords(keyword: str) -> list:
+    """与原 format_search_kw 一致：按空格、-、| 拆分关键词"""
+    words = keyword.replace("-", " ").replace("|", " ").split(" ")
+    return [w for w in words if w.strip()]
+
+
+class ArticleSearch:
+    def __init__(self):
+        self._ready = {}
+        self._lock = threading.Lock()
+
+    def enabled(self) -> bool:
+        return bool(cfg.get("search.fts", True))
+
+    def _drop_sqlite_index(self, conn, fts: str):
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+    def ensure_index(self, engine, rebuild: bool = False) -> bool:
+        """创建全文索引(幂等)，新建或结构变化时导入已有文章"""
+        if not self.enabled():
+            return False
+        dialect = engine.dialect.name
+        try:
+            if dialect == "sqlite":
+                with engine.begin() as conn:
+                    for fts, (table, columns) in SQLITE_INDEXES.items():
+                        existing = [row[1] for row in conn.execute(text(f"PRAGMA table_info({fts})")).fetchall()]
+                        if existing and existing != columns:
+                            # 索引列与当前结构不一致(如旧版索引包含正文列)，删除后重建
+                            self._drop_sqlite_index(conn, fts)
+                        for ddl in _fts_ddl(fts, table, columns):
+                            conn.execute(text(ddl))
+                        if rebuild or existing != columns or not self._sqlite_consistent(conn, fts):
+                            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES('rebuild')"))
+                            print_success(f"全文索引{fts}已重建")
+            elif dialect == "mysql":
+                with engine.begin() as conn:
+                    for name, (table, columns) in MYSQL_INDEXES.items():
+                        existing = [row[4] for row in conn.execute(
+                            text(f"SHOW INDEX FROM {table} WHERE Key_name=:name"), {"name": name}).fetchall()]
+                        if existing == columns:
+                            continue
+                        if existing:
+                            conn.execute(text(f"ALTER TABLE {table} DROP INDEX {name}"))
+                        conn.execute(text(f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} "
+                                          f"({', '.join(columns)}) WITH PARSER ngram"))
+                        print_success(f"全文索引{name}已创建")
+            else:
+                return False
+        except Exception as e:
+            print_error(f"创建全文索引失败，搜索将退回LIKE匹配: {e}")
+            return False
+        self._ready[str(engine.url)] = True
+        return True
+
+    @staticmethod
+    def _sqlite_consistent(conn, fts: str) -> bool:
+        """索引中按 rowid 仍能找到最新一行，否则说明 rowid 已被重新编号(如直接执行了 VACUUM)"""
+        row = conn.execute(text(SQLITE_PROBES[fts])).first()
+        if row is None or row[1] is None:
+            return True
+        phrase = '"' + str(row[1]).replace('"', '""') + '"'
+        found = conn.execute(text(f"SELECT 1 FROM {fts} WHERE {fts} MATCH :q AND rowid = :rid"),
+                             {"q": phrase, "rid": row[0]}).first()
+        if found is None:
+            print_warning(f"全文索引{fts}与数据表rowid不一致，重建索引")
+        return found is not None
+
+    def vacuum(self, engine):
+        """整理 SQLite 数据库并重建全文索引(VACUUM 可能重新编号隐式 rowid)"""
+        if engine.dialect.name != "sqlite":
+            return False
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        self.ensure_index(engine, rebuild=True)
+        return True
+
+    def drop_index(self, engine):
+        """删除全文索引，用于迁移表结构前解除触发器/索引对列的引用"""
+        dialect = engine.dialect.name
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                for fts in SQLITE_INDEXES:
+                    self._drop_sqlite_index(conn, fts)
+            elif dialect == "mysql":
+                for name, (table, _) in MYSQL_INDEXES.items():
+                    if conn.execute(text(f"SHOW INDEX FROM {table} WHERE Key_name=:name"), {"name": name}).first():
+                        conn.execute(text(f"ALTER TABLE {table} DROP INDEX {name}"))
+        self._ready.pop(str(engine.url), None)
+
+    def is_ready(self, session) -> bool:
+        """检查当前数据库是否已有全文索引，结果按连接串缓存"""
+        if not self.enabled():
+            return False
+        engine = session.get_bind()
+        key = str(engine.url)
+        if key in self._ready:
+            return self._ready[key]
+        with self._lock:
+            if key in self._ready:
+                return self._ready[key]
+            dialect = engine.dialect.name
+            try:
+                if dialect == "sqlite":
+                    ready = all(session.execute(text(f"PRAGMA table_info({fts})")).first() is not None
+                                for fts in SQLITE_INDEXES)
+                elif dialect == "mysql":
+                    ready = all(session.execute(text(f"SHOW INDEX FROM {table} WHERE Key_name=:name"),
+                                                {"name": name}).first() is not None
+                                for name, (table, _) in MYSQL_INDEXES.items())
+                else:
+                    ready = False
+            except Exception as e:
+                print_warning(f"检查全文索引失败: {e}")
+                ready = False
+            if not ready:
+                print_warning("未找到全文索引，搜索将退回LIKE匹配，请运行 python init_sys.py 创建索引")
+            self._ready[key] = ready
+            return ready
+
+    def like_filter(self, keyword: str):
+        """LIKE 匹配标题(原有搜索方式)"""
+        words = split_keywords(keyword) or [keyword]
+        return or_(*[Article.title.like(f"%{w}%") for w in words])
+
+    def _sqlite_hits(self, words: list):
+        """返回(articles.rowid, rank)子查询，rank 越小越相关"""
+        long_words = [w for w in words if len(w) >= MIN_TERM_LENGTH]
+        short_words = [w for w in words if len(w) < MIN_TERM_LENGTH]
+        params = {}
+        parts = []
+        if long_words:
+            params["q"] = " OR ".join('"' + w.replace('"', '""') + '"' for w in long_words)
+            weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+            parts.append(f"SELECT rowid AS rid, bm25({FTS_TABLE}, {weights}) AS rank "
+                         f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q LIMIT -1")
+            parts.append(f"SELECT a.rowid AS rid, hit.rank AS rank FROM ("
+                         f"SELECT rowid AS cid, bm25({CONTENT_FTS_TABLE}) AS rank FROM {CONTENT_FTS_TABLE} "
+                         f"WHERE {CONTENT_FTS_TABLE} MATCH :q LIMIT -1) hit "
+                         f"JOIN article_contents c ON c.rowid = hit.cid JOIN articles a ON a.id = c.article_id")
+        for i, w in enumerate(short_words):
+            params[f"s{i}"] = f"%{w}%"
+            parts.append(f"SELECT rowid AS rid, 0.0 AS rank FROM {FTS_TABLE} "
+                         f"WHERE title LIKE :s{i} OR description LIKE :s{i}")
+        # 子查询带 LIMIT -1 防止被展开，bm25() 只能在 MATCH 查询内直接调用；标题与正文同时命中时得分累加
+        sql = " UNION ALL ".join(f"SELECT * FROM ({part})" for part in parts)
+        sql = f"SELECT rid, SUM(rank) AS rank FROM ({sql}) GROUP BY rid"
+        return text(sql).bindparams(**params).columns(rid=Integer, rank=Float).subquery("search_hits")
+
+    def apply(self, query, session, keyword: str, order_by_rank: bool = True):
+        """
+        为查询添加全文检索条件
+        :param query: 包含 Article(articles表) 的查询
+        :param order_by_rank: 是否按相关度排序(游标分页时需保持时间顺序，传False)
+        """
+        words = split_keywords(keyword)
+        if not words:
+            return query
+        if not self.is_ready(session):
+            return query.filter(self.like_filter(keyword))
+        dialect = session.get_bind().dialect.name
+        if dialect == "sqlite":
+            hits = self._sqlite_hits(words)
+            query = query.join(hits, literal_column("articles.rowid") == hits.c.rid)
+            if order_by_rank:
+                query = query.order_by(hits.c.rank.asc())
+            return query
+        # MySQL ngram 全文索引，自然语言模式下按标题/描述相关度排序，正文命中作为补充条件
+        from sqlalchemy.dialects.mysql import match
+        from core.models.article import ArticleContent
+        against = " ".join(words)
+        score = match(Article.title, Article.description, against=against).in_natural_language_mode()
+        in_content = Article.id.in_(select(ArticleContent.article_id).where(
+            match(ArticleContent.plain_text, against=against).in_natural_language_mode()))
+        query = query.filter(or_(score, in_content))
+        if order_by_rank:
+            query = query.order_by(score.desc())
+        return query
+
+
+SEARCH = ArticleSearch()
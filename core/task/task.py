@@ -2,6 +2,9 @@ import threading
 import random
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+from datetime import datetime, timedelta
+import time
 from typing import Callable, Any, Optional
 from core.log import logger
 import uuid
@@ -49,14 +52,113 @@ class TaskScheduler:
         self._scheduler = BackgroundScheduler()
         self._lock = threading.Lock()
         self._jobs = {}
+        # 各任务的执行统计：触发延迟(实际开始时间-计划时间)、执行耗时、错过/重叠跳过次数
+        self._stats = {}
+        self._scheduler.add_listener(self._on_job_event,
+                                     EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+    def _job_stats(self, job_id: str) -> dict:
+        return self._stats.setdefault(job_id, {
+            'runs': 0, 'failures': 0, 'missed': 0, 'skipped_overlap': 0,
+            'last_lag': 0.0, 'max_lag': 0.0, 'lag_total': 0.0,
+            'last_duration': 0.0, 'max_duration': 0.0, 'duration_total': 0.0,
+            'last_start': None,
+        })
+
+    def _on_job_event(self, event) -> None:
+        """记录触发延迟与错过、重叠跳过的次数"""
+        stats = self._job_stats(event.job_id)
+        if event.code == EVENT_JOB_MISSED:
+            stats['missed'] += 1
+            logger.warning(f"Job {event.job_id} missed run at {event.scheduled_run_time}")
+            return
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            stats['skipped_overlap'] += 1
+            logger.warning(f"Job {event.job_id} skipped: previous run still in progress")
+            return
+        if event.code == EVENT_JOB_ERROR:
+            stats['failures'] += 1
+        if stats['last_start'] is not None and event.scheduled_run_time is not None:
+            lag = max(stats['last_start'] - event.scheduled_run_time.timestamp(), 0)
+            stats['last_lag'] = round(lag, 3)
+            stats['max_lag'] = round(max(stats['max_lag'], lag), 3)
+            stats['lag_total'] += lag
+        
+    def _build_trigger(self, cron_expr: str) -> CronTrigger:
+        """解析cron表达式(支持 1~3 随机范围)为CronTrigger"""
+        # 解析cron表达式为各个字段
+        fields = cron_expr.split()
+        if len(fields) == 5:
+            # 5位格式: 分 时 日 月 周
+            minute, hour, day, month, day_of_week = fields
+            second = "0"  # 默认秒为0
+        elif len(fields) == 6:
+            # 6位格式: 秒 分 时 日 月 周
+            second, minute, hour, day, month, day_of_week = fields
+        else:
+            error_msg = f"Invalid cron expression: {cron_expr}. Expected 5 or 6 fields."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        
+        # 处理随机时间范围
+        def parse_random_field(field: str, field_name: str):
+            # 假设我们要解析的格式是 "*/1~3" 或 "1~3-3~10"
+            import re
+            try:
+                # 使用正则表达式匹配格式
+                pattern = r'(\d+)\~(\d+)'
+                match = re.findall(pattern, field)
+                if match:
+                    # 提取匹配的组
+                    start, end =match[0]
+                    step=random.randint(int(start),int(end))
+                    field=field.replace(f"{start}~{end}",str(step))
+            except:
+                pass
+            return field
+
+        
+        second = parse_random_field(second, 'second')
+        minute = parse_random_field(minute, 'minute')
+        hour = parse_random_field(hour, 'hour')
+        day = parse_random_field(day, 'day')
+        month = parse_random_field(month, 'month')
+        day_of_week = parse_random_field(day_of_week, 'day_of_week')
         
+        return CronTrigger(
+            second=second,
+            minute=minute,
+            hour=hour,
+            day=day,
+            month=month,
+            day_of_week=day_of_week
+        )
+
+    def get_interval(self, cron_expr: str, job_id: Optional[str] = None) -> float:
+        """cron表达式相邻两次执行的间隔秒数，无法计算时返回0
+
+        指定job_id且任务已注册时使用其触发器，随机范围(1~3)与实际调度一致，不再重新取随机值
+        """
+        try:
+            job = self._scheduler.get_job(str(job_id)) if job_id is not None else None
+            trigger = job.trigger if job is not None else self._build_trigger(cron_expr)
+            now = datetime.now(trigger.timezone)
+            first = trigger.get_next_fire_time(None, now)
+            second = trigger.get_next_fire_time(first, first + timedelta(seconds=1)) if first else None
+            return (second - first).total_seconds() if second else 0
+        except Exception:
+            return 0
+
     def add_cron_job(self, 
                     func: Callable,
                     cron_expr: str,
                     args: Optional[tuple] = None,
                     kwargs: Optional[dict] = None,
                     job_id: Optional[str] = None,
-                    tag:str=""
+                    tag:str="",
+                    max_instances: int = 1,
+                    coalesce: bool = True,
+                    misfire_grace_time: int = 60
                     ) -> str:
         """
         添加一个cron定时任务
@@ -66,78 +168,46 @@ class TaskScheduler:
         :param args: 函数的位置参数
         :param kwargs: 函数的关键字参数
         :param job_id: 任务ID，如果不指定则自动生成
+        :param max_instances: 同一任务同时运行的最大数量，上次未执行完时本次跳过
+        :param coalesce: 错过的多次执行合并为一次
+        :param misfire_grace_time: 允许延迟执行的秒数，超过则记为错过
         :return: 任务ID
         """
         with self._lock:
             try:
                 logger.info(f"Adding cron job with expression: {cron_expr}")
                 
-                # 解析cron表达式为各个字段
-                fields = cron_expr.split()
-                if len(fields) == 5:
-                    # 5位格式: 分 时 日 月 周
-                    minute, hour, day, month, day_of_week = fields
-                    second = "0"  # 默认秒为0
-                elif len(fields) == 6:
-                    # 6位格式: 秒 分 时 日 月 周
-                    second, minute, hour, day, month, day_of_week = fields
-                else:
-                    error_msg = f"Invalid cron expression: {cron_expr}. Expected 5 or 6 fields."
-                    logger.error(error_msg)
-                    raise ValueError(error_msg)
-                
-                # 处理随机时间范围
-                def parse_random_field(field: str, field_name: str):
-                    # 假设我们要解析的格式是 "*/1~3" 或 "1~3-3~10"
-                    import re
-                    try:
-                        # 使用正则表达式匹配格式
-                        pattern = r'(\d+)\~(\d+)'
-                        match = re.findall(pattern, field)
-                        if match:
-                            # 提取匹配的组
-                            start, end =match[0]
-                            step=random.randint(int(start),int(end))
-                            field=field.replace(f"{start}~{end}",str(step))
-                    except:
-                        pass
-                    return field
-
-                
-                second = parse_random_field(second, 'second')
-                minute = parse_random_field(minute, 'minute')
-                hour = parse_random_field(hour, 'hour')
-                day = parse_random_field(day, 'day')
-                month = parse_random_field(month, 'month')
-                day_of_week = parse_random_field(day_of_week, 'day_of_week')
-                
                 # 生成job_id
                 job_id = job_id or str(uuid.uuid4())
 
-                trigger = CronTrigger(
-                    second=second,
-                    minute=minute,
-                    hour=hour,
-                    day=day,
-                    month=month,
-                    day_of_week=day_of_week
-                )
+                trigger = self._build_trigger(cron_expr)
                 
                 # 包装任务函数以捕获异常
                 def wrapped_func(*args, **kwargs):
+                    stats = self._job_stats(str(job_id))
+                    stats['last_start'] = time.time()
                     try:
                         # logger.info(f"Executing job {job_id or 'anonymous'}")
                         return func(*args, **kwargs)
                     except Exception as e:
                         logger.error(f"Job {tag} {job_id or 'anonymous'} failed: {str(e)}")
                         raise
+                    finally:
+                        duration = time.time() - stats['last_start']
+                        stats['runs'] += 1
+                        stats['last_duration'] = round(duration, 3)
+                        stats['max_duration'] = round(max(stats['max_duration'], duration), 3)
+                        stats['duration_total'] += duration
                 
                 job = self._scheduler.add_job(
                     wrapped_func,
                     trigger=trigger,
                     args=args,
                     kwargs=kwargs,
-                    id=str(job_id)
+                    id=str(job_id),
+                    max_instances=max_instances,
+                    coalesce=coalesce,
+                    misfire_grace_time=misfire_grace_time
                 )
                 self._jobs[job.id] = job
                 logger.info(f"Successfully added job {tag} {job.id}")
@@ -235,8 +305,28 @@ class TaskScheduler:
                 'next_run_times': [
                     (job_id, job.next_run_time.isoformat() if job.next_run_time else None)
                     for job_id, job in self._jobs.items()
-                ]
+                ],
+                'stats': self.get_job_stats()
+            }
+
+    def get_job_stats(self) -> dict:
+        """各任务的执行次数、失败/错过/重叠跳过次数，以及触发延迟和执行耗时(秒)"""
+        result = {}
+        for job_id, stats in list(self._stats.items()):
+            runs = stats['runs']
+            result[job_id] = {
+                'runs': runs,
+                'failures': stats['failures'],
+                'missed': stats['missed'],
+                'skipped_overlap': stats['skipped_overlap'],
+                'last_lag': stats['last_lag'],
+                'avg_lag': round(stats['lag_total'] / runs, 3) if runs else 0,
+                'max_lag': stats['max_lag'],
+                'last_duration': stats['last_duration'],
+                'avg_duration': round(stats['duration_total'] / runs, 3) if runs else 0,
+                'max_duration': stats['max_duration'],
             }
+        return result
 
     def get_job_details(self, job_id: str) -> dict:
         """
@@ -1,6 +1,7 @@
 from .wx1 import *
 from .wx2 import *
 from .wx3 import *
+from .wx4 import *
 from .base import WxGather
 from driver.auth import *
 ga=WxGather()
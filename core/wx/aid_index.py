@@ -0,0 +1,77 @@
+"""
+已采集文章(aid)索引
+内存中按(公众号, aid)维护有界LRU，未命中时回查 articles 表(主键查询)，
+重启后不会重复采集已入库且有正文的文章，常驻内存不随运行时间增长。
+"""
+import threading
+from collections import OrderedDict
+from core.config import cfg
+
+
+class AidIndex:
+    def __init__(self, capacity: int = None):
+        self.capacity = int(capacity or cfg.get("gather.aid_cache_size", 100000) or 100000)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def article_id(mp_id: str, aid: str) -> str:
+        """与 Db.format_article 生成的文章ID一致"""
+        return f"{str(mp_id)}-{aid}".replace("MP_WXS_", "")
+
+    def _remember(self, key):
+        self._cache[key] = True
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def add(self, mp_id: str, aid: str):
+        with self._lock:
+            self._remember((mp_id, str(aid)))
+
+    def add_many(self, mp_id: str, aids: list):
+        with self._lock:
+            for aid in aids:
+                self._remember((mp_id, str(aid)))
+
+    def contains(self, mp_id: str, aid: str) -> bool:
+        """是否已采集过：先查内存，未命中再查数据库中是否已有正文"""
+        key = (mp_id, str(aid))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+        from core.db import DB
+        from core.models.article import Article
+        session = DB.get_session()
+        found = session.query(Article.id).filter(Article.id == self.article_id(mp_id, aid)) \
+            .filter(Article.has_content == 1).first() is not None
+        if found:
+            self.add(mp_id, aid)
+        return found
+
+    def clear(self, mp_id: str = None):
+        with self._lock:
+            if mp_id is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if k[0] == mp_id]:
+                del self._cache[key]
+
+    def get_info(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+AID_INDEX = AidIndex()
@@ -7,8 +7,13 @@ from core.models.feed import Feed
 from .cfg import cfg,wx_cfg
 from core.print import print_error,print_info
 from core.rss import RSS
+from .aid_index import AID_INDEX
+from .limiter import LIMITER
+from .breaker import BREAKER, FrequencyControlError
+from core.content_queue import CONTENT_QUEUE
 from driver.success import setStatus
 import random
+import time
 # 定义一些常见的 User-Agent
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -34,26 +39,29 @@ USER_AGENTS = [
 ]
 # 定义基类
 class WxGather:
-    articles=[]
-    aids=[]
     def all_count(self):
         if getattr(self, 'articles', None) is not None:
             return len(self.articles)
         return 0
-    def RecordAid(self,aid:str):
-        self.aids.append(aid)
-        pass
-    def HasGathered(self,aid:str):
-        if aid in self.aids:
-            return True
-        self.RecordAid(aid)
-        return False
+    def RecordAid(self,aid:str,mp_id:str=None):
+        AID_INDEX.add(mp_id or getattr(self,"mp_id",None),aid)
+    def HasGathered(self,aid:str,mp_id:str=None):
+        """是否已采集过该文章正文(按公众号索引，重启后回查数据库)；正文写入成功后才记录，见 RecordSaved"""
+        return AID_INDEX.contains(mp_id or getattr(self,"mp_id",None),aid)
+    def RecordSaved(self,arts:list):
+        """带正文的文章写入成功后记录aid，采集或写入失败的文章下次仍会重新采集"""
+        for art in arts:
+            if art.get("content"):
+                AID_INDEX.add(art["mp_id"],art["id"])
     def Model(self):
         type=cfg.get("gather.model","web")
         
         if type=="app":
             from core.wx import MpsAppMsg
             wx=MpsAppMsg()
+        elif type=="async":
+            from core.wx import MpsAsync
+            wx=MpsAsync()
         elif type=="web":
             from core.wx import MpsWeb
             wx=MpsWeb()
@@ -63,6 +71,8 @@ class WxGather:
         return wx
     def __init__(self,is_add:bool=False):
         self.articles=[]
+        self.mp_id=None
+        self.deferred_contents=set()
         self.is_add=is_add
         self._cookies={}
         session=  requests.Session()
@@ -97,13 +107,22 @@ class WxGather:
                 "Connection": "keep-alive"
             })
          return headers
+    def Get(self,url,params=None,headers=None,**kwargs):
+        """统一的请求入口，按域名限流(多个采集线程共享速率)"""
+        LIMITER.acquire(url)
+        return self.session.get(url,params=params,headers=headers,**kwargs)
+    def FrequencyControl(self,url,stop_at):
+        """触发平台频率限制(200013)：熔断该域名的请求并暂停采集队列，抛出 FrequencyControlError 结束本次采集"""
+        delay=BREAKER.trip(url,reason=f"frequencey control, stop at {stop_at}")
+        error="frequencey control, stop at {}".format(str(stop_at))
+        self.Error(error)
+        raise FrequencyControlError(error,retry_after=delay)
     def content_extract(self,  url):
         text=""
         try:
-            session=self.session
             # 更新请求头
             headers = self.fix_header(url)
-            r = session.get(url, headers=headers)
+            r = self.Get(url, headers=headers)
             if r.status_code == 200:
                 text = r.text
                 if "当前环境异常，完成验证后即可继续访问" in text:
@@ -112,27 +131,59 @@ class WxGather:
         except:
             pass
         return text
+    def to_article(self,data:dict)->dict:
+        art={
+            "id":str(data['id']),
+            "mp_id":data['mp_id'],
+            "title":data['title'],
+            "url":data['link'],
+            "pic_url":data['cover'],
+            "content":data.get("content",""),
+            "publish_time":data['update_time'],
+        }
+        if 'digest' in data:
+            art['description']=data['digest']
+        return art
     def FillBack(self,CallBack=None,data=None,Ext_Data=None):
         if CallBack is not None:
             if data is not  None:
                 setStatus(True)
-                from core.models import Article
-                from datetime import datetime
-                art={
-                    "id":str(data['id']),
-                    "mp_id":data['mp_id'],
-                    "title":data['title'],
-                    "url":data['link'],
-                    "pic_url":data['cover'],
-                    "content":data.get("content",""),
-                    "publish_time":data['update_time'],
-                }
-                if 'digest' in data:
-                    art['description']=data['digest']
+                art=self.to_article(data)
                 if CallBack(art):
                     art["ext"]=Ext_Data
                     # art.pop("content")
                     self.articles.append(art)
+                    self.RecordSaved([art])
+                self.QueueContents([art])
+    def FillBackPage(self,CallBack=None,items:list=None,Ext_Data=None)->dict:
+        """按页批量回写文章
+
+        Args:
+            CallBack: 批量写入函数，接收文章列表，返回inserted/updated/skipped统计
+            items: 本页采集到的文章
+            Ext_Data: 附加到新文章上的扩展信息
+
+        Returns:
+            dict: 写入统计
+        """
+        result={"inserted":0,"updated":0,"skipped":0,"failed":0,"inserted_ids":[]}
+        if CallBack is None or not items:
+            return result
+        setStatus(True)
+        arts=[self.to_article(item) for item in items]
+        result=CallBack(arts) or result
+        if not result.get("failed"):
+            self.RecordSaved(arts)
+        self.QueueContents(arts)
+        inserted=set(result.get("inserted_ids",[]))
+        for art in arts:
+            if art["id"] in inserted:
+                art["ext"]=Ext_Data
+                self.articles.append(art)
+        print_info(f"新增{result['inserted']}条,更新{result['updated']}条,跳过{result['skipped']}条")
+        if result.get("failed"):
+            print_error(f"{result['failed']}条文章写入失败: {result.get('error')}")
+        return result
 
 
     #通过公众号码平台接口查询公众号
@@ -156,7 +207,7 @@ class WxGather:
             return
         data={}
         try:
-            response = requests.get(
+            response = self.Get(
             url,
             params=params,
             headers=headers,
@@ -165,7 +216,7 @@ class WxGather:
             data = response.text  # 解析JSON数据
             msg = json.loads(data)  # 手动解析
             if msg['base_resp']['ret'] == 200013:
-                self.Error("frequencey control, stop at {}".format(str(kw)))
+                self.FrequencyControl(url,kw)
                 return
             if msg['base_resp']['ret'] != 0:
                 self.Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code="Invalid Session")
@@ -179,8 +230,16 @@ class WxGather:
     
     
     
-    def Start(self,mp_id=None):
+    def Start(self,mp_id=None,incremental:bool=None):
         self.articles=[]
+        self.mp_id=mp_id
+        # 增量同步：以已入库文章的最新发布时间为高水位，翻到已采集的文章即停止
+        self.incremental=cfg.get("gather.incremental",True) if incremental is None else incremental
+        self.high_water=DB.latest_publish_time(mp_id) if mp_id else None
+        self.latest_publish_time=self.high_water or 0
+        # 两阶段采集：先写入文章元数据，正文交给正文采集队列异步补齐
+        self.content_pipeline=bool(cfg.get("gather.content_pipeline",True))
+        self.deferred_contents=set()
         self.get_token()
         if self.token=="" or self.token is None:
              self.Error("请先扫码登录公众号平台")
@@ -188,9 +247,52 @@ class WxGather:
         import time
         self.update_mps(mp_id,Feed(
           sync_time=int(time.time()),
-          update_time=int(time.time()),
         ))
 
+    def KnownItems(self,mp_id:str,items:list)->dict:
+        """增量同步时查询本页已入库的文章 {aid: 是否已有正文}，全量同步返回空字典"""
+        for item in items:
+            publish_time=int(item.get("update_time") or 0)
+            if publish_time>self.latest_publish_time:
+                self.latest_publish_time=publish_time
+        if not getattr(self,"incremental",False) or self.high_water is None:
+            return {}
+        known=DB.known_articles(mp_id,[item["aid"] for item in items])
+        AID_INDEX.add_many(mp_id,[aid for aid,has_content in known.items() if has_content])
+        return known
+
+    def PageSleep(self,page:int,start_page:int,interval:int):
+        """翻页前随机暂停，增量同步时第一页不等待"""
+        if page==start_page and getattr(self,"incremental",False):
+            return
+        time.sleep(random.randint(0,interval))
+
+    def NeedContent(self,item:dict,known:dict,Gather_Content:bool)->bool:
+        """是否需要请求正文，已入库且有正文或本次已采集过的文章不再请求"""
+        need=bool(Gather_Content) and not known.get(item["aid"]) and not self.HasGathered(item["aid"])
+        if need and getattr(self,"content_pipeline",False):
+            self.deferred_contents.add(str(item["aid"]))
+            return False
+        return need
+
+    def QueueContents(self,arts:list):
+        """文章写入后，把延后采集正文的文章登记到正文采集队列"""
+        deferred=getattr(self,"deferred_contents",None)
+        if not deferred:
+            return
+        jobs=[{"article_id":AID_INDEX.article_id(art["mp_id"],art["id"]),"mp_id":art["mp_id"],"url":art["url"]}
+              for art in arts if str(art["id"]) in deferred and not art.get("content")]
+        for art in arts:
+            deferred.discard(str(art["id"]))
+        CONTENT_QUEUE.enqueue(jobs)
+
+    def ItemContent(self,item:dict,known:dict,Gather_Content:bool)->str:
+        """采集单篇正文，已入库且有正文的文章不再请求"""
+        if not self.NeedContent(item,known,Gather_Content):
+            return ""
+        time.sleep(random.randint(1,3))
+        return self.content_extract(item['link'])
+
     def Item_Over(self,item=None,CallBack=None):
         print(f"item end")
         _cookies=[{'name': c.name, 'value': c.value, 'domain': c.domain,'expiry':c.expires,'expires':c.expires} for c in self._cookies]
@@ -208,17 +310,22 @@ class WxGather:
             import threading
             setStatus(False)
             from core.queue import TaskQueue
-            TaskQueue.clear_queue()
+            # 保留持久化的采集任务，重新登录后恢复执行
+            TaskQueue.clear_queue(keep_durable=True)
             threading.Thread(target=send_wx_code,args=(f"公众号平台登录失效,请重新登录",)).start()
             # send_wx_code(f"公众号平台登录失效,请重新登录")
             raise Exception(error)
         # raise Exception(error)
 
     def Over(self,CallBack=None):
+        mp_id=getattr(self,"mp_id",None)
+        if mp_id and getattr(self,"latest_publish_time",0)>(getattr(self,"high_water",None) or 0):
+            # update_time 记录最新文章的发布时间
+            self.update_mps(mp_id,Feed(update_time=self.latest_publish_time))
         if getattr(self, 'articles', None) is not None:
             print(f"成功{len(self.articles)}条")
             rss=RSS()
-            mp_id=""
+            mp_id=mp_id or ""
             try:
                 mp_id=self.articles[0]['mp_id']
             except:
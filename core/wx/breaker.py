@@ -0,0 +1,118 @@
+"""
+公众号平台频率限制熔断器
+触发频率限制(200013)时熔断：按连续触发次数指数退避(带随机抖动)，期间暂停该域名的请求和采集队列；
+退避结束后进入半开状态，半开期间再次触发则退避时间加倍，平稳度过半开期后恢复正常并清零计数。
+"""
+import random
+import threading
+import time
+from collections import deque
+from core.config import cfg
+from core.print import print_warning
+from .limiter import LIMITER
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class FrequencyControlError(Exception):
+    """触发频率限制，本次采集中断；retry_after 为熔断剩余秒数，持久化队列据此在熔断结束后重试"""
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, host: str):
+        self.host = host
+        self.trips = 0
+        self.total_trips = 0
+        self.opened_at = 0.0
+        self.open_until = 0.0
+        self.half_open_until = 0.0
+        self.history = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def state(self, now: float = None) -> str:
+        now = now or time.time()
+        if now < self.open_until:
+            return OPEN
+        if now < self.half_open_until:
+            return HALF_OPEN
+        return CLOSED
+
+    def backoff(self, trips: int) -> float:
+        """第trips次连续触发的退避秒数：基数*2^(n-1)，不超过上限，取后一半区间内的随机值"""
+        base = float(cfg.get("gather.freq_control_pause", 60) or 60)
+        limit = float(cfg.get("gather.freq_control_max_pause", 3600) or 3600)
+        delay = min(base * 2 ** (trips - 1), limit)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def trip(self, reason: str = "") -> float:
+        """熔断，返回退避秒数"""
+        with self._lock:
+            now = time.time()
+            # 正常状态下触发重新计数，半开或熔断期间再次触发则继续加倍
+            self.trips = 1 if self.state(now) == CLOSED else self.trips + 1
+            self.total_trips += 1
+            delay = self.backoff(self.trips)
+            self.opened_at = now
+            self.open_until = now + delay
+            # 半开期与本次退避时间相同
+            self.half_open_until = self.open_until + delay
+            self.history.append({
+                "time": int(now),
+                "trips": self.trips,
+                "backoff": round(delay, 1),
+                "reason": reason,
+            })
+        return delay
+
+    def remaining(self) -> float:
+        return max(self.open_until - time.time(), 0)
+
+    def get_info(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state(),
+                "trips": self.trips,
+                "total_trips": self.total_trips,
+                "open_remaining": round(self.remaining(), 1),
+                "half_open_remaining": round(max(self.half_open_until - max(time.time(), self.open_until), 0), 1),
+                "history": list(self.history),
+            }
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host)
+            return self._breakers[host]
+
+    def trip(self, url: str, reason: str = "") -> float:
+        """触发频率限制：熔断该域名，暂停该域名的请求和采集队列，到期自动恢复"""
+        host = LIMITER.host(url)
+        breaker = self.breaker(host)
+        delay = breaker.trip(reason)
+        print_warning(f"{host} 第{breaker.trips}次连续触发频率限制，熔断{delay:.0f}秒")
+        LIMITER.penalize(url, delay)
+        from core.queue import TaskQueue
+        TaskQueue.pause(delay, reason=f"{host} 频率限制")
+        return delay
+
+    def state(self, url: str) -> str:
+        return self.breaker(LIMITER.host(url)).state()
+
+    def get_info(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.get_info() for host, breaker in breakers.items()}
+
+
+BREAKER = BreakerRegistry()
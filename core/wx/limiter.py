@@ -0,0 +1,95 @@
+"""
+按域名限流的令牌桶
+多个采集线程共享，保证对 mp.weixin.qq.com 的总请求速率不超过配置值；
+遇到频率限制(200013)时由熔断器(breaker.py)暂停该域名的所有请求一段时间。
+"""
+import threading
+import time
+from urllib.parse import urlparse
+from core.config import cfg
+from core.print import print_warning
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(float(rate), 0.001)
+        self.burst = max(int(burst), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """取一个令牌，不足时等待，返回等待秒数"""
+        begin = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.requests += 1
+                        waited = now - begin
+                        self.waited += waited
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    delay = self.paused_until - now
+            time.sleep(min(delay, 1.0))
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+    def get_info(self) -> dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "requests": self.requests,
+                "waited": round(self.waited, 2),
+                "paused": max(0, round(self.paused_until - time.monotonic(), 1)),
+            }
+
+
+class RateLimiter:
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(cfg.get("gather.rate", 1) or 1, cfg.get("gather.burst", 3) or 3)
+            return self._buckets[host]
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlparse(url).hostname or url
+
+    def acquire(self, url: str) -> float:
+        return self.bucket(self.host(url)).acquire()
+
+    def penalize(self, url: str, seconds: float = None):
+        """触发频率限制后暂停该域名的请求"""
+        seconds = float(seconds or cfg.get("gather.freq_control_pause", 60) or 60)
+        host = self.host(url)
+        print_warning(f"{host} 触发频率限制，暂停请求{seconds:.0f}秒")
+        self.bucket(host).pause(seconds)
+
+    def get_info(self) -> dict:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {host: bucket.get_info() for host, bucket in buckets.items()}
+
+
+LIMITER = RateLimiter()
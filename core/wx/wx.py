@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 # from core.config import cfg
 from .cfg import wx_cfg,cfg
 import core.db as db
+from .limiter import LIMITER
 
 def dateformat(timestamp:any):
     # UTC时间对象
@@ -40,6 +41,7 @@ def search_Biz(kw:str="",limit=5,offset=0):
     }
     data={}
     try:
+        LIMITER.acquire(url)
         response = requests.get(
         url,
         params=params,
@@ -55,13 +57,16 @@ def search_Biz(kw:str="",limit=5,offset=0):
     return data
 
 from bs4 import BeautifulSoup
+from core.content_codec import minify_html
 # 提取一篇文章的内容
 def content_extract(url):
     headers = {
         "Cookie": cfg.get("cookie"),
         "User-Agent": cfg.get("user_agent")
     }
-    r = requests.get(eval(url),headers=headers)
+    url=eval(url)
+    LIMITER.acquire(url)
+    r = requests.get(url,headers=headers)
     if r.status_code == 200:
         text = r.text
         soup = BeautifulSoup(text, 'html.parser')
@@ -81,7 +86,7 @@ def content_extract(url):
                 # 使用正则表达式替换width属性
                 style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
                 img_tag['style'] = style
-        return js_content_div.prettify()
+        return minify_html(js_content_div)
     else:
         print("download error,status_code: ",r.status_code,"\n")
     return ""
@@ -109,6 +114,7 @@ def get_Articles(faker_id:str):
     }
     data={}
     try:
+        LIMITER.acquire(url)
         response = requests.get(url, params=params, headers=headers)
         response.raise_for_status  # 检查状态码是否为200
         data = response.text  # 解析JSON数据
@@ -143,7 +149,6 @@ def get_list(faker_id:str=None,mp_id:str=None,is_add:bool=False):
     try:
         data=data['publish_page']['publish_list']
         wx_db=db.Db(tag="获取公众号列表")
-        wx_db.init(cfg.get('db'))
         for i in data:
             art=i['publish_info']
             art=json.loads(art)
@@ -5,8 +5,9 @@ import random
 import yaml
 import re
 from bs4 import BeautifulSoup
+from core.content_codec import minify_html
 from .base import WxGather
-from core.print import print_error
+from core.print import print_error,print_info
 from core.log import logger
 # 继承 BaseGather 类
 class MpsApi(WxGather):
@@ -16,32 +17,35 @@ class MpsApi(WxGather):
         try:
             text = super().content_extract(url)
             if text is not None:
-                soup = BeautifulSoup(text, 'html.parser')
-                # 找到内容
-                js_content_div = soup.find('div', {'id': 'js_content'})
-                # 移除style属性中的visibility: hidden;
-                if js_content_div is None:
-                    return
-                js_content_div.attrs.pop('style', None)
-                # 找到所有的img标签
-                img_tags = js_content_div.find_all('img')
-                # 遍历每个img标签并修改属性，设置宽度为1080p
-                for img_tag in img_tags:
-                    if 'data-src' in img_tag.attrs:
-                        img_tag['src'] = img_tag['data-src']
-                        del img_tag['data-src']
-                    if 'style' in img_tag.attrs:
-                        style = img_tag['style']
-                        # 使用正则表达式替换width属性
-                        style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
-                        img_tag['style'] = style
-                return  js_content_div.prettify()
+                return self.parse_content(text)
         except Exception as e:
                 logger.error(e)
         return ""
+    def parse_content(self,text:str):
+        """从文章页面HTML中提取正文"""
+        soup = BeautifulSoup(text, 'html.parser')
+        # 找到内容
+        js_content_div = soup.find('div', {'id': 'js_content'})
+        # 移除style属性中的visibility: hidden;
+        if js_content_div is None:
+            return
+        js_content_div.attrs.pop('style', None)
+        # 找到所有的img标签
+        img_tags = js_content_div.find_all('img')
+        # 遍历每个img标签并修改属性，设置宽度为1080p
+        for img_tag in img_tags:
+            if 'data-src' in img_tag.attrs:
+                img_tag['src'] = img_tag['data-src']
+                del img_tag['data-src']
+            if 'style' in img_tag.attrs:
+                style = img_tag['style']
+                # 使用正则表达式替换width属性
+                style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
+                img_tag['style'] = style
+        return minify_html(js_content_div)
     # 重写 get_Articles 方法
-    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page=0,MaxPage:int=1,interval=10,Gather_Content=True,Item_Over_CallBack=None,Over_CallBack=None):
-        super().Start(mp_id=Mps_id)
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page=0,MaxPage:int=1,interval=10,Gather_Content=True,Item_Over_CallBack=None,Over_CallBack=None,Page_CallBack=None,incremental:bool=None):
+        super().Start(mp_id=Mps_id,incremental=incremental)
         if self.Gather_Content:
              Gather_Content=True
         print(f"API获取模式,是否采集[{Mps_title}]内容：{Gather_Content}\n")
@@ -60,8 +64,6 @@ class MpsApi(WxGather):
             "ajax": "1"
         }
 
-        # 连接超时
-        session=self.session
         # 起始页数
         i = start_page
         while True:
@@ -71,17 +73,17 @@ class MpsApi(WxGather):
             params["begin"] = str(begin)
             print(f"第{i+1}页开始爬取\n")
             # 随机暂停几秒，避免过快的请求导致过快的被查到
-            time.sleep(random.randint(0,interval))
+            super().PageSleep(i,start_page,interval)
             try:
                 headers = self.fix_header(url)
-                resp = session.get(url, headers=headers, params = params, verify=False)
+                resp = super().Get(url, headers=headers, params = params, verify=False)
                 
                 msg = resp.json()
 
                 self._cookies=resp.cookies
                 # 流量控制了, 退出
                 if msg['base_resp']['ret'] == 200013:
-                    super().Error("frequencey control, stop at {}".format(str(begin)))
+                    super().FrequencyControl(url,begin)
                     break
                 
                 if msg['base_resp']['ret'] == 200003:
@@ -96,19 +98,22 @@ class MpsApi(WxGather):
                     super().Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code="Invalid Session")
                     break    
                 if "app_msg_list" in msg:
+                    page_items=[]
+                    known=super().KnownItems(Mps_id,msg["app_msg_list"])
                     for item in msg["app_msg_list"]:
-                        time.sleep(random.randint(1,3))
                         # info = '"{}","{}","{}","{}"'.format(str(item["aid"]), item['title'], item['link'], str(item['create_time']))
-                        if Gather_Content:
-                            if not super().HasGathered(item["aid"]):
-                                item["content"] = self.content_extract(item['link'])
-                        else:
-                            item["content"] = ""
+                        item["content"] = super().ItemContent(item,known,Gather_Content)
                         item["id"] = item["aid"]
                         item["mp_id"] = Mps_id
-                        if CallBack is not None:
+                        if Page_CallBack is not None:
+                            page_items.append(item)
+                        elif CallBack is not None:
                             super().FillBack(CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+                    super().FillBackPage(CallBack=Page_CallBack,items=page_items,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
                     print(f"第{i+1}页爬取成功\n")
+                    if known:
+                        print_info(f"[{Mps_title}]已同步到上次采集的位置，停止翻页")
+                        break
                 # 翻页
                 i += 1
             except requests.exceptions.Timeout:
@@ -5,8 +5,9 @@ import random
 import yaml
 import re
 from bs4 import BeautifulSoup
+from core.content_codec import minify_html
 from .base import WxGather
-from core.print import print_error
+from core.print import print_error,print_info
 from core.log import logger
 # 继承 BaseGather 类
 class MpsAppMsg(WxGather):
@@ -35,13 +36,13 @@ class MpsAppMsg(WxGather):
                         # 使用正则表达式替换width属性
                         style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
                         img_tag['style'] = style
-                return  js_content_div.prettify()
+                return minify_html(js_content_div)
         except Exception as e:
                 logger.error(e)
         return ""
     # 重写 get_Articles 方法
-    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page:int=0,MaxPage:int=1,interval=10,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None):
-        super().Start(mp_id=Mps_id)
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page:int=0,MaxPage:int=1,interval=10,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None,Page_CallBack=None,incremental:bool=None):
+        super().Start(mp_id=Mps_id,incremental=incremental)
         if self.Gather_Content:
             Gather_Content=True
         print(f"Web浏览器模式,是否采集[{Mps_title}]内容：{Gather_Content}\n")
@@ -59,8 +60,6 @@ class MpsAppMsg(WxGather):
         "f": "json",
         "ajax": 1
     }
-        # 连接超时
-        session=self.session
         # 起始页数
         i = start_page
         while True:
@@ -70,16 +69,16 @@ class MpsAppMsg(WxGather):
             params["begin"] = str(begin)
             print(f"第{i+1}页开始爬取\n")
             # 随机暂停几秒，避免过快的请求导致过快的被查到
-            time.sleep(random.randint(0,interval))
+            super().PageSleep(i,start_page,interval)
             try:
                 headers = self.fix_header(url)
-                resp = session.get(url, headers=headers, params = params, verify=False)
+                resp = super().Get(url, headers=headers, params = params, verify=False)
                 
                 msg = resp.json()
                 self._cookies =resp.cookies
                 # 流量控制了, 退出
                 if msg['base_resp']['ret'] == 200013:
-                    super().Error("frequencey control, stop at {}".format(str(begin)))
+                    super().FrequencyControl(url,begin)
                     break
                 
                 if msg['base_resp']['ret'] == 200003:
@@ -97,23 +96,29 @@ class MpsAppMsg(WxGather):
                     break  
                 if "publish_page" in msg:
                     msg["publish_page"]=json.loads(msg['publish_page'])
+                    page_items=[]
+                    appmsgs=[]
                     for item in msg["publish_page"]['publish_list']:
                         if "publish_info" in item:
                             publish_info= json.loads(item['publish_info'])
                        
                             if "appmsgex" in publish_info:
-                                # info = '"{}","{}","{}","{}"'.format(str(item["aid"]), item['title'], item['link'], str(item['create_time']))
-                                for item in publish_info["appmsgex"]:
-                                    if Gather_Content:
-                                        if not super().HasGathered(item["aid"]):
-                                            item["content"] = self.content_extract(item['link'])
-                                    else:
-                                        item["content"] = ""
-                                    item["id"] = item["aid"]
-                                    item["mp_id"] = Mps_id
-                                    if CallBack is not None:
-                                        super().FillBack(CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+                                appmsgs.extend(publish_info["appmsgex"])
+                    known=super().KnownItems(Mps_id,appmsgs)
+                    # info = '"{}","{}","{}","{}"'.format(str(item["aid"]), item['title'], item['link'], str(item['create_time']))
+                    for item in appmsgs:
+                        item["content"] = super().ItemContent(item,known,Gather_Content)
+                        item["id"] = item["aid"]
+                        item["mp_id"] = Mps_id
+                        if Page_CallBack is not None:
+                            page_items.append(item)
+                        elif CallBack is not None:
+                            super().FillBack(CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+                    super().FillBackPage(CallBack=Page_CallBack,items=page_items,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
                     print(f"第{i+1}页爬取成功\n")
+                    if known:
+                        print_info(f"[{Mps_title}]已同步到上次采集的位置，停止翻页")
+                        break
                 # 翻页
                 i += 1
             except requests.exceptions.Timeout:
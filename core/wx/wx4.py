@@ -0,0 +1,169 @@
+import asyncio
+import random
+import threading
+import httpx
+from .wx1 import MpsApi
+from .limiter import LIMITER
+from core.config import cfg
+from core.print import print_error,print_info
+from core.log import logger
+try:
+    import h2  # noqa: F401  HTTP/2 需要 httpx[http2]
+except ImportError:
+    h2 = None
+
+
+class AsyncRunner:
+    """后台事件循环线程，所有异步采集共用一个 httpx.AsyncClient(连接复用/HTTP2)"""
+    def __init__(self):
+        self._loop=None
+        self._client=None
+        self._lock=threading.Lock()
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop=asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever,daemon=True,name="wx-async").start()
+            return self._loop
+
+    def client(self)->httpx.AsyncClient:
+        """只在事件循环线程内调用"""
+        if self._client is None:
+            concurrency=int(cfg.get("gather.async_concurrency",4) or 4)
+            self._client=httpx.AsyncClient(
+                http2=bool(cfg.get("gather.http2",True)) and h2 is not None,
+                timeout=httpx.Timeout(10,connect=5),
+                limits=httpx.Limits(max_connections=concurrency*2,max_keepalive_connections=concurrency),
+                verify=False,
+                follow_redirects=True,
+            )
+        return self._client
+
+    def run(self,coro):
+        """在后台事件循环中执行协程，阻塞等待结果(供队列工作线程调用)"""
+        return asyncio.run_coroutine_threadsafe(coro,self.loop()).result()
+
+
+RUNNER=AsyncRunner()
+
+
+# 继承 MpsApi 类，复用接口参数与正文解析
+# 正文并发采集只在 gather.content_pipeline=False 时生效；开启两阶段采集(默认)时正文交给正文采集队列(可重试、重启后继续)
+class MpsAsync(MpsApi):
+
+    async def AsyncGet(self,url,params=None,headers=None):
+        """异步请求，与同步请求共用按域名的限流"""
+        await asyncio.to_thread(LIMITER.acquire,url)
+        return await RUNNER.client().get(url,params=params,headers=headers)
+
+    async def async_content_extract(self,url):
+        try:
+            resp=await self.AsyncGet(url,headers=self.fix_header(url))
+            if resp.status_code!=200:
+                return ""
+            text=resp.text
+            if "当前环境异常，完成验证后即可继续访问" in text:
+                print_error("当前环境异常，完成验证后即可继续访问")
+                return ""
+            return await asyncio.to_thread(self.parse_content,text)
+        except Exception as e:
+            logger.error(e)
+        return ""
+
+    async def _item_content(self,item:dict,known:dict,Gather_Content:bool,semaphore:asyncio.Semaphore)->str:
+        if not await asyncio.to_thread(self.NeedContent,item,known,Gather_Content):
+            return ""
+        async with semaphore:
+            await asyncio.sleep(random.randint(1,3))
+            return await self.async_content_extract(item['link'])
+
+    async def _finish_page(self,page:int,items:list,known:dict,Gather_Content,semaphore,Mps_id,Mps_title,CallBack,Page_CallBack):
+        """并发采集本页正文后回写，与后续列表页请求重叠执行"""
+        contents=await asyncio.gather(*[self._item_content(item,known,Gather_Content,semaphore) for item in items])
+        page_items=[]
+        for item,content in zip(items,contents):
+            item["content"]=content
+            item["id"]=item["aid"]
+            item["mp_id"]=Mps_id
+            if Page_CallBack is not None:
+                page_items.append(item)
+            elif CallBack is not None:
+                await asyncio.to_thread(super().FillBack,CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+        await asyncio.to_thread(super().FillBackPage,CallBack=Page_CallBack,items=page_items,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+        print(f"第{page+1}页爬取成功\n")
+
+    async def _get_articles(self,faker_id,Mps_id,Mps_title,CallBack,start_page,MaxPage,interval,Gather_Content,Item_Over_CallBack,Page_CallBack):
+        url = "https://mp.weixin.qq.com/cgi-bin/appmsg"
+        count=5
+        params = {
+            "action": "list_ex",
+            "begin": start_page,
+            "count": count,
+            "fakeid": faker_id,
+            "type": "9",
+            "token": self.token,
+            "lang": "zh_CN",
+            "f": "json",
+            "ajax": "1"
+        }
+        semaphore=asyncio.Semaphore(int(cfg.get("gather.async_concurrency",4) or 4))
+        pages=[]
+        i = start_page
+        try:
+            while i < MaxPage:
+                begin = i * count
+                params["begin"] = str(begin)
+                print(f"第{i+1}页开始爬取\n")
+                # 随机暂停几秒，不阻塞其它页面的正文采集
+                if not (i==start_page and getattr(self,"incremental",False)):
+                    await asyncio.sleep(random.randint(0,interval))
+                try:
+                    resp = await self.AsyncGet(url,params=params,headers=self.fix_header(url))
+                    msg = resp.json()
+                    self._cookies=resp.cookies.jar
+                    # 流量控制了, 退出
+                    # 熔断、写库、清空队列等阻塞操作放到线程中执行，不阻塞事件循环中的其它采集
+                    if msg['base_resp']['ret'] == 200013:
+                        await asyncio.to_thread(super().FrequencyControl,url,begin)
+                        break
+                    if msg['base_resp']['ret'] == 200003:
+                        await asyncio.to_thread(super().Error,"Invalid Session, stop at {}".format(str(begin)),code="Invalid Session")
+                        break
+                    # 如果返回的内容中为空则结束
+                    if 'app_msg_list' not in msg:
+                        await asyncio.to_thread(super().Error,"all ariticle parsed")
+                        break
+                    if msg['base_resp']['ret'] != 0:
+                        await asyncio.to_thread(super().Error,"错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']),code="Invalid Session")
+                        break
+                    items=msg["app_msg_list"]
+                    known=await asyncio.to_thread(super().KnownItems,Mps_id,items)
+                    pages.append(asyncio.ensure_future(self._finish_page(i,items,known,Gather_Content,semaphore,Mps_id,Mps_title,CallBack,Page_CallBack)))
+                    if known:
+                        print_info(f"[{Mps_title}]已同步到上次采集的位置，停止翻页")
+                        break
+                    # 翻页
+                    i += 1
+                except httpx.TimeoutException:
+                    print("Request timed out")
+                    break
+                except httpx.HTTPError as e:
+                    print(f"Request error: {e}")
+                    break
+                finally:
+                    await asyncio.to_thread(super().Item_Over,item={"mps_id":Mps_id,"mps_title":Mps_title},CallBack=Item_Over_CallBack)
+        finally:
+            # 等待已开始的正文采集和回写完成
+            for result in await asyncio.gather(*pages,return_exceptions=True):
+                if isinstance(result,Exception):
+                    print_error(f"页面回写失败: {result}")
+
+    # 重写 get_Articles 方法，参数与回调约定与其它采集模式一致
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page=0,MaxPage:int=1,interval=10,Gather_Content=True,Item_Over_CallBack=None,Over_CallBack=None,Page_CallBack=None,incremental:bool=None):
+        super().Start(mp_id=Mps_id,incremental=incremental)
+        if self.Gather_Content:
+             Gather_Content=True
+        print(f"异步模式,是否采集[{Mps_title}]内容：{Gather_Content}\n")
+        RUNNER.run(self._get_articles(faker_id,Mps_id,Mps_title,CallBack,start_page,MaxPage,interval,Gather_Content,Item_Over_CallBack,Page_CallBack))
+        super().Over(CallBack=Over_CallBack)
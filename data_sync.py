@@ -57,6 +57,95 @@ class DatabaseSynchronizer:
                 column.type = Text()
                 self.logger.debug(f"已将列 {column.name} 的类型从 MEDIUMTEXT 映射为 Text")
     
+    def _sync_indexes(self, model, inspector):
+        """为已存在的表补建模型中新增的索引"""
+        table_name = model.__tablename__
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table_name)}
+        for index in model.__table__.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(self.engine)
+                self.logger.info(f"新增索引: {table_name}.{index.name}")
+            except SQLAlchemyError as e:
+                self.logger.warning(f"创建索引 {index.name} 失败: {e}")
+    
+    def _migrate_article_contents(self):
+        """把旧版 articles.content 中的正文迁移到 article_contents 表，并回填 has_content/content_length"""
+        from sqlalchemy import text
+        inspector = inspect(self.engine)
+        if "content" not in {c["name"] for c in inspector.get_columns("articles")}:
+            return
+        # 旧版SQLite无法删除字段，迁移后字段已清空，不再重复迁移
+        with self.engine.connect() as conn:
+            pending = conn.execute(text(
+                "SELECT 1 FROM articles WHERE content IS NOT NULL AND content != '' LIMIT 1")).first()
+        if pending is None:
+            return
+        from core.search import SEARCH
+        # 旧版全文索引的触发器/索引引用了 articles.content，先删除，迁移完成后重建
+        SEARCH.drop_index(self.engine)
+        length = "CHAR_LENGTH" if self.engine.dialect.name == "mysql" else "LENGTH"
+        with self.engine.begin() as conn:
+            moved = conn.execute(text(
+                "INSERT INTO article_contents (article_id, content, updated_at) "
+                "SELECT a.id, a.content, a.updated_at FROM articles a "
+                "WHERE a.content IS NOT NULL AND a.content != '' "
+                "AND NOT EXISTS (SELECT 1 FROM article_contents c WHERE c.article_id = a.id)")).rowcount
+            # 是否有正文以 article_contents 为准；长度只为本次迁移正文的文章计算，其余保留已记录的值
+            conn.execute(text(
+                "UPDATE articles SET "
+                "has_content = CASE WHEN EXISTS (SELECT 1 FROM article_contents c WHERE c.article_id = articles.id) "
+                "THEN 1 ELSE 0 END, "
+                f"content_length = CASE WHEN content IS NOT NULL AND content != '' THEN {length}(content) "
+                "ELSE COALESCE(content_length, 0) END"))
+        self.logger.info(f"已迁移 {moved} 篇文章正文到 article_contents")
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE articles DROP COLUMN content"))
+            self.logger.info("已删除字段: articles.content")
+        except SQLAlchemyError as e:
+            # 旧版SQLite(<3.35)不支持删除字段，清空旧字段释放正文占用
+            self.logger.warning(f"删除字段 articles.content 失败，改为清空该字段: {e}")
+            with self.engine.begin() as conn:
+                conn.execute(text("UPDATE articles SET content = NULL"))
+
+    def _compress_article_contents(self, batch_size: int = 500):
+        """按当前 article.compress 配置压缩未处理的正文，并提取检索用纯文本"""
+        from sqlalchemy import text, bindparam
+        from core.models.article import ArticleContent
+        with self.engine.connect() as conn:
+            pending = conn.execute(text(
+                "SELECT COUNT(*) FROM article_contents WHERE content IS NOT NULL AND raw_size IS NULL")).scalar()
+        if not pending:
+            return
+        from core.search import SEARCH
+        # 批量改写期间不逐行维护全文索引，完成后统一重建
+        SEARCH.drop_index(self.engine)
+        table = ArticleContent.__table__
+        stmt = table.update().where(table.c.article_id == bindparam("_id")).values(
+            content=bindparam("content"), data=bindparam("data"),
+            plain_text=bindparam("plain_text"), raw_size=bindparam("raw_size"))
+        raw_bytes = stored_bytes = done = 0
+        while True:
+            with self.engine.begin() as conn:
+                rows = conn.execute(text(
+                    "SELECT article_id, content FROM article_contents "
+                    "WHERE content IS NOT NULL AND raw_size IS NULL LIMIT :n"), {"n": batch_size}).fetchall()
+                if not rows:
+                    break
+                values = []
+                for article_id, content in rows:
+                    packed = ArticleContent.pack(content)
+                    raw_bytes += packed["raw_size"]
+                    stored_bytes += len(packed["data"]) if packed["data"] is not None else packed["raw_size"]
+                    values.append({"_id": article_id, **packed})
+                conn.execute(stmt, values)
+                done += len(rows)
+            self.logger.info(f"正文压缩进度: {done}/{pending}")
+        self.logger.info(f"已压缩 {done} 篇文章正文: {raw_bytes} -> {stored_bytes} 字节，"
+                         f"节省 {raw_bytes - stored_bytes} 字节")
+
     def sync(self):
         """同步模型到数据库"""
         try:
@@ -108,8 +197,13 @@ class DatabaseSynchronizer:
                                 conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {col_name} {model_col.type}"))
                             self.logger.info(f"新增字段: {table_name}.{col_name}")
                     
+                    self._sync_indexes(model, inspector)
                     self.logger.info(f"表已同步: {table_name}")
             
+            self._migrate_article_contents()
+            self._compress_article_contents()
+            from core.search import SEARCH
+            SEARCH.ensure_index(self.engine)
             self.logger.info("模型同步完成")
             return True
         except SQLAlchemyError as e:
@@ -38,6 +38,9 @@ def Success(data:any,ext_data:any=None):
             if data['expiry'] !=None:
                 print_success(f"有效时间: {data['expiry']['expiry_time']} (剩余秒数: {data['expiry']['remaining_seconds']}) Token: {data['token']}")
                 set_token(data,ext_data)
+                # 恢复登录失效时暂停的持久化采集任务
+                from core.queue import TaskQueue
+                TaskQueue.recover()
             else:
                 print_warning("登录失败，请检查上述错误信息")
                 setStatus(False)
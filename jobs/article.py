@@ -15,6 +15,9 @@ def UpdateArticle(art:dict):
         mps_count=mps_count+1
         return True
     return False
+def UpdateArticles(arts:list[dict])->dict:
+    """按页批量写入文章，返回inserted/updated/skipped统计"""
+    return DB.upsert_articles(arts)
 def Update_Over(data=None):
     print("更新完成")
     pass
\ No newline at end of file
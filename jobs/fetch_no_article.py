@@ -15,7 +15,7 @@ def fetch_articles_without_content():
     try:
         # 查询content为空的文章
         from sqlalchemy import or_
-        articles = session.query(Article).filter(or_(Article.content.is_(None), Article.content == "")).limit(10).all()
+        articles = session.query(Article).filter(or_(Article.has_content.is_(None), Article.has_content == 0)).limit(10).all()
         
         if not articles:
             print_warning("暂无需要获取内容的文章")
@@ -58,7 +58,11 @@ task_queue=TaskQueueManager()
 task_queue.run_task_background()
 from core.config import cfg
 from core.print import print_success,print_warning
+from core.content_queue import CONTENT_QUEUE
 def start_sync_content():
+    if CONTENT_QUEUE.enabled:
+        # 两阶段采集：启动正文采集队列，继续执行上次未完成的任务
+        CONTENT_QUEUE.start()
     if not cfg.get("gather.content_auto_check",False):
         print_warning("自动检查并同步文章内容功能未启用")
         return
@@ -67,7 +71,11 @@ def start_sync_content():
     task_queue.clear_queue()
     scheduler.clear_all_jobs()
     def do_sync():
-        task_queue.add_task(fetch_articles_without_content)
+        if CONTENT_QUEUE.enabled:
+            # 缺少正文的文章登记到正文采集队列，由队列按并发和重试策略采集
+            task_queue.add_lane_task("repair",None,CONTENT_QUEUE.enqueue_missing)
+            return
+        task_queue.add_lane_task("repair",None,fetch_articles_without_content)
     job_id=scheduler.add_cron_job(do_sync,cron_expr=cron_exp)
     print_success(f"已添自动同步文章内容任务: {job_id}")
     scheduler.start()
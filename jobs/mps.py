@@ -1,6 +1,6 @@
 from datetime import datetime
 from core.models.article import Article
-from .article import UpdateArticle,Update_Over
+from .article import UpdateArticle,UpdateArticles,Update_Over
 import core.db as db
 from core.wx import WxGather
 from core.log import logger
@@ -19,7 +19,7 @@ def fetch_all_article():
         mps=db.DB.get_all_mps()
         for item in mps:
             try:
-                wx.get_Articles(item.faker_id,CallBack=UpdateArticle,Mps_id=item.id,Mps_title=item.mp_name, MaxPage=1)
+                wx.get_Articles(item.faker_id,CallBack=UpdateArticle,Page_CallBack=UpdateArticles,Mps_id=item.id,Mps_title=item.mp_name, MaxPage=1)
             except Exception as e:
                 print(e)
         print(wx.articles) 
@@ -36,34 +36,89 @@ from core.models.message_task import MessageTask
 # from core.queue import TaskQueue
 from .webhook import web_hook
 interval=int(cfg.get("interval",60)) # 每隔多少秒执行一次
-def do_job(mp=None,task:MessageTask=None):
+def do_job(mp=None,task:MessageTask=None,tasks:list[MessageTask]=None,raise_error:bool=False):
         # TaskQueue.add_task(test,info=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         # print("执行任务", task.mps_id)
         print("执行任务")
         all_count=0
+        failed=False
         wx=WxGather().Model()
         try:
-            wx.get_Articles(mp.faker_id,CallBack=UpdateArticle,Mps_id=mp.id,Mps_title=mp.mp_name, MaxPage=1,Over_CallBack=Update_Over,interval=interval)
+            wx.get_Articles(mp.faker_id,CallBack=UpdateArticle,Page_CallBack=UpdateArticles,Mps_id=mp.id,Mps_title=mp.mp_name, MaxPage=1,Over_CallBack=Update_Over,interval=interval)
         except Exception as e:
+            failed=True
             print_error(e)
-            # raise
+            # 持久化队列调用时抛出异常，由队列重试、退避并记录失败原因
+            if raise_error:
+                raise
         finally:
             count=wx.all_count()
             all_count+=count
             from jobs.webhook import MessageWebHook 
-            tms=MessageWebHook(task=task,feed=mp,articles=wx.articles)
-            web_hook(tms)
-            print_success(f"任务[{mp.mp_name}]执行成功,{count}成功条数")
+            # 合并后的任务只采集一次，结果分别推送给订阅该公众号的每个消息任务
+            for item in (tasks if tasks else [task]):
+                tms=MessageWebHook(task=item,feed=mp,articles=wx.articles)
+                web_hook(tms)
+            if not failed:
+                print_success(f"任务[{mp.mp_name}]执行成功,{count}成功条数")
+
+def collect_feed(feed_id:str,task_ids:list=None,task_id:str=None):
+    """持久化队列任务：按ID读取公众号和消息任务后采集
+
+    同一公众号排队中的采集任务会合并为一个，task_ids 为合并后需要推送的全部消息任务
+    """
+    mp=wx_db.get_mps(feed_id)
+    if mp is None:
+        print_error(f"公众号[{feed_id}]不存在，跳过采集")
+        return
+    task_ids=list(task_ids or [])+([task_id] if task_id else [])
+    tasks=[]
+    if task_ids:
+        from .taskmsg import get_message_task
+        tasks=get_message_task(task_ids) or []
+        if not tasks:
+            print_error(f"任务{task_ids}不存在或已停用，跳过采集")
+            return
+    do_job(mp,tasks=tasks,raise_error=True)
+
+def fetch_feed_pages(feed_id:str,start_page:int=0,max_page:int=1):
+    """持久化队列任务：采集公众号指定页码范围的文章(首次添加公众号、手动刷新)，从中间页开始补采时不做增量截止"""
+    mp=wx_db.get_mps(feed_id)
+    if mp is None:
+        print_error(f"公众号[{feed_id}]不存在，跳过采集")
+        return
+    WxGather().Model().get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,Page_CallBack=UpdateArticles,start_page=start_page,MaxPage=max_page,incremental=False if start_page>0 else None)
 
 from core.queue import TaskQueue
+from core.poll_policy import POLL_PLANNER
+import zlib
+def spread_delay(task:MessageTask,feed:Feed)->int:
+    """同一任务的公众号按确定性抖动分散到执行周期内，避免同一时刻集中请求
+
+    延迟由任务ID和公众号ID决定，每次触发时同一公众号的执行时间相同
+    """
+    spread=int(cfg.get("gather.schedule_spread",300) or 0)
+    if task is None or spread<=0 or not task.cron_exp:
+        return 0
+    period=scheduler.get_interval(task.cron_exp,job_id=str(task.id))
+    # 最多占用执行周期的一半，给队列留出执行时间
+    window=int(min(spread,period/2)) if period else spread
+    if window<=0:
+        return 0
+    return zlib.crc32(f"{task.id}:{feed.id}".encode("utf-8"))%window
+
 def add_job(feeds:list[Feed]=None,task:MessageTask=None,isTest=False):
-    if isTest:
-        TaskQueue.clear_queue()
+    if not isTest and POLL_PLANNER.enabled:
+        # 自适应采集：定时任务只作为节拍，按各公众号的发文频率筛选本次到期的公众号
+        due=POLL_PLANNER.due_feeds(feeds)
+        print_info(f"自适应采集：{len(due)}/{len(feeds)}个公众号到期")
+        feeds=due
     for feed in feeds:
-        TaskQueue.add_task(do_job,feed,task)
+        # 测试任务进入交互通道优先执行，不清空队列中其它未完成的持久化任务
+        TaskQueue.add_durable_task("jobs.mps:collect_feed",{"feed_id":feed.id,"task_ids":[task.id] if task else []},key=feed.id,
+                                   lane="interactive" if isTest else "scheduled",delay=0 if isTest else spread_delay(task,feed))
         if isTest:
             print(f"测试任务，{feed.mp_name}，加入队列成功")
-            reload_job()
             break
         print(f"{feed.mp_name}，加入队列成功")
     print_success(TaskQueue.get_queue_info())
@@ -80,7 +135,9 @@ scheduler=TaskScheduler()
 def reload_job():
     print_success("重载任务")
     scheduler.clear_all_jobs()
-    TaskQueue.clear_queue()
+    # 队列中只有持久化任务(手动刷新、补采、等待重试的采集)，重载定时任务时保留；
+    # 已删除或停用的消息任务对应的采集任务执行时会自行跳过
+    POLL_PLANNER.reset()
     start_job()
 
 def run(job_id:str=None,isTest=False):
@@ -109,11 +166,15 @@ def start_job(job_id:str=None):
             print_error(f"任务[{task.id}]没有设置cron表达式")
             continue
       
-        job_id=scheduler.add_cron_job(add_job,cron_expr=cron_exp,args=[get_feeds(task),task],job_id=str(task.id),tag="定时采集")
+        feeds=get_feeds(task)
+        POLL_PLANNER.schedule(task.id,[feed.id for feed in feeds])
+        job_id=scheduler.add_cron_job(add_job,cron_expr=cron_exp,args=[feeds,task],job_id=str(task.id),tag="定时采集")
         print(f"已添加任务: {job_id}")
     scheduler.start()
     print("启动任务")
 def start_all_task():
+    # 继续执行重启前未完成的采集任务
+    TaskQueue.recover()
       #开启自动同步未同步 文章任务
     from jobs.fetch_no_article import start_sync_content
     start_sync_content()
@@ -2,8 +2,7 @@ from typing import Union
 from core.db import Db
 from core.config import cfg
 from core.models import MessageTask
-DB = Db()
-DB.init(cfg.get("db"))
+DB = Db(tag="消息任务")
 def get_message_task(job_id:Union[str, list]=None) -> list[MessageTask]:
 
     """
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+正文存储基准测试
+用真实文章样本比较原有存储方式(prettify + 明文)与压缩存储(紧凑HTML + zlib/zstd)的写入吞吐量和数据库文件大小
+
+用法:
+    python scripts/bench_content_storage.py                  # 从 config.yaml 配置的数据库中抽取已采集的正文
+    python scripts/bench_content_storage.py --dir ./samples  # 使用目录中保存的文章HTML(*.html)
+    python scripts/bench_content_storage.py --no-fts         # 不建全文索引，只比较正文本身的存储
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEED_ID = "MP_WXS_BENCH"
+
+
+def load_samples(args) -> list:
+    if args.dir:
+        samples = []
+        for path in sorted(glob.glob(os.path.join(args.dir, "*.html")))[:args.sample]:
+            with open(path, "r", encoding="utf-8") as f:
+                samples.append(f.read())
+        return samples
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from core.db import DB
+    from core.models import ArticleContent
+    session = DB.get_session()
+    rows = session.query(ArticleContent).filter(ArticleContent.raw_size > 100).limit(args.sample).all()
+    return [row.unpack() for row in rows]
+
+
+def format_samples(samples: list, mode: str) -> list:
+    """按采集器的处理方式重新输出正文：prettify 为原有方式，minify 为紧凑输出"""
+    sys.path.insert(0, ROOT)
+    from bs4 import BeautifulSoup
+    from core.content_codec import minify_html
+    result = []
+    for html in samples:
+        soup = BeautifulSoup(html, "html.parser")
+        node = soup.find("div", {"id": "js_content"}) or soup
+        result.append(node.prettify() if mode == "prettify" else minify_html(node))
+    return result
+
+
+def worker(args):
+    """在子进程中运行：按环境变量中的压缩配置写入样本，输出耗时和文件大小"""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import text
+    from core.db import DB
+    with open(args.worker, "r", encoding="utf-8") as f:
+        bodies = json.load(f)
+    DB.create_tables()
+    now = int(time.time())
+    total = 0
+    begin = time.perf_counter()
+    for round_no in range(args.repeat):
+        page = []
+        for i, body in enumerate(bodies):
+            page.append({"id": f"{round_no}-{i}", "mp_id": FEED_ID, "title": f"文章{round_no}-{i}",
+                         "url": "", "pic_url": "", "description": "", "content": body,
+                         "publish_time": now - total})
+            total += 1
+            if len(page) >= args.page_size:
+                DB.upsert_articles(page)
+                page = []
+        if page:
+            DB.upsert_articles(page)
+    seconds = time.perf_counter() - begin
+    with DB.get_engine().begin() as conn:
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    DB.get_engine().dispose()
+    db_path = os.environ["DB"][len("sqlite:///"):]
+    print(json.dumps({
+        "articles": total,
+        "seconds": seconds,
+        "html_bytes": sum(len(b.encode("utf-8")) for b in bodies) * args.repeat,
+        "db_bytes": os.path.getsize(db_path),
+    }))
+
+
+def run_profile(args, name, bodies, codec, tmpdir) -> dict:
+    sample_path = os.path.join(tmpdir, f"{name}.json")
+    with open(sample_path, "w", encoding="utf-8") as f:
+        json.dump(bodies, f, ensure_ascii=False)
+    env = os.environ.copy()
+    env["DB"] = f"sqlite:///{os.path.join(tmpdir, f'{name}.db')}"
+    env["ARTICLE.COMPRESS"] = codec
+    env["ENABLE_JOB"] = "False"
+    if args.no_fts:
+        env["SEARCH_FTS"] = "False"
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", sample_path,
+           "--repeat", str(args.repeat), "--page-size", str(args.page_size)]
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(out.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="正文压缩存储基准测试")
+    parser.add_argument("--dir", default="", help="文章HTML样本目录，默认从数据库抽取")
+    parser.add_argument("--sample", type=int, default=200, help="样本文章数")
+    parser.add_argument("--repeat", type=int, default=5, help="样本重复写入次数")
+    parser.add_argument("--page-size", type=int, default=50, help="每批写入文章数")
+    parser.add_argument("--no-fts", action="store_true", help="关闭全文索引，只比较正文存储(全文索引体积与正文存储方式无关)")
+    parser.add_argument("--worker", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args)
+        return
+
+    samples = load_samples(args)
+    if not samples:
+        print("没有可用的文章样本，请先采集文章或使用 --dir 指定样本目录")
+        return
+    profiles = [("原始(prettify+明文)", "prettify", "none"), ("紧凑HTML+zlib", "minify", "zlib")]
+    try:
+        import zstandard  # noqa: F401
+        profiles.append(("紧凑HTML+zstd", "minify", "zstd"))
+    except ImportError:
+        pass
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i, (name, mode, codec) in enumerate(profiles):
+            results[name] = run_profile(args, f"profile{i}", format_samples(samples, mode), codec, tmpdir)
+    base = results[profiles[0][0]]
+    print(f"样本 {len(samples)} 篇 x {args.repeat} 次")
+    print(f"{'方式':<20}{'篇/秒':>10}{'HTML(MB)':>10}{'库文件(MB)':>12}{'节省':>8}")
+    for name, r in results.items():
+        saved = 1 - r["db_bytes"] / base["db_bytes"] if base["db_bytes"] else 0
+        print(f"{name:<20}{r['articles'] / r['seconds']:>10.1f}{r['html_bytes'] / 1048576:>10.2f}"
+              f"{r['db_bytes'] / 1048576:>12.2f}{saved:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
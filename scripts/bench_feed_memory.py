@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+订阅源生成内存基准测试
+在临时数据库中写入带全文的文章，分别用整体生成(rss.stream=False)和流式生成(rss.stream=True)请求订阅源，
+比较单次请求的Python内存分配峰值(tracemalloc)和进程常驻内存峰值(ru_maxrss)
+
+用法:
+    python scripts/bench_feed_memory.py                       # 100篇文章，每篇正文约200KB，rss格式
+    python scripts/bench_feed_memory.py --size 500 --ext atom # 每篇正文约500KB，atom格式
+    python scripts/bench_feed_memory.py --articles 50 --limit 50
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEED_ID = "MP_WXS_BENCH"
+
+
+def seed(args):
+    """在子进程中运行：写入公众号和文章"""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from core.db import DB
+    from core.models.feed import Feed
+    DB.create_tables()
+    session = DB.get_session()
+    session.add(Feed(id=FEED_ID, mp_name="基准测试", faker_id="bench", mp_cover="", mp_intro="",
+                     status=1, sync_time=0, update_time=0))
+    session.commit()
+    paragraph = "<p>" + "公众号文章正文内容，用于测试订阅源生成的内存占用。" * 20 + "</p>"
+    body = paragraph * max(args.size * 1024 // len(paragraph.encode("utf-8")), 1)
+    now = int(time.time())
+    page = []
+    for i in range(args.articles):
+        page.append({"id": str(i), "mp_id": FEED_ID, "title": f"文章{i}", "url": f"https://mp.weixin.qq.com/s/{i}",
+                     "pic_url": "", "description": "", "content": f"<div>{i}</div>{body}", "publish_time": now - i})
+        if len(page) >= 20:
+            DB.upsert_articles(page)
+            page = []
+    if page:
+        DB.upsert_articles(page)
+
+
+async def request(app, path: str, query: str) -> int:
+    """直接调用ASGI应用，丢弃响应内容只统计字节数(避免测试客户端缓存整个响应)"""
+    # spec_version 2.4: 流式响应不再另起任务监听客户端断开
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+             "query_string": query.encode(), "root_path": "", "headers": [(b"host", b"bench")],
+             "server": ("bench", 80), "client": ("127.0.0.1", 1)}
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+def worker(args):
+    """在子进程中运行：请求一次订阅源，输出内存峰值"""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import resource
+    import tracemalloc
+    from fastapi import FastAPI
+    from core.rss import RSS
+    from apis.rss import feed_router
+    # 缓存文件写入临时目录
+    RSS.cache_dir = os.path.join(args.tmpdir, "rss")
+    RSS.content_cache_dir = os.path.join(args.tmpdir, "content")
+    app = FastAPI()
+    app.include_router(feed_router)
+    path = f"/feed/{FEED_ID}.{args.ext}"
+    query = f"limit={args.limit}"
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    begin = time.perf_counter()
+    size = asyncio.run(request(app, path, query))
+    seconds = time.perf_counter() - begin
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({
+        "bytes": size,
+        "seconds": seconds,
+        "peak_alloc": peak,
+        "rss_growth": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) * 1024,
+    }))
+
+
+def run(args, mode: str, env: dict) -> dict:
+    env = {**env, "RSS_STREAM": "True" if mode == "stream" else "False"}
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", mode, "--ext", args.ext, "--limit", str(args.limit),
+           "--tmpdir", env["BENCH_TMPDIR"]]
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(out.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订阅源生成内存基准测试")
+    parser.add_argument("--articles", type=int, default=100, help="文章数")
+    parser.add_argument("--size", type=int, default=200, help="每篇正文大小(KB)")
+    parser.add_argument("--limit", type=int, default=100, help="订阅源条目数")
+    parser.add_argument("--ext", default="rss", help="订阅源格式 rss/atom/json")
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--tmpdir", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.seed:
+        seed(args)
+        return
+    if args.worker:
+        worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = os.environ.copy()
+        env["DB"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        env["BENCH_TMPDIR"] = tmpdir
+        env["ENABLE_JOB"] = "False"
+        env["RSS_FULL_CONTEXT"] = "True"
+        # 关闭内存缓存，只比较生成过程
+        env["RSS_MEMORY_CACHE_MB"] = "0"
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--seed", "--articles", str(args.articles),
+                              "--size", str(args.size)], env=env, cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr[-2000:])
+        results = {name: run(args, mode, env) for name, mode in (("整体生成", "buffered"), ("流式生成", "stream"))}
+
+    print(f"文章 {args.articles} 篇 x {args.size}KB，格式 {args.ext}，条目数 {args.limit}")
+    print(f"{'方式':<12}{'响应(MB)':>10}{'耗时(秒)':>10}{'分配峰值(MB)':>14}{'常驻增长(MB)':>14}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['bytes'] / 1048576:>10.2f}{r['seconds']:>10.2f}"
+              f"{r['peak_alloc'] / 1048576:>14.2f}{r['rss_growth'] / 1048576:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+SQLite 性能配置基准测试
+在批量写入文章的同时并发读取 /feed/{id}.rss，比较启用/关闭 WAL 等性能配置时的读取延迟(p50/p99)
+
+用法:
+    python scripts/bench_sqlite_wal.py --articles 5000 --readers 8
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEED_ID = "MP_WXS_BENCH"
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker(args):
+    """在子进程中运行：建库、启动服务、写入文章并并发读取RSS"""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from datetime import datetime
+    from core.db import DB
+    from core.models import Feed
+
+    DB.create_tables()
+    session = DB.get_session()
+    session.merge(Feed(id=FEED_ID, mp_name="bench", mp_cover="", mp_intro="bench", status=1,
+                       faker_id="bench", created_at=datetime.now(), updated_at=datetime.now(),
+                       sync_time=0, update_time=0))
+    session.commit()
+
+    import uvicorn
+    import httpx
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config("web:app", host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.1)
+
+    body = "<p>" + "微信公众号文章内容 " * (args.body_size // 30) + "</p>"
+    done = threading.Event()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def writer():
+        now = int(time.time())
+        for start in range(0, args.articles, args.page_size):
+            page = [{
+                "id": f"{i}",
+                "mp_id": FEED_ID,
+                "title": f"文章{i}",
+                "url": f"https://mp.weixin.qq.com/s/{i}",
+                "pic_url": "",
+                "description": f"摘要{i}",
+                "content": body,
+                "publish_time": now - i,
+            } for i in range(start, min(start + args.page_size, args.articles))]
+            DB.upsert_articles(page)
+        done.set()
+
+    def reader():
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            while not done.is_set():
+                t = time.perf_counter()
+                try:
+                    r = client.get(f"/feed/{FEED_ID}.rss", params={"limit": args.limit})
+                    ok = r.status_code == 200
+                except Exception:
+                    ok = False
+                cost = (time.perf_counter() - t) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(cost)
+                    else:
+                        errors[0] += 1
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in readers:
+        t.start()
+    begin = time.perf_counter()
+    writer()
+    write_seconds = time.perf_counter() - begin
+    for t in readers:
+        t.join()
+    server.should_exit = True
+    print(json.dumps({
+        "requests": len(latencies),
+        "errors": errors[0],
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else 0,
+        "write_seconds": write_seconds,
+    }))
+
+
+def run_profile(args, enabled: bool, tmpdir: str) -> dict:
+    env = os.environ.copy()
+    env["DB"] = f"sqlite:///{os.path.join(tmpdir, f'bench_{int(enabled)}.db')}"
+    env["SQLITE_PERFORMANCE"] = str(enabled)
+    env["ENABLE_JOB"] = "False"
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+           "--articles", str(args.articles), "--readers", str(args.readers),
+           "--page-size", str(args.page_size), "--limit", str(args.limit),
+           "--body-size", str(args.body_size)]
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(out.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite WAL 性能配置基准测试")
+    parser.add_argument("--articles", type=int, default=5000, help="写入文章数")
+    parser.add_argument("--readers", type=int, default=8, help="并发读取线程数")
+    parser.add_argument("--page-size", type=int, default=50, help="每批写入文章数")
+    parser.add_argument("--limit", type=int, default=20, help="每次读取的RSS条目数")
+    parser.add_argument("--body-size", type=int, default=20000, help="文章正文大小(字节)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {
+            "默认配置": run_profile(args, False, tmpdir),
+            "性能配置": run_profile(args, True, tmpdir),
+        }
+    print(f"{'配置':<8}{'请求数':>8}{'失败':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'写入(s)':>10}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['requests']:>8}{r['errors']:>6}{r['p50']:>10.1f}{r['p99']:>10.1f}{r['max']:>10.1f}{r['write_seconds']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+热点查询执行计划检查
+对文章列表、RSS、公众号和消息任务等热点查询执行 EXPLAIN，出现全表扫描时返回非0退出码
+
+用法:
+    python scripts/check_query_plan.py            # 使用 config.yaml 中的数据库
+    DB=mysql+pymysql://... python scripts/check_query_plan.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import text
+from core.db import DB
+from core.models import Article, Feed, MessageTask, DATA_STATUS
+
+
+def hot_queries(session):
+    """返回(名称, 查询, 必须走索引查找的表)列表，与 apis/rss、apis/article、apis/mps、jobs/taskmsg 中的查询保持一致
+
+    带等值过滤条件的查询必须使用索引查找(SEARCH)，只排序分页的查询允许按索引顺序扫描。
+    """
+    feed_articles = session.query(Feed, Article).join(Article, Feed.id == Article.mp_id)
+    return [
+        ("rss:公众号文章", feed_articles.filter(Article.mp_id == "MP_WXS_0")
+            .order_by(Article.publish_time.desc()).limit(10), "articles"),
+        ("rss:全部文章", feed_articles.order_by(Article.publish_time.desc()).limit(10), None),
+        ("articles:列表", session.query(Article.id).filter(Article.status != DATA_STATUS.DELETED)
+            .order_by(Article.publish_time.desc()).limit(10), None),
+        ("articles:按公众号", session.query(Article.id).filter(Article.mp_id == "MP_WXS_0")
+            .filter(Article.status != DATA_STATUS.DELETED).order_by(Article.publish_time.desc()).limit(10), "articles"),
+        ("articles:按状态", session.query(Article.id).filter(Article.status == DATA_STATUS.ACTIVE)
+            .order_by(Article.publish_time.desc()).limit(10), "articles"),
+        ("articles:无正文", session.query(Article.id).filter(Article.has_content == 0).limit(10), "articles"),
+        ("mps:按faker_id", session.query(Feed.id).filter(Feed.faker_id == "0"), "feeds"),
+        ("message_tasks:启用任务", session.query(MessageTask.id).filter(MessageTask.status == 1), "message_tasks"),
+    ]
+
+
+def full_scans(conn, dialect: str, sql: str, search_table: str = None) -> list:
+    """返回执行计划中的全表扫描步骤"""
+    if dialect == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        scans = []
+        for detail in (row[-1] for row in rows):
+            if not detail.startswith("SCAN ") or "CONSTANT ROW" in detail:
+                continue
+            # "SCAN articles" 为全表扫描，"SCAN articles USING INDEX ..." 为按索引顺序扫描
+            if "USING" not in detail or detail.split()[1] == search_table:
+                scans.append(detail)
+        return scans
+    if dialect == "mysql":
+        result = conn.execute(text(f"EXPLAIN {sql}"))
+        keys = list(result.keys())
+        scans = []
+        for row in result.fetchall():
+            item = dict(zip(keys, row))
+            if item.get("type") == "ALL" or (item.get("type") == "index" and item.get("table") == search_table):
+                scans.append(f"{item.get('table')}: type={item.get('type')} rows={item.get('rows')}")
+        return scans
+    raise ValueError(f"不支持的数据库类型: {dialect}")
+
+
+def main() -> int:
+    engine = DB.get_engine()
+    dialect = engine.dialect.name
+    session = DB.get_session()
+    failed = 0
+    with engine.connect() as conn:
+        for name, query, search_table in hot_queries(session):
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            scans = full_scans(conn, dialect, sql, search_table)
+            if scans:
+                failed += 1
+                print(f"[FAIL] {name}: {'; '.join(scans)}")
+            else:
+                print(f"[ OK ] {name}")
+    if failed:
+        print(f"{failed} 个热点查询存在全表扫描，请运行 python init_sys.py 同步索引")
+        return 1
+    print("所有热点查询均使用索引")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+整理 SQLite 数据库
+执行 VACUUM 回收空间后重建全文索引：FTS5 索引按隐式 rowid 关联文章，VACUUM 可能重新编号 rowid，
+直接用 sqlite3 命令行执行 VACUUM 后搜索可能返回错误的文章(下次启动时会检测到并自动重建)
+
+用法:
+    python scripts/vacuum_db.py            # 使用 config.yaml 中的数据库
+    DB=sqlite:///data/db.db python scripts/vacuum_db.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from core.db import DB
+from core.search import SEARCH
+
+
+def main():
+    if not SEARCH.vacuum(DB.engine):
+        print("当前数据库不是SQLite，无需整理")
+        return 1
+    print("数据库整理完成，全文索引已重建")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
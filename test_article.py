@@ -33,7 +33,7 @@ def testMarkDown():
     from core.models import Article
     from core.db import DB
     session=DB.get_session()
-    art=session.query(Article).filter(Article.content != None).order_by(Article.id.desc()).first()
+    art=session.query(Article).filter(Article.has_content == 1).order_by(Article.id.desc()).first()
     # print(art.content)
     from core.content_format import  format_content
     print(format_content(art.content,"markdown"))
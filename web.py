@@ -58,6 +58,15 @@ async def add_custom_header(request: Request, call_next):
     response.headers["GITHUB"] = "https://github.com/rachelos/we-mp-rss"
     response.headers["Server"] = cfg.get("app_name", "WeRSS")
     return response
+from core.db import SESSION_STATS
+@app.middleware("http")
+async def db_session_scope(request: Request, call_next):
+    # 统计每个请求获取的数据库会话数
+    token = SESSION_STATS.begin_request()
+    try:
+        return await call_next(request)
+    finally:
+        SESSION_STATS.end_request(token)
 # 创建API路由分组
 api_router = APIRouter(prefix=f"{API_BASE}")
 api_router.include_router(auth_router)